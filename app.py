@@ -1,2495 +1,5289 @@
-import os
-import re
-import sqlite3
-from datetime import datetime, date, time, timedelta
-from zoneinfo import ZoneInfo
-from flask import Flask, request, Response, redirect, send_file
-
-# ---------------------------
-# Config
-# ---------------------------
-APP_TITLE = os.getenv("APP_TITLE", "VOLGA Lunch")
-ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "change-me")
-APP_VERSION = os.getenv("APP_VERSION", "1")
-DB_PATH = os.getenv("DB_PATH", "/tmp/orders.sqlite")
-TZ = ZoneInfo(os.getenv("TZ", "Europe/Madrid"))
-
-MAX_PER_DAY = int(os.getenv("MAX_PER_DAY", "30"))
-CUTOFF_HOUR = int(os.getenv("CUTOFF_HOUR", "11"))  # 11:00
-ORDER_PREFIX = os.getenv("ORDER_PREFIX", "VO")
-
-OFFICES = ["ALAMEDA", "MUSICA"]
-
-# ✅ временно отключаем офис для новых заказов
-INACTIVE_OFFICES = {"MUSICA"}
-
-# ✅ этажи по офисам
-FLOORS_BY_OFFICE = {
-    "ALAMEDA": ["1st floor", "6th floor"]
-}
-
-# --- Меню: RU / EN ---
-MENU = {
-    "zakuska": [
-        "Оливье / Olivier salad",
-        "Винегрет / Vinigret salad",
-        "Икра из баклажанов / Eggplant caviar",
-        "Паштет из куриной печени / Chicken liver pâté",
-        "Шуба / Herring under a fur coat",
-    ],
-    "soup": [
-        "Борщ / Borscht",
-        "Солянка сборная мясная / Meat soup solyanka",
-        "Куриный суп с лапшой и яйцом / Chicken soup with noodles & egg",
-    ],
-    "hot": [
-        "Куриные котлеты с пюре / Chicken cutlets with mashed potatoes",
-        "Куриные котлеты с гречкой / Chicken cutlets with buckwheat",
-        "Вареники с картошкой / Vareniki with potatoes",
-        "Пельмени со сметаной / Pelmeni with sour cream",
-        "Плов с бараниной / Lamb plov (+3€)",
-    ],
-    "dessert": [
-        "Торт Наполеон / Napoleon cake",
-        "Пирожное Картошка / Kartoshka cake",
-        "Трубочка со сгущенкой / Wafer roll with dulce de leche",
-    ],
-}
-
-PRICES = {"opt1": 15.0, "opt2": 16.0, "opt3": 17.0}
-PLOV_SURCHARGE = 3.0
-
-BREAD_OPTIONS = ["Белый / White", "Чёрный / Black"]
-
-# --- Напитки (дополнительно) ---
-DRINKS = [
-    ("", "— без напитка / no drink —", 0.0),
-    ("kvas", "Квас / Kvas €3.5", 3.5),
-    ("mors", "Морс / Berry drink (Mors) €4.0", 4.0),
-    ("water", "Вода / Water €2.2", 2.2),
-    ("tea_black", "Чай чёрный с чабрецом (сашет) / Black tea with thyme (sachet) €3.5", 3.5),
-    ("tea_green", "Чай зелёный (сашет) / Green tea (sachet) €3.5", 3.5),
-    ("tea_herbal", "Чай травяной (сашет) / Herbal tea (sachet) €3.5", 3.5),
-]
-DRINK_PRICE = {k: p for (k, _, p) in DRINKS}
-DRINK_LABEL = {k: lbl for (k, lbl, _) in DRINKS}
-
-app = Flask(__name__)
-
-
-# ---------------------------
-# DB
-# ---------------------------
-def db():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
-
-
-def ensure_columns(conn: sqlite3.Connection):
-    cols = {r["name"] for r in conn.execute("PRAGMA table_info(orders)").fetchall()}
-    if "drink_code" not in cols:
-        conn.execute("ALTER TABLE orders ADD COLUMN drink_code TEXT")
-    if "drink_label" not in cols:
-        conn.execute("ALTER TABLE orders ADD COLUMN drink_label TEXT")
-    if "drink_price_eur" not in cols:
-        conn.execute("ALTER TABLE orders ADD COLUMN drink_price_eur REAL")
-    # ✅ NEW
-    if "floor" not in cols:
-        conn.execute("ALTER TABLE orders ADD COLUMN floor TEXT")
-
-
-def init_db():
-    conn = db()
-    conn.execute(
-        """
-        CREATE TABLE IF NOT EXISTS orders (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            order_code TEXT NOT NULL UNIQUE,
-            office TEXT NOT NULL,
-            order_date TEXT NOT NULL,
-
-            floor TEXT,
-
-            name TEXT NOT NULL,
-            phone_raw TEXT NOT NULL,
-            phone_norm TEXT NOT NULL,
-
-            zakuska TEXT,
-            soup TEXT NOT NULL,
-            hot TEXT,
-            dessert TEXT,
-
-            bread TEXT,
-
-            option_code TEXT NOT NULL,
-            price_eur REAL NOT NULL,
-            comment TEXT,
-            status TEXT NOT NULL DEFAULT 'active',
-            created_at TEXT NOT NULL
-        )
-        """
-    )
-    conn.execute("CREATE INDEX IF NOT EXISTS idx_orders_office_date ON orders(office, order_date)")
-    conn.execute(
-        """
-        CREATE UNIQUE INDEX IF NOT EXISTS uq_orders_office_date_phone_norm
-        ON orders(office, order_date, phone_norm)
-        """
-    )
-
-    conn.execute(
-        """
-        CREATE TABLE IF NOT EXISTS weekly_special (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            office TEXT NOT NULL,
-            start_date TEXT NOT NULL,
-            end_date TEXT NOT NULL,
-            title TEXT NOT NULL,
-            surcharge_eur INTEGER NOT NULL DEFAULT 0,
-            created_at TEXT NOT NULL
-        )
-        """
-    )
-    conn.execute("CREATE INDEX IF NOT EXISTS idx_special_office_dates ON weekly_special(office, start_date, end_date)")
-
-    ensure_columns(conn)
-    conn.commit()
-    conn.close()
-
-
-init_db()
-
-
-# ---------------------------
-# Helpers
-# ---------------------------
-def now_local():
-    return datetime.now(TZ)
-
-
-def cutoff_dt(d: date) -> datetime:
-    return datetime.combine(d, time(CUTOFF_HOUR, 0), TZ)
-
-
-def is_workday(d: date) -> bool:
-    # Доставка/заказы доступны Tue–Fri
-    return d.weekday() in (1, 2, 3, 4)  # Tue=1 ... Fri=4
-
-
-def next_workday(d: date) -> date:
-    x = d + timedelta(days=1)
-    while not is_workday(x):
-        x += timedelta(days=1)
-    return x
-
-
-def prev_workday(d: date) -> date:
-    x = d - timedelta(days=1)
-    while not is_workday(x):
-        x -= timedelta(days=1)
-    return x
-
-
-def ordering_window_for(d: date):
-    """
-    Окно приёма заказов на дату d:
-    start = cutoff(предыдущий рабочий день)
-    end   = cutoff(d)
-    """
-    start = cutoff_dt(prev_workday(d))
-    end = cutoff_dt(d)
-    return start, end
-
-
-def is_closed_day(d: date) -> bool:
-    return not is_workday(d)
-
-
-def validate_order_time(d: date):
-    n = now_local()
-    start, end = ordering_window_for(d)
-    if is_closed_day(d):
-        return False, start, end, n
-    return (start <= n < end), start, end, n
-
-
-def normalize_phone(raw: str) -> str:
-    raw = (raw or "").strip()
-    if not raw:
-        return ""
-    has_plus = raw.lstrip().startswith("+")
-    digits = re.sub(r"\D+", "", raw)
-    if not digits:
-        return ""
-    return ("+" if has_plus else "") + digits
-
-
-def compute_default_date():
-    n = now_local()
-    today = n.date()
-    if is_workday(today) and n < cutoff_dt(today):
-        return today
-    return next_workday(today)
-
-
-def check_admin():
-    return request.args.get("token", "") == ADMIN_TOKEN
-
-
-def options_html(items):
-    return "".join([f"<option>{x}</option>" for x in items])
-
-
-def get_weekly_special(office: str, d: date):
-    conn = db()
-    row = conn.execute(
-        """
-        SELECT * FROM weekly_special
-        WHERE office=? AND start_date <= ? AND end_date >= ?
-        ORDER BY id DESC
-        LIMIT 1
-        """,
-        (office, d.isoformat(), d.isoformat()),
-    ).fetchone()
-    conn.close()
-    return row
-
-
-def hot_menu_with_special(office: str, d: date):
-    items = MENU["hot"].copy()
-    special = get_weekly_special(office, d)
-    if special:
-        label = f"Блюдо недели: {special['title']} / Weekly special: {special['title']}"
-        s = int(special["surcharge_eur"])
-        if s > 0:
-            label += f" (+{s}€)"
-        items.insert(0, label)
-    return items
-
-
-def compute_option_base_price(zakuska, soup, hot, dessert, office: str, d: date):
-    has_z = bool(zakuska)
-    has_s = bool(soup)
-    has_h = bool(hot)
-    has_d = bool(dessert)
-
-    if not has_s:
-        return None, None, "Суп обязателен / Soup is required."
-
-    if has_z and has_s and has_d and not has_h:
-        option = "opt1"
-        price = PRICES[option]
-    elif (not has_z) and has_s and has_h and has_d:
-        option = "opt2"
-        price = PRICES[option]
-    elif has_z and has_s and has_h and (not has_d):
-        option = "opt3"
-        price = PRICES[option]
-    else:
-        return None, None, "Нужно выбрать ровно 3 категории по правилам опций / Please select exactly 3 categories per options."
-
-    if hot and "Плов с бараниной" in hot:
-        price += PLOV_SURCHARGE
-
-    if hot and hot.startswith("Блюдо недели:"):
-        special = get_weekly_special(office, d)
-        if special:
-            price += float(int(special["surcharge_eur"]))
-
-    return option, float(price), None
-
-
-def compute_total_price(base_price: float, drink_code: str) -> float:
-    add = float(DRINK_PRICE.get((drink_code or "").strip(), 0.0))
-    return round(float(base_price) + add, 2)
-
-
-def generate_order_code(conn: sqlite3.Connection, office: str, d: date) -> str:
-    ymd = d.strftime("%Y%m%d")
-    like_prefix = f"{ORDER_PREFIX}-{ymd}-"
-    row = conn.execute(
-        """
-        SELECT order_code FROM orders
-        WHERE office=? AND order_date=? AND order_code LIKE ?
-        ORDER BY order_code DESC
-        LIMIT 1
-        """,
-        (office, d.isoformat(), like_prefix + "%"),
-    ).fetchone()
-
-    if not row:
-        seq = 1
-    else:
-        last = row["order_code"].split("-")[-1]
-        try:
-            seq = int(last) + 1
-        except ValueError:
-            seq = 1
-
-    return f"{ORDER_PREFIX}-{ymd}-{seq:03d}"
-
-
-def file_path(name: str) -> str:
-    return os.path.join(os.path.dirname(__file__), name)
-
-
-def validate_floor_for_office(office: str, floor: str | None) -> tuple[bool, str | None]:
-    """
-    Возвращает (ok, normalized_floor)
-    """
-    if office in FLOORS_BY_OFFICE:
-        allowed = set(FLOORS_BY_OFFICE[office])
-        if floor not in allowed:
-            return False, None
-        return True, floor
-    return True, None
-
-
-# ---------------------------
-# PWA minimal
-# ---------------------------
-@app.get("/manifest.webmanifest")
-def manifest():
-    import json
-    data = {
-        "name": APP_TITLE,
-        "short_name": "VOLGA Lunch",
-        "start_url": "/",
-        "display": "standalone",
-        "background_color": "#EDE7D3",
-        "theme_color": "#EDE7D3",
-        "icons": [{"src": "/icon.svg", "sizes": "any", "type": "image/svg+xml"}],
-    }
-    return Response(json.dumps(data, ensure_ascii=False), mimetype="application/manifest+json")
-
-
-@app.get("/icon.svg")
-def icon_svg():
-    svg = """<svg xmlns="http://www.w3.org/2000/svg" width="512" height="512" viewBox="0 0 512 512">
-<rect width="512" height="512" fill="#EDE7D3"/>
-<rect x="64" y="64" width="384" height="384" fill="#EDE7D3" stroke="#0E238E" stroke-width="14"/>
-<path d="M110 170 L402 110 L402 180 L110 240 Z" fill="#E73F24" opacity="0.95"/>
-<path d="M110 330 L402 270 L402 340 L110 400 Z" fill="#0E238E" opacity="0.95"/>
-<text x="256" y="290" font-family="Arial, sans-serif" font-size="64" text-anchor="middle" fill="#0E238E">VOLGA</text>
-</svg>"""
-    return Response(svg, mimetype="image/svg+xml")
-
-
-@app.get("/logo.png")
-def logo_png():
-    p = file_path("logo.png")
-    if not os.path.exists(p):
-        return Response("logo.png not found", status=404, mimetype="text/plain")
-    return send_file(p)
-
-
-@app.get("/banner.png")
-def banner_png():
-    p = file_path("banner.png")
-    if not os.path.exists(p):
-        return Response("banner.png not found", status=404, mimetype="text/plain")
-    return send_file(p)
-
-
-@app.get("/sw.js")
-def sw_js():
-    js = f"""
-const CACHE = 'volga-lunch-{APP_VERSION}';
-const ASSETS = ['/', '/edit', '/manifest.webmanifest', '/icon.svg', '/logo.png', '/banner.png'];
-
-self.addEventListener('install', (e) => {{
-  e.waitUntil(
-    caches.open(CACHE).then(cache => cache.addAll(ASSETS))
-  );
-  self.skipWaiting();
-}});
-
-self.addEventListener('activate', (e) => {{
-  e.waitUntil(
-    caches.keys().then(keys =>
-      Promise.all(
-        keys.filter(k => k !== CACHE).map(k => caches.delete(k))
-      )
-    )
-  );
-  self.clients.claim();
-}});
-
-self.addEventListener('fetch', (e) => {{
-  const url = new URL(e.request.url);
-
-  if (e.request.method === 'GET' && url.origin === self.location.origin) {{
-    e.respondWith(
-      fetch(e.request)
-        .then(resp => {{
-          const copy = resp.clone();
-          caches.open(CACHE).then(cache => cache.put(e.request, copy));
-          return resp;
-        }})
-        .catch(() => caches.match(e.request))
-    );
-  }}
-}});
-"""
-    return Response(js, mimetype="application/javascript")
-
-
-# ---------------------------
-# HTML shell
-# ---------------------------
-def html_page(body: str) -> str:
-    shell = """<!doctype html>
-<html lang="ru">
-<head>
-<meta charset="utf-8">
-<meta name="viewport" content="width=device-width, initial-scale=1">
-<title>VOLGA Lunch</title>
-
-<link rel="manifest" href="/manifest.webmanifest">
-<meta name="theme-color" content="#EDE7D3">
-
-<style>
-:root{
-  --volga-blue:#0E238E;
-  --volga-red:#E73F24;
-  --volga-burgundy:#8E2C1F;
-  --volga-bg:#EDE7D3;
-}
-
-*{ box-sizing:border-box; }
-
-body{
-  font-family:-apple-system, system-ui, Arial;
-  margin:18px;
-  background:var(--volga-bg);
-  color:var(--volga-blue);
-}
-
-.card{
-  background:transparent;
-  border:2px solid var(--volga-blue);
-  border-radius:0;
-  padding:28px;
-  margin:30px auto;
-  max-width:900px;
-  overflow:hidden;
-}
-
-h1{
-  color:var(--volga-blue);
-  font-weight:800;
-  letter-spacing:1px;
-  margin:0 0 14px 0;
-  line-height:1.0;
-}
-h1 small{
-  display:block;
-  color:var(--volga-red);
-  font-weight:800;
-  line-height:1.00;
-  margin-top:4px;
-}
-
-.hero-title{
-  text-align:center;
-  font-weight:800;
-  font-size:28px;
-  line-height:1.15;
-  letter-spacing:1px;
-  margin-bottom:14px;
-}
-.hero-title .ru{ color: var(--volga-blue); }
-.hero-title .en{ color: var(--volga-red); }
-
-label{
-  display:block;
-  margin:0 0 4px 0;
-  font-weight:800;
-  overflow-wrap:anywhere;
-  color:var(--volga-red);
-}
-
-input, select, textarea{
-  width:100%;
-  max-width:520px;
-  padding:12px;
-  margin:0;
-  font-size:16px;
-  background:var(--volga-bg);
-  color:var(--volga-blue);
-  border:2px solid var(--volga-blue);
-  border-radius:0;
-}
-
-input:focus, select:focus, textarea:focus{
-  outline:none;
-  border:2px solid var(--volga-blue);
-}
-
-.row{
-  display:grid;
-  grid-template-columns:minmax(0,1fr) minmax(0,1fr);
-  column-gap:18px;
-  row-gap:10px;
-  align-items:start;
-  margin-top:10px;
-}
-.row > div{
-  width:100%;
-  max-width:520px;
-}
-
-.muted{ color:var(--volga-burgundy); }
-.danger{ color:var(--volga-red); font-weight:800; }
-small{
-  display:block;
-  margin:2px 0 0 0;
-  line-height:1.1;
-  color:var(--volga-burgundy);
-}
-
-a{ color:var(--volga-blue); text-decoration:none; font-weight:700; }
-a:hover{ color:var(--volga-red); }
-
-.pill{
-  display:inline-block;
-  padding:6px 10px;
-  border-radius:999px;
-  border:1px solid var(--volga-blue);
-  margin-right:8px;
-  color:var(--volga-blue);
-}
-
-.lead{
-  color:var(--volga-blue);
-  text-align:center;
-  font-weight:900;
-  margin:12px 0 0 0;
-}
-.lead .en{ color:var(--volga-red); font-weight:800; }
-
-.hours{
-  margin:14px 0 0 0;
-  text-align:center;
-  font-weight:900;
-}
-.hours .ru{ color:var(--volga-blue); }
-.hours .en{ color:var(--volga-red); }
-
-.btn-confirm{
-  display:block;
-  width:100%;
-  max-width:520px;
-  padding:16px 24px;
-  font-size:16px;
-  font-weight:800;
-  background:var(--volga-blue);
-  color:var(--volga-bg);
-  border:none;
-  border-radius:0;
-  cursor:pointer;
-  transition:0.2s ease;
-}
-.btn-confirm:active{ background:var(--volga-red); }
-
-.btn-edit{
-  display:flex;
-  text-align:center;
-  align-items:center;
-  justify-content:center;
-  width:100%;
-  max-width:520px;
-  padding:16px 24px;
-  font-size:16px;
-  font-weight:800;
-  background:var(--volga-red);
-  color:var(--volga-bg);
-  border:none;
-  border-radius:0;
-  cursor:pointer;
-  transition:0.2s ease;
-  margin-top:18px;
-}
-.btn-edit:active{ background:var(--volga-blue); }
-
-.comment-block{ margin-top:18px; }
-
-.banner-block{
-  margin-top:18px;
-  margin-bottom:18px;
-}
-
-@media (max-width: 700px){
-  .card{ padding:20px; }
-  .row{ grid-template-columns:1fr; column-gap:0; row-gap:10px; margin-top:10px; }
-  .row > div{ max-width:none; }
-  input, select, textarea{ max-width:100%; }
-  h1{ letter-spacing:0.5px; }
-
-  input[type="date"]{
-    -webkit-appearance: none;
-    appearance: none;
-  }
-  #order_date{
-    width: 100%;
-    max-width: 100%;
-    min-width: 0;
-    display: block;
-    margin-left: 2px;
-    margin-right: 2px;
-  }
-}
-
-/* --- ADMIN BUTTONS STYLE --- */
-.btn-primary{
-  display:block;
-  width:100%;
-  margin-top:20px;
-  padding:14px 24px;
-  font-size:16px;
-  font-weight:700;
-  border:2px solid var(--volga-blue);
-  background:var(--volga-blue);
-  color:var(--volga-bg);
-  border-radius:0;
-  text-align:center;
-}
-.btn-primary:hover{ background:var(--volga-red); border-color:var(--volga-red); }
-.btn-primary:active{ background:var(--volga-red); border-color:var(--volga-red); }
-
-.btn-danger{
-  display:block;
-  width:100%;
-  margin-top:14px;
-  padding:14px 24px;
-  font-size:16px;
-  font-weight:700;
-  border:2px solid var(--volga-red);
-  background:var(--volga-red);
-  color:var(--volga-bg);
-  border-radius:0;
-  text-align:center;
-}
-.btn-danger:hover{ background:var(--volga-blue); border-color:var(--volga-blue); }
-.btn-danger:active{ background:var(--volga-blue); border-color:var(--volga-blue); }
-
-.admin-table{
-  width:100%;
-  border-collapse:collapse;
-  margin-top:10px;
-  font-size:14px;
-}
-.admin-table th,
-.admin-table td{
-  border:2px solid var(--volga-blue);
-  padding:8px 10px;
-  vertical-align:top;
-}
-.admin-table th{
-  background:var(--volga-bg);
-  color:var(--volga-blue);
-  text-align:left;
-  font-weight:800;
-}
-.admin-table td small{ color:var(--volga-burgundy); }
-.admin-table tbody tr:hover{
-  outline:2px solid var(--volga-red);
-  outline-offset:-2px;
-}
-@media (max-width: 700px){
-  .admin-table{ font-size:13px; }
-  .admin-table th.created,
-  .admin-table td.created{ display:none; }
-}
-</style>
-</head>
-<body>
-__BODY__
-
-<script>
-(function(){
-  // anti-double-submit
-  document.querySelectorAll('form').forEach((f) => {
-    f.addEventListener('submit', () => {
-      const btns = f.querySelectorAll('button[type="submit"]');
-      btns.forEach(b => {
-        b.disabled = true;
-        b.textContent = 'Отправка… / Sending…';
-      });
-    });
-  });
-
-  // service worker
-  if ('serviceWorker' in navigator) {
-    navigator.serviceWorker.register('/sw.js').catch(()=>{});
-  }
-})();
-</script>
-
-<style>
-/* === VOLGA POPUP (единый для всего) === */
-#volgaPopupOverlay{
-  position:fixed;
-  inset:0;
-  background:rgba(0,0,0,0.35);
-  display:none;
-  align-items:center;
-  justify-content:center;
-  z-index:9999;
-}
-
-#volgaPopupBox{
-  background:var(--volga-blue);
-  color:var(--volga-bg);
-  border:3px solid var(--volga-blue);
-  padding:20px 24px;
-  max-width:420px;
-  width:90%;
-  text-align:center;
-  font-weight:800;
-  line-height:1.4;
-}
-
-#volgaPopupBox button{
-  margin-top:14px;
-  padding:8px 18px;
-  border:2px solid var(--volga-bg);
-  background:var(--volga-red);
-  color:var(--volga-bg);
-  font-weight:800;
-  cursor:pointer;
-}
-</style>
-
-<div id="volgaPopupOverlay">
-  <div id="volgaPopupBox">
-    <div id="volgaPopupText"></div>
-    <button type="button" onclick="hideVolgaPopup()">OK</button>
-  </div>
-</div>
-
-<script>
-function showVolgaPopup(text){
-  const t = document.getElementById("volgaPopupText");
-  const o = document.getElementById("volgaPopupOverlay");
-  if (!t || !o) return;
-  t.innerHTML = text;
-  o.style.display = "flex";
-}
-function hideVolgaPopup(){
-  const o = document.getElementById("volgaPopupOverlay");
-  if (!o) return;
-  o.style.display = "none";
-}
-document.addEventListener("click", (e)=>{
-  const o = document.getElementById("volgaPopupOverlay");
-  if (!o) return;
-  if (e.target === o) hideVolgaPopup();
-});
-</script>
-<script>
-/* ====== FLOOR CHECK FIXED (NO SENDING FREEZE) ====== */
-(() => {
-  const form = document.querySelector('form[action="/order"]');
-  const officeEl = document.getElementById("office");
-  const floorEl = document.getElementById("floor");
-  const floorCell = document.getElementById("floorCell");
-
-  if (!form || !officeEl || !floorEl || !floorCell) return;
-  if (typeof showVolgaPopup !== "function") return;
-
-  function isAlameda(){
-    return (officeEl.value || "").trim() === "ALAMEDA";
-  }
-
-  function showFloorError(){
-    floorCell.style.display = "block";
-    showVolgaPopup(
-      "Пожалуйста, выберите этаж для ALAMEDA.<br><br>" +
-      "Please choose a floor for ALAMEDA."
-    );
-    floorEl.scrollIntoView({ behavior: "smooth", block: "center" });
-    setTimeout(() => floorEl.focus(), 150);
-  }
-
-  // ВАЖНО: третий параметр true — это фикс зависания
-  form.addEventListener("submit", (e) => {
-    if (isAlameda() && (!floorEl.value || floorEl.value.trim() === "")) {
-      e.preventDefault();
-      e.stopImmediatePropagation(); // не даем кнопке стать "Sending..."
-      showFloorError();
-    }
-  }, true);
-
-})();
-</script>
-<script>
-/* ====== DISH RULES CHECK (popup instead of server error) ====== */
-(() => {
-  const form = document.querySelector('form[action="/order"]');
-  if (!form) return;
-  if (typeof showVolgaPopup !== "function") return;
-
-  const z = document.getElementById("zakuska");
-  const s = document.getElementById("soup");
-  const h = document.getElementById("hot");
-  const d = document.getElementById("dessert");
-
-  if (!z || !s || !h || !d) return;
-
-  function has(el){
-    return !!(el.value && el.value.trim() !== "");
-  }
-
-  function focusEl(el){
-    el.scrollIntoView({ behavior: "smooth", block: "center" });
-    setTimeout(() => el.focus(), 150);
-  }
-
-  // Capture=true — чтобы сработать ДО anti-double-submit (и не было "Sending...")
-  form.addEventListener("submit", (e) => {
-    const hasZ = has(z);
-    const hasS = has(s);
-    const hasH = has(h);
-    const hasD = has(d);
-
-    const count = (hasZ?1:0) + (hasS?1:0) + (hasH?1:0) + (hasD?1:0);
-
-    // 1) Суп обязателен
-    if (!hasS){
-      e.preventDefault();
-      e.stopImmediatePropagation();
-      showVolgaPopup(
-        "Любая опция включает суп. Выберите пожалуйста суп.<br><br>" +
-        "All options come with soup. Please choose a soup."
-      );
-      focusEl(s);
-      return;
-    }
-
-    // 2) Ровно 3 блюда (суп + ещё 2)
-    if (count !== 3){
-      e.preventDefault();
-      e.stopImmediatePropagation();
-      showVolgaPopup(
-        "Нужно выбрать 3 блюда. Любая опция включает суп.<br><br>" +
-        "Please select 3 dishes. All options come with soup."
-      );
-      // подсказка куда смотреть
-      if (!hasZ) focusEl(z);
-      else if (!hasH) focusEl(h);
-      else if (!hasD) focusEl(d);
-      return;
-    }
-
-    // 3) Проверка корректной комбинации (opt1/opt2/opt3)
-    const isOpt1 = hasZ && hasS && hasD && !hasH; // zak + soup + dessert
-    const isOpt2 = !hasZ && hasS && hasH && hasD; // soup + hot + dessert
-    const isOpt3 = hasZ && hasS && hasH && !hasD; // zak + soup + hot
-
-    if (!(isOpt1 || isOpt2 || isOpt3)){
-      e.preventDefault();
-      e.stopImmediatePropagation();
-      showVolgaPopup(
-        "Комбинация выбрана неверно.<br>" +
-        "Выберите одну из опций (3 блюда).<br><br>" +
-        "Wrong combination. Please follow the options (3 dishes)."
-      );
-      focusEl(h); // обычно ошибка здесь, но можно и на баннер прокрутить
-      return;
-    }
-  }, true);
-})();
-</script>
-<script>
-/* ====== DISH LIMIT (макс 3 блюда) ====== */
-(function () {
-  const MAX_DISHES = 3;
-  const dishIds = ["zakuska", "soup", "hot", "dessert"];
-
-  const form = document.querySelector('form[action="/order"]') || document.querySelector("form");
-  if (!form) return;
-
-  const selects = dishIds
-    .map(id => document.getElementById(id))
-    .filter(Boolean);
-
-  function countSelected() {
-    let c = 0;
-    for (const s of selects) {
-      if (s.value && s.value.trim() !== "") c++;
-    }
-    return c;
-  }
-
-  for (const s of selects) {
-    s.dataset.prev = s.value || "";
-
-    s.addEventListener("focus", () => {
-      s.dataset.prev = s.value || "";
-    });
-
-    s.addEventListener("change", () => {
-      const c = countSelected();
-
-      if (c > MAX_DISHES) {
-        s.value = s.dataset.prev || "";
-        showVolgaPopup(
-          `Можно выбрать максимум ${MAX_DISHES} блюда. Любая опция включает суп. <br>` +
-          `You can select maximum ${MAX_DISHES} dishes. All options come with soup.`
-        );
-      } else {
-        s.dataset.prev = s.value || "";
-      }
-    });
-  }
-
-  form.addEventListener("submit", (e) => {
-    const c = countSelected();
-    if (c > MAX_DISHES) {
-      e.preventDefault();
-      showVolgaPopup(
-        `ОШИБКА: ВЫБРАНО ${c} БЛЮДА. МАКСИМУМ — ${MAX_DISHES}.<br><br>` +
-        `ERROR: ${c} DISHES SELECTED. MAXIMUM ALLOWED IS ${MAX_DISHES}.`
-      );
-    }
-  });
-})();
-</script>
-
-<script>
-/* ====== DATE VALIDATION (Tue–Fri, и правило 11:00) ====== */
-(() => {
-  const dateInput = document.getElementById("order_date");
-  if (!dateInput) return;
-
-  const form = dateInput.closest("form");
-  const CUT_OFF_HOUR = 11;
-
-  function pad(n){ return String(n).padStart(2,"0"); }
-  function ymd(d){ return `${d.getFullYear()}-${pad(d.getMonth()+1)}-${pad(d.getDate())}`; }
-
-  function isAllowedDay(d){
-    return d.getDay() >= 2 && d.getDay() <= 5; // Tue–Fri only
-  }
-
-  function startOfDay(d){
-    return new Date(d.getFullYear(), d.getMonth(), d.getDate());
-  }
-
-  function isAfterCutoff(now){
-    const hh = now.getHours();
-    const mm = now.getMinutes();
-    return (hh > CUT_OFF_HOUR) || (hh === CUT_OFF_HOUR && mm > 0);
-  }
-
-  function nextAllowedFrom(day0){
-    const x = new Date(day0.getFullYear(), day0.getMonth(), day0.getDate());
-    x.setDate(x.getDate() + 1);
-    while(!isAllowedDay(x)) x.setDate(x.getDate() + 1);
-    return x;
-  }
-
-  function allowedDateYMD(){
-    const now = new Date();
-    const today = startOfDay(now);
-
-    if (!isAfterCutoff(now) && isAllowedDay(today)) {
-      return ymd(today);
-    }
-    return ymd(nextAllowedFrom(today));
-  }
-
-  function validateOrderDate(selectedYMD){
-    if (!selectedYMD) return true;
-
-    const now = new Date();
-    const [Y,M,D] = selectedYMD.split("-").map(Number);
-    const sel = new Date(Y, M-1, D);
-    const today = startOfDay(now);
-
-    if (startOfDay(sel) < today){
-      showVolgaPopup("Вы выбрали прошедшую дату.<br><br>You can’t choose a past date.");
-      return false;
-    }
-
-    if (!isAllowedDay(sel)){
-      showVolgaPopup("Заказ доступен вторник–пятница.<br><br>Order available Tuesday–Friday only.");
-      return false;
-    }
-
-    const mustBe = allowedDateYMD();
-    if (selectedYMD !== mustBe){
-      showVolgaPopup(
-        "Дата заказа выбрана неверно.<br>" +
-        "До 11:00 можно заказать на сегодня.<br>" +
-        "После 11:00 — только на следующий рабочий день.<br><br>" +
-        "Wrong order date.<br>" +
-        "Before 11:00 you can order for today.<br>" +
-        "After 11:00 — only for the next working day."
-      );
-      return false;
-    }
-
-    return true;
-  }
-
-  function resetToAllowed(){
-    dateInput.value = allowedDateYMD();
-  }
-
-  dateInput.addEventListener("change", () => {
-    if(!validateOrderDate(dateInput.value)){
-      resetToAllowed();
-    }
-  });
-
-  if(form){
-    form.addEventListener("submit", (e)=>{
-      if(!validateOrderDate(dateInput.value)){
-        e.preventDefault();
-        resetToAllowed();
-      }
-    });
-  }
-})();
-</script>
-
-<script>
-/* ====== FLOOR (ALAMEDA only) ====== */
-(() => {
-  const officeEl = document.getElementById("office");
-  const floorCell = document.getElementById("floorCell");
-  const floorEl = document.getElementById("floor");
-  if (!officeEl || !floorCell || !floorEl) return;
-
-  function syncFloor(){
-    const isAlameda = officeEl.value === "ALAMEDA";
-    floorCell.style.display = isAlameda ? "block" : "none";
-    
-    if (!isAlameda) floorEl.value = "";
-  }
-
-  officeEl.addEventListener("change", syncFloor);
-  syncFloor();
-})();
-</script>
-
-
-
-</html>"""
-    return shell.replace("__BODY__", body)
-
-
-# ---------------------------
-# Routes
-# ---------------------------
-@app.get("/")
-def form():
-    default_date = compute_default_date()
-
-    office = request.args.get("office", OFFICES[0])
-    if office not in OFFICES:
-        office = OFFICES[0]
-
-    # ✅ если кто-то руками открыл MUSICA — на главной уводим на ALAMEDA
-    if office in INACTIVE_OFFICES:
-        office = OFFICES[0]
-
-    d_str = request.args.get("date", default_date.isoformat())
-    try:
-        d = date.fromisoformat(d_str)
-    except ValueError:
-        d = default_date
-
-    hot_items = hot_menu_with_special(office, d)
-    ok_time, start, end, now_ = validate_order_time(d)
-
-    conn = db()
-    ensure_columns(conn)
-    cnt = conn.execute(
-        "SELECT COUNT(*) as c FROM orders WHERE office=? AND order_date=? AND status='active'",
-        (office, d.isoformat()),
-    ).fetchone()["c"]
-    conn.close()
-
-    limit_reached = cnt >= MAX_PER_DAY
-
-    warn = ""
-    if is_closed_day(d):
-        warn += "<p class='danger'><b>В понедельник мы не работаем.</b><br><small>We are closed on Mondays.</small></p>"
-    if not ok_time and not is_closed_day(d):
-        warn += (
-            f"<p class='danger'><b>Приём заказов на {d.isoformat()} закрыт.</b><br>"
-            f"<small>Окно: {start.strftime('%d.%m %H:%M')} — {end.strftime('%d.%m %H:%M')} (Europe/Madrid). "
-            f"Сейчас: {now_.strftime('%d.%m %H:%M')}.</small></p>"
-        )
-    if limit_reached:
-        warn += "<p class='danger'><b>На выбранную дату заказы временно недоступны.</b><br><small>Orders are temporarily unavailable for this date.</small></p>"
-
-    # ✅ MUSICA disabled в выпадающем списке на главной
-    office_opts = "".join([
-        f"<option value='{o}' "
-        f"{'selected' if o==office else ''} "
-        f"{'disabled' if o in INACTIVE_OFFICES else ''}>"
-        f"{o}{' (temporarily unavailable)' if o in INACTIVE_OFFICES else ''}"
-        f"</option>"
-        for o in OFFICES
-    ])
-
-    drink_options = "".join([f"<option value='{k}'>{lbl}</option>" for (k, lbl, _) in DRINKS])
-
-    body = f"""
-<div style="text-align:center; margin-bottom:18px;">
-  <img src="/logo.png" alt="VOLGA" style="max-height:120px;">
-</div>
-
-<h1 class="hero-title">
-  <span class="ru">БИЗНЕС-ЛАНЧ RingCentral</span><br>
-  <span class="en">BUSINESS LUNCH RingCentral</span>
-</h1>
-
-<p class="lead">
-  Доставка в 13:00. Заказ до 11:00.<br>
-  <span class="en">Delivery at 13:00. Order before 11:00.</span>
-</p>
-
-<p class="hours">
-  <span class="ru">Вторник — Пятница</span><br>
-  <span class="en">Tuesday — Friday</span>
-</p>
-
-{warn}
-
-<div class="card">
-  <form method="post" action="/order" autocomplete="on">
-
-    <div class="row">
-      <div>
-        <label>Офис / Office</label>
-        <select id="office" name="office" required>{office_opts}</select>
-      </div>
-
-      <div id="floorCell" style="display:none;">
-        <label>Этаж / Floor</label>
-       <select id="floor" name="floor">
-  <option value="">— выбери этаж / choose floor —</option>
-  <option value="1st floor">1 этаж / 1st floor</option>
-  <option value="6th floor">6 этаж / 6th floor</option>
-</select>
-      </div>
-    </div>
-
-    <div class="row">
-      <div>
-        <label>Дата доставки / Delivery date</label>
-        <input id="order_date" type="date" name="order_date" value="{d.isoformat()}" required>
-      </div>
-      <div></div>
-    </div>
-
-    <div class="row">
-      <div>
-        <label>Как вас зовут / Your name</label>
-        <input name="name" required>
-      </div>
-      <div>
-        <label>Телефон / Phone</label>
-        <input name="phone" required>
-        <small>для связи и поиска заказа / for contact & order lookup</small>
-      </div>
-    </div>
-    <div class="banner-block">
-      <img src="/banner.png" alt="Options" style="width:100%; display:block; border:2px solid var(--volga-blue);">
-    </div>
-
-    <div class="row">
-      <div>
-        <label>Закуска / Starter</label>
-        <select id="zakuska" name="zakuska">
-          <option value="">— без закуски / no starter —</option>
-          {options_html(MENU["zakuska"])}
-        </select>
-      </div>
-      <div>
-        <label>Суп / Soup</label>
-        <select id="soup" name="soup" required>
-          <option value="">— выбери суп / choose soup —</option>
-          {options_html(MENU["soup"])}
-        </select>
-      </div>
-    </div>
-
-    <div class="row">
-      <div>
-        <label>Горячее / Main</label>
-        <select id="hot" name="hot">
-          <option value="">— без горячего / no main —</option>
-          {options_html(hot_items)}
-        </select>
-      </div>
-
-      <div>
-        <label>Десерт / Dessert</label>
-        <select id="dessert" name="dessert">
-          <option value="">— без десерта / no dessert —</option>
-          {options_html(MENU["dessert"])}
-        </select>
-      </div>
-    </div>
-
-    <div class="row">
-      <div>
-        <label>Напиток / Drink</label>
-        <select id="drink" name="drink">{drink_options}</select>
-        <small>оплачивается отдельно / not included</small>
-      </div>
-
-      <div>
-        <label>Хлеб / Bread</label>
-        <select id="bread" name="bread">
-          <option value="">— без хлеба / no bread —</option>
-          {options_html(BREAD_OPTIONS)}
-        </select>
-      </div>
-    </div>
-
-    <div class="comment-block">
-      <label>Комментарий / Notes</label>
-      <textarea name="comment" rows="3" placeholder=""></textarea>
-    </div>
-
-    <button type="submit" class="btn-confirm" style="margin-top:22px;">
-      Подтвердить заказ / Confirm order
-    </button>
-
-    <a href="/edit" class="btn-edit">
-      Изменить или отменить заказ / Edit or cancel
-    </a>
-  </form>
-</div>
-"""
-    return html_page(body)
-
-
-@app.post("/order")
-def order():
-    office = (request.form.get("office", "") or "").strip()
-    if office not in OFFICES:
-        return html_page("<p class='danger'>Ошибка: неизвестный офис / Unknown office.</p><p><a href='/'>Назад / Back</a></p>"), 400
-
-    # ✅ запрет новых заказов в MUSICA
-    if office in INACTIVE_OFFICES:
-        return html_page("<p class='danger'>Этот офис временно недоступен / This office is temporarily unavailable.</p><p><a href='/'>Назад / Back</a></p>"), 403
-
-    order_date = (request.form.get("order_date", "") or "").strip()
-    try:
-        d = date.fromisoformat(order_date)
-    except ValueError:
-        return html_page("<p class='danger'>Ошибка: неверная дата / Invalid date.</p><p><a href='/'>Назад / Back</a></p>"), 400
-
-    # ✅ этаж
-    floor = (request.form.get("floor", "") or "").strip() or None
-    ok_floor, floor = validate_floor_for_office(office, floor)
-    if not ok_floor:
-        return html_page("<p class='danger'>Выберите этаж (ALAMEDA) / Please choose floor (ALAMEDA).</p><p><a href='/'>Назад / Back</a></p>"), 400
-
-    ok_time, start, end, now_ = validate_order_time(d)
-    if not ok_time:
-        if is_closed_day(d):
-            return html_page("<p class='danger'><b>В понедельник мы не работаем.</b><br><small>We are closed on Mondays.</small></p><p><a href='/'>Назад / Back</a></p>"), 403
-        return html_page(
-            f"<p class='danger'><b>Приём заказов открыт на сегодня до 11:00. На завтра после 11:00. / Orders for today before 11:00. For tomorrow after 11:00.</b><br>"
-            f"<small>Доступно / Available: {start.strftime('%d.%m %H:%M')} — {end.strftime('%d.%m %H:%M')}. Сейчас / Now: {now_.strftime('%d.%m %H:%M')}.</small></p>"
-            f"<p><a href='/'>Назад / Back</a></p>"
-        ), 403
-
-    name = (request.form.get("name", "") or "").strip()
-    phone_raw = (request.form.get("phone", "") or "").strip()
-    phone_norm = normalize_phone(phone_raw)
-
-    zakuska = (request.form.get("zakuska", "") or "").strip() or None
-    soup = (request.form.get("soup", "") or "").strip()
-    hot = (request.form.get("hot", "") or "").strip() or None
-    dessert = (request.form.get("dessert", "") or "").strip() or None
-
-    drink_code = (request.form.get("drink", "") or "").strip()
-    if drink_code not in DRINK_PRICE:
-        drink_code = ""
-    drink_label = DRINK_LABEL.get(drink_code, "") if drink_code else None
-    drink_price = float(DRINK_PRICE.get(drink_code, 0.0))
-
-    bread = (request.form.get("bread", "") or "").strip() or None
-    comment = (request.form.get("comment", "") or "").strip() or None
-
-    if not name or not soup or not phone_norm:
-        return html_page("<p class='danger'>Ошибка: имя, телефон и суп обязательны / Name, phone and soup are required.</p><p><a href='/'>Назад / Back</a></p>"), 400
-
-    option_code, base_price, err = compute_option_base_price(zakuska, soup, hot, dessert, office, d)
-    if err:
-        return html_page(f"<p class='danger'>Ошибка: {err}</p><p><a href='/'>Назад / Back</a></p>"), 400
-
-    total_price = compute_total_price(base_price, drink_code)
-
-    conn = db()
-    ensure_columns(conn)
-    try:
-        conn.execute("BEGIN IMMEDIATE")
-
-        cnt = conn.execute(
-            "SELECT COUNT(*) as c FROM orders WHERE office=? AND order_date=? AND status='active'",
-            (office, d.isoformat()),
-        ).fetchone()["c"]
-        if cnt >= MAX_PER_DAY:
-            conn.execute("ROLLBACK")
-            return html_page("<p class='danger'><b>Заказы на выбранную дату временно недоступны.</b><br><small>Orders are temporarily unavailable for this date.</small></p><p><a href='/'>Назад / Back</a></p>"), 409
-
-        existing = conn.execute(
-            "SELECT * FROM orders WHERE office=? AND order_date=? AND phone_norm=? AND status='active'",
-            (office, d.isoformat(), phone_norm),
-        ).fetchone()
-        if existing:
-            conn.execute("ROLLBACK")
-            return html_page(
-                f"""
-                <h2 class="danger">⛔ Заказ уже существует / Order already exists</h2>
-                <div class="card">
-                  <p>На этот телефон уже оформлен активный заказ на <b>{d.isoformat()}</b> ({office}).</p>
-                  <p><small>An active order already exists for this phone on <b>{d.isoformat()}</b> ({office}).</small></p>
-                  <p><span class="pill">Номер / Code: {existing['order_code']}</span>
-                     <span class="pill">Итого / Total: {existing['price_eur']}€</span></p>
-                  <p><a href="/edit?office={office}&date={d.isoformat()}&phone={phone_raw}">Открыть / Open /edit</a></p>
-                </div>
-                <p><a href="/">Назад / Back</a></p>
-                """
-            ), 409
-
-        order_code = generate_order_code(conn, office, d)
-
-        conn.execute(
-            """
-            INSERT INTO orders(
-              order_code, office, order_date, floor,
-              name, phone_raw, phone_norm,
-              zakuska, soup, hot, dessert,
-              drink_code, drink_label, drink_price_eur,
-              bread,
-              option_code, price_eur, comment, status, created_at
-            )
-            VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
-            """,
-            (
-                order_code, office, d.isoformat(), floor,
-                name, phone_raw, phone_norm,
-                zakuska, soup, hot, dessert,
-                drink_code or None, drink_label, drink_price if drink_code else None,
-                bread,
-                option_code, float(total_price), comment,
-                "active", datetime.utcnow().isoformat()
-            ),
-        )
-
-        conn.commit()
-    finally:
-        conn.close()
-
-    opt_human = {"opt1": "Опция 1 / Option 1", "opt2": "Опция 2 / Option 2", "opt3": "Опция 3 / Option 3"}[option_code]
-    drink_line = f"{drink_label} (+{drink_price}€)" if drink_code else "—"
-
-    floor_line = f"{floor}" if floor else "—"
-
-    return html_page(
-        f"""
-      <h2>✅ Заказ принят / Order confirmed</h2>
-      <div class="card">
-        <p><span class="pill"><b>{order_code}</b></span></p>
-        <p><b>{name}</b> — {office} — <span class="muted">{phone_raw}</span></p>
-        <p>Этаж / Floor: <b>{floor_line}</b></p>
-        <p>Дата доставки / Delivery date: <b>{d.isoformat()}</b> (13:00)</p>
-        <p><span class="pill">{opt_human}</span><span class="pill">Итого / Total: {total_price}€</span></p>
-        <ul>
-          <li>Суп / Soup: {soup}</li>
-          <li>Закуска / Starter: {zakuska or "—"}</li>
-          <li>Горячее / Main: {hot or "—"}</li>
-          <li>Десерт / Dessert: {dessert or "—"}</li>
-          <li>Напиток / Drink: {drink_line}</li>
-          <li>Хлеб / Bread: {bread or "—"}</li>
-        </ul>
-        <p class="muted">Комментарий / Notes: {comment or "—"}</p>
-        <p><a class="btn-secondary" href="/edit?office={office}&date={d.isoformat()}&phone={phone_raw}">Изменить / отменить / Edit / cancel</a></p>
-      </div>
-      <p><a href="/">Новый заказ / New order</a></p>
-    """
-    )
-
-
-# ---------------------------
-# Edit / Cancel
-# ---------------------------
-@app.get("/edit")
-def edit_get():
-    default_date = compute_default_date()
-
-    office = request.args.get("office", OFFICES[0])
-    if office not in OFFICES:
-        office = OFFICES[0]
-
-    d_str = request.args.get("date", default_date.isoformat())
-    try:
-        d = date.fromisoformat(d_str)
-    except ValueError:
-        d = default_date
-
-    phone_raw = (request.args.get("phone", "") or "").strip()
-    phone_norm = normalize_phone(phone_raw) if phone_raw else ""
-
-    found = None
-    conn = db()
-    ensure_columns(conn)
-    if phone_norm:
-        found = conn.execute(
-            "SELECT * FROM orders WHERE office=? AND order_date=? AND phone_norm=? AND status='active'",
-            (office, d.isoformat(), phone_norm),
-        ).fetchone()
-    conn.close()
-
-    ok_time, start, end, now_ = validate_order_time(d)
-
-    # в edit/admin офисы НЕ отключаем в селекте (чтобы смотреть старые заказы)
-    office_opts = "".join([f"<option value='{o}' {'selected' if o==office else ''}>{o}</option>" for o in OFFICES])
-
-    drink_options = ""
-    for (k, lbl, _) in DRINKS:
-        sel = ""
-        if found and (found["drink_code"] or "") == (k or ""):
-            sel = "selected"
-        drink_options += f"<option value='{k}' {sel}>{lbl}</option>"
-
-    if found:
-        hot_items = hot_menu_with_special(office, d)
-
-        floor_edit_block = ""
-        if office in FLOORS_BY_OFFICE:
-            fval = (found["floor"] or "")
-            floor_edit_block = f"""
-            <div class="row" style="margin-top:10px;">
-              <div>
-                <label>Этаж (ALAMEDA) / Floor</label>
-                <select name="floor" required>
-                  <option value="">— choose floor —</option>
-                  <option value="1st floor" {"selected" if fval=="1st floor" else ""}>1st floor</option>
-                  <option value="6th floor" {"selected" if fval=="6th floor" else ""}>6th floor</option>
-                </select>
-              </div>
-              <div></div>
-            </div>
-            """
-
-        body = f"""
-        <h1>Изменить / отменить заказ<br><small>Edit / cancel order</small></h1>
-        <div class="card">
-          <p><span class="pill"><b>{found['order_code']}</b></span>
-             <span class="pill">Доставка / Delivery: {d.isoformat()} 13:00</span></p>
-
-          <p class="muted">Окно изменений / Edit window:
-            <b>{start.strftime('%d.%m %H:%M')}</b> — <b>{end.strftime('%d.%m %H:%M')}</b>.
-            Сейчас / Now: <b>{now_.strftime('%d.%m %H:%M')}</b>.
-          </p>
-          {"<p class='danger'><b>Сейчас окно закрыто — изменения/отмена недоступны.</b><br><small>Window is closed — edit/cancel unavailable.</small></p>" if not ok_time else ""}
-
-          <form method="post" action="/edit">
-            <input type="hidden" name="office" value="{office}">
-            <input type="hidden" name="order_date" value="{d.isoformat()}">
-            <input type="hidden" name="phone" value="{found['phone_raw']}">
-
-            <label>Как вас зовут / Your name</label>
-            <input name="name" value="{found['name']}" required>
-
-            {floor_edit_block}
-
-            <div class="row">
-              <div>
-                <label>Закуска / Starter</label>
-                <select name="zakuska">
-                  <option value="" {"selected" if not found["zakuska"] else ""}>— без закуски / no starter —</option>
-                  {options_html(MENU["zakuska"])}
-                </select>
-              </div>
-              <div>
-                <label>Суп / Soup</label>
-                <select name="soup" required>
-                  <option value="">— выбери суп / choose soup —</option>
-                  {options_html(MENU["soup"])}
-                </select>
-              </div>
-            </div>
-
-            <div class="row">
-              <div>
-                <label>Горячее / Main</label>
-                <select name="hot">
-                  <option value="" {"selected" if not found["hot"] else ""}>— без горячего / no main —</option>
-                  {options_html(hot_items)}
-                </select>
-              </div>
-              <div>
-                <label>Десерт / Dessert</label>
-                <select name="dessert">
-                  <option value="" {"selected" if not found["dessert"] else ""}>— без десерта / no dessert —</option>
-                  {options_html(MENU["dessert"])}
-                </select>
-              </div>
-            </div>
-
-            <label>Напиток / Drink </label>
-            <select name="drink">{drink_options}</select>
-            <small>оплачивается отдельно / not included</small>
-
-            <label style="margin-top:16px;">Хлеб / Bread </label>
-            <select name="bread">
-              <option value="" {"selected" if not found["bread"] else ""}>— без хлеба / no bread —</option>
-              {options_html(BREAD_OPTIONS)}
-            </select>
-
-            <label>Комментарий / Notes</label>
-            <textarea name="comment" rows="3">{found["comment"] or ""}</textarea>
-
-            <button type="submit" class="btn-primary">Сохранить / Save</button>
-          </form>
-
-          <form method="post" action="/cancel" style="margin-top:12px;">
-            <input type="hidden" name="office" value="{office}">
-            <input type="hidden" name="order_date" value="{d.isoformat()}">
-            <input type="hidden" name="phone" value="{found['phone_raw']}">
-            <button type="submit" class="btn-danger">Отменить заказ / Cancel</button>
-          </form>
-
-          <p style="margin-top:16px;"><a href="/">← На главную / Home</a></p>
-        </div>
-        """
-        return html_page(body)
-
-    body = f"""
-<h1>Изменить / отменить заказ<br><small>Edit / cancel order</small></h1>
-
-<div class="card volga-card">
-  <form method="get" action="/edit" class="volga-form">
-    <div class="row">
-      <div>
-        <label>Офис / Office</label>
-        <select name="office" required>{office_opts}</select>
-      </div>
-      <div>
-        <label>Дата доставки / Delivery date</label>
-        <input type="date" name="date" value="{d.isoformat()}" required>
-      </div>
-    </div>
-
-    <label>Телефон (как в заказе) / Phone (as in order)</label>
-    <input name="phone" value="{phone_raw}" placeholder="" required>
-
-    <button type="submit" class="btn-primary">
-      Найти заказ / Find order
-    </button>
-  </form>
-
-  <p class="muted">Если заказ не найден — проверь офис, дату и телефон.<br>
-  <small>If not found — check office, date and phone.</small></p>
-
-  <p><a href="/">← На главную / Home</a></p>
-</div>
-"""
-    return html_page(body)
-
-
-@app.post("/edit")
-def edit_post():
-    office = (request.form.get("office", "") or "").strip()
-    if office not in OFFICES:
-        return html_page("<p class='danger'>Ошибка: неизвестный офис / Unknown office.</p><p><a href='/edit'>Назад / Back</a></p>"), 400
-
-    order_date = (request.form.get("order_date", "") or "").strip()
-    try:
-        d = date.fromisoformat(order_date)
-    except ValueError:
-        return html_page("<p class='danger'>Ошибка: неверная дата / Invalid date.</p><p><a href='/edit'>Назад / Back</a></p>"), 400
-
-    ok_time, start, end, now_ = validate_order_time(d)
-    if not ok_time:
-        if is_closed_day(d):
-            return html_page("<p class='danger'><b>В понедельник мы не работаем.</b><br><small>We are closed on Mondays.</small></p><p><a href='/edit'>Назад / Back</a></p>"), 403
-        return html_page(
-            f"<p class='danger'><b>Окно редактирования закрыто.</b><br>"
-            f"<small>Окно: {start.strftime('%d.%m %H:%M')} — {end.strftime('%d.%m %H:%M')}. Сейчас: {now_.strftime('%d.%m %H:%M')}.</small></p>"
-            f"<p><a href='/edit'>Назад / Back</a></p>"
-        ), 403
-
-    phone_raw = (request.form.get("phone", "") or "").strip()
-    phone_norm = normalize_phone(phone_raw)
-    if not phone_norm:
-        return html_page("<p class='danger'>Ошибка: телефон обязателен / Phone is required.</p><p><a href='/edit'>Назад / Back</a></p>"), 400
-
-    name = (request.form.get("name", "") or "").strip()
-    zakuska = (request.form.get("zakuska", "") or "").strip() or None
-    soup = (request.form.get("soup", "") or "").strip()
-    hot = (request.form.get("hot", "") or "").strip() or None
-    dessert = (request.form.get("dessert", "") or "").strip() or None
-
-    # ✅ этаж (если нужен)
-    floor = (request.form.get("floor", "") or "").strip() or None
-    ok_floor, floor = validate_floor_for_office(office, floor)
-    if not ok_floor:
-        return html_page("<p class='danger'>Выберите этаж (ALAMEDA) / Please choose floor (ALAMEDA).</p><p><a href='/edit'>Назад / Back</a></p>"), 400
-
-    drink_code = (request.form.get("drink", "") or "").strip()
-    if drink_code not in DRINK_PRICE:
-        drink_code = ""
-    drink_label = DRINK_LABEL.get(drink_code, "") if drink_code else None
-    drink_price = float(DRINK_PRICE.get(drink_code, 0.0))
-
-    bread = (request.form.get("bread", "") or "").strip() or None
-    comment = (request.form.get("comment", "") or "").strip() or None
-
-    if not name or not soup:
-        return html_page("<p class='danger'>Ошибка: имя и суп обязательны / Name and soup are required.</p><p><a href='/edit'>Назад / Back</a></p>"), 400
-
-    option_code, base_price, err = compute_option_base_price(zakuska, soup, hot, dessert, office, d)
-    if err:
-        return html_page(f"<p class='danger'>Ошибка: {err}</p><p><a href='/edit'>Назад / Back</a></p>"), 400
-
-    total_price = compute_total_price(base_price, drink_code)
-
-    conn = db()
-    ensure_columns(conn)
-
-    existing = conn.execute(
-        "SELECT * FROM orders WHERE office=? AND order_date=? AND phone_norm=? AND status='active'",
-        (office, d.isoformat(), phone_norm),
-    ).fetchone()
-
-    if not existing:
-        conn.close()
-        return html_page("<p class='danger'>Активный заказ не найден / Active order not found.</p><p><a href='/edit'>Назад / Back</a></p>"), 404
-
-    conn.execute(
-        """
-        UPDATE orders
-        SET name=?, floor=?, zakuska=?, soup=?, hot=?, dessert=?,
-            drink_code=?, drink_label=?, drink_price_eur=?,
-            bread=?, option_code=?, price_eur=?, comment=?
-        WHERE id=?
-        """,
-        (
-            name, floor, zakuska, soup, hot, dessert,
-            drink_code or None, drink_label, drink_price if drink_code else None,
-            bread, option_code, float(total_price), comment,
-            existing["id"],
-        ),
-    )
-    conn.commit()
-    conn.close()
-
-    opt_human = {"opt1": "Опция 1 / Option 1", "opt2": "Опция 2 / Option 2", "opt3": "Опция 3 / Option 3"}[option_code]
-    drink_line = f"{drink_label} (+{drink_price}€)" if drink_code else "—"
-    floor_line = floor or "—"
-
-    return html_page(
-        f"""
-      <h2>✅ Изменения сохранены / Saved</h2>
-      <div class="card">
-        <p><span class="pill"><b>{existing['order_code']}</b></span></p>
-        <p><b>{name}</b> — {office} — <span class="muted">{existing['phone_raw']}</span></p>
-        <p>Этаж / Floor: <b>{floor_line}</b></p>
-        <p>Дата доставки / Delivery date: <b>{d.isoformat()}</b> (13:00)</p>
-        <p><span class="pill">{opt_human}</span><span class="pill">Итого / Total: {total_price}€</span></p>
-        <ul>
-          <li>Суп / Soup: {soup}</li>
-          <li>Закуска / Starter: {zakuska or "—"}</li>
-          <li>Горячее / Main: {hot or "—"}</li>
-          <li>Десерт / Dessert: {dessert or "—"}</li>
-          <li>Напиток / Drink: {drink_line}</li>
-          <li>Хлеб / Bread: {bread or "—"}</li>
-        </ul>
-        <p class="muted">Комментарий / Notes: {comment or "—"}</p>
-      </div>
-      <p><a href="/">← На главную / Home</a></p>
-    """
-    )
-
-
-@app.post("/cancel")
-def cancel_post():
-    office = (request.form.get("office", "") or "").strip()
-    if office not in OFFICES:
-        return html_page("<p class='danger'>Ошибка: неизвестный офис / Unknown office.</p><p><a href='/edit'>Назад / Back</a></p>"), 400
-
-    order_date = (request.form.get("order_date", "") or "").strip()
-    try:
-        d = date.fromisoformat(order_date)
-    except ValueError:
-        return html_page("<p class='danger'>Ошибка: неверная дата / Invalid date.</p><p><a href='/edit'>Назад / Back</a></p>"), 400
-
-    ok_time, start, end, now_ = validate_order_time(d)
-    if not ok_time:
-        if is_closed_day(d):
-            return html_page("<p class='danger'><b>В понедельник мы не работаем.</b><br><small>We are closed on Mondays.</small></p><p><a href='/edit'>Назад / Back</a></p>"), 403
-        return html_page(
-            f"<p class='danger'><b>Окно отмены закрыто.</b><br>"
-            f"<small>Окно: {start.strftime('%d.%m %H:%M')} — {end.strftime('%d.%m %H:%M')}. Сейчас: {now_.strftime('%d.%m %H:%M')}.</small></p>"
-            f"<p><a href='/edit'>Назад / Back</a></p>"
-        ), 403
-
-    phone_raw = (request.form.get("phone", "") or "").strip()
-    phone_norm = normalize_phone(phone_raw)
-    if not phone_norm:
-        return html_page("<p class='danger'>Ошибка: телефон обязателен / Phone is required.</p><p><a href='/edit'>Назад / Back</a></p>"), 400
-
-    conn = db()
-    ensure_columns(conn)
-
-    existing = conn.execute(
-        "SELECT * FROM orders WHERE office=? AND order_date=? AND phone_norm=? AND status='active'",
-        (office, d.isoformat(), phone_norm),
-    ).fetchone()
-
-    if not existing:
-        conn.close()
-        return html_page("<p class='danger'>Активный заказ не найден / Active order not found.</p><p><a href='/edit'>Назад / Back</a></p>"), 404
-
-    conn.execute("UPDATE orders SET status='cancelled' WHERE id=?", (existing["id"],))
-    conn.commit()
-    conn.close()
-
-    return html_page(
-        f"""
-      <h2>🗑 Заказ отменён / Order cancelled</h2>
-      <div class="card">
-        <p><span class="pill"><b>{existing['order_code']}</b></span></p>
-        <p><b>{existing['name']}</b> — {office} — <span class="muted">{existing['phone_raw']}</span></p>
-        <p>Дата доставки / Delivery date: <b>{d.isoformat()}</b> (13:00)</p>
-      </div>
-      <p><a href="/">← На главную / Home</a></p>
-    """
-    )
-
-
-# ===========================
-# Admin v2 (Grouped by Floor) + Special management + CSV + Print
-# ===========================
-
-def _ru_only(s: str) -> str:
-    s = "" if s is None else str(s)
-    return s.split(" / ")[0].strip()
-
-SHORT = {
-    "Оливье": "Оливье",
-    "Винегрет": "Винегрет",
-    "Икра из баклажанов": "Икра",
-    "Паштет из куриной печени": "Паштет",
-    "Шуба": "Шуба",
-
-    "Борщ": "Борщ",
-    "Солянка сборная мясная": "Солянка",
-    "Куриный суп с лапшой и яйцом": "Кур. суп",
-
-    "Куриные котлеты с пюре": "Котл+пюре",
-    "Куриные котлеты с гречкой": "Котл+греча",
-    "Вареники с картошкой": "Вареники",
-    "Пельмени со сметаной": "Пельмени",
-    "Плов с бараниной (+3€)": "Плов",
-
-    "Торт Наполеон": "Наполеон",
-    "Пирожное Картошка": "Картошка",
-    "Трубочка со сгущенкой": "Трубочка",
-
-    "Белый": "Хлеб белый",
-    "Чёрный": "Хлеб чёрный",
-}
-
-def _short_name(s: str) -> str:
-    ru = _ru_only(s)
-    return SHORT.get(ru, ru)
-
-def _fmt_money(x):
-    try:
-        return f"{float(x):.2f}€"
-    except Exception:
-        return f"{x}€"
-
-def _floor_norm(f: str | None) -> str:
-    f = (f or "").strip()
-    if not f:
-        return "Без этажа"
-    return f
-
-def _floor_sort_key(k: str):
-    # Поддержим оба формата
-    kk = (k or "").lower()
-    if "1st" in kk or "1 этаж" in kk:
-        return (0, 1)
-    if "6th" in kk or "6 этаж" in kk:
-        return (0, 6)
-    if "без" in kk:
-        return (2, 999)
-    return (1, k)
-
-def _rows_table_v2(rows):
-    head = """
-    <table class="admin-table">
-      <thead>
-        <tr>
-          <th>Код</th>
-          <th>Имя</th>
-          <th>Телефон</th>
-          <th>Этаж</th>
-          <th>Итого</th>
-          <th>Суп</th>
-          <th>Закуска</th>
-          <th>Горячее</th>
-          <th>Десерт</th>
-          <th>Напиток</th>
-          <th>Хлеб</th>
-          <th>Комментарий</th>
-        </tr>
-      </thead>
-      <tbody>
-    """
-    if not rows:
-        return head + "<tr><td colspan='12' class='muted'>—</td></tr></tbody></table>"
-
-    body = ""
-    for r in rows:
-        drink = "—"
-        if r["drink_label"]:
-            dp = r["drink_price_eur"] or 0
-            drink = f"{_ru_only(r['drink_label'])} (+{float(dp):.2f}€)"
-        body += f"""
-        <tr>
-          <td><b>{r['order_code']}</b></td>
-          <td>{r['name']}</td>
-          <td>{r['phone_raw']}</td>
-          <td>{_floor_norm(r['floor'])}</td>
-          <td><b>{_fmt_money(r['price_eur'])}</b></td>
-          <td>{_short_name(r['soup']) if r['soup'] else '—'}</td>
-          <td>{_short_name(r['zakuska']) if r['zakuska'] else '—'}</td>
-          <td>{_short_name(r['hot']) if r['hot'] else '—'}</td>
-          <td>{_short_name(r['dessert']) if r['dessert'] else '—'}</td>
-          <td>{drink}</td>
-          <td>{_short_name(r['bread']) if r['bread'] else '—'}</td>
-          <td>{r['comment'] or '—'}</td>
-        </tr>
-        """
-    return head + body + "</tbody></table>"
-
-def _summary_counts(rows):
-    opt_counts = {"opt1": 0, "opt2": 0, "opt3": 0}
-    dish_counts = {}
-    drink_counts = {}
-
-    for r in rows:
-        if r["option_code"] in opt_counts:
-            opt_counts[r["option_code"]] += 1
-
-        for k in ["soup", "zakuska", "hot", "dessert", "bread"]:
-            v = r[k]
-            if v:
-                vv = _short_name(v)
-                dish_counts[vv] = dish_counts.get(vv, 0) + 1
-
-        if r["drink_label"]:
-            dd = _ru_only(r["drink_label"])
-            drink_counts[dd] = drink_counts.get(dd, 0) + 1
-
-    return opt_counts, dish_counts, drink_counts
-
-def _simple_table(title: str, counts: dict) -> str:
-    rows_html = ""
-    for k, v in sorted(counts.items(), key=lambda x: (-x[1], x[0])):
-        rows_html += f"<tr><td>{k}</td><td style='text-align:right;'><b>{v}</b></td></tr>"
-    if not rows_html:
-        rows_html = "<tr><td colspan='2' class='muted'>—</td></tr>"
-
-    return f"""
-    <div class="card">
-      <h3 style="margin:0 0 10px 0;">{title}</h3>
-      <table class="admin-table">
-        <thead><tr><th>Позиция</th><th style="text-align:right;">Кол-во</th></tr></thead>
-        <tbody>{rows_html}</tbody>
-      </table>
-    </div>
-    """
-
-def _active_by_floor(rows):
-    g = {}
-    for r in rows:
-        k = _floor_norm(r["floor"])
-        g.setdefault(k, []).append(r)
-    return g
-
-
-@app.get("/admin")
-def admin_v2():
-    if not check_admin():
-        return html_page("<h2>⛔ Нет доступа</h2><p>Нужен token.</p>"), 403
-
-    office = request.args.get("office", OFFICES[0])
-    if office not in OFFICES:
-        office = OFFICES[0]
-
-    d_str = request.args.get("date", date.today().isoformat())
-    try:
-        d = date.fromisoformat(d_str)
-    except ValueError:
-        d = date.today()
-
-    conn = db()
-    ensure_columns(conn)
-
-    active_rows = conn.execute(
-        """
-        SELECT * FROM orders
-        WHERE office=? AND order_date=? AND status='active'
-        ORDER BY created_at ASC
-        """,
-        (office, d.isoformat()),
-    ).fetchall()
-
-    cancelled_rows = conn.execute(
-        """
-        SELECT * FROM orders
-        WHERE office=? AND order_date=? AND status='cancelled'
-        ORDER BY created_at ASC
-        """,
-        (office, d.isoformat()),
-    ).fetchall()
-
-    conn.close()
-
-    active_groups = _active_by_floor(active_rows)
-    opt_counts, dish_counts, drink_counts = _summary_counts(active_rows)
-
-    office_opts = "".join([f"<option value='{o}' {'selected' if o==office else ''}>{o}</option>" for o in OFFICES])
-
-    # Блок активных, сгруппированных по этажу
-    active_html = ""
-    for floor_name in sorted(active_groups.keys(), key=_floor_sort_key):
-        rr = active_groups[floor_name]
-        active_html += f"""
-        <div class="card">
-          <div style="display:flex; align-items:baseline; justify-content:space-between; gap:10px; flex-wrap:wrap;">
-            <h3 style="margin:0;">Активные — {floor_name}</h3>
-            <div class="muted" style="font-weight:800;">{len(rr)} шт.</div>
-          </div>
-
-          <div class="no-print" style="margin-top:10px; display:flex; gap:10px; flex-wrap:wrap;">
-            <a class="btn-primary" href="/admin/print?office={office}&date={d.isoformat()}&floor={floor_name}&token={ADMIN_TOKEN}">
-              🖨 Печать: {floor_name}
-            </a>
-          </div>
-
-          {_rows_table_v2(rr)}
-        </div>
-        """
-
-    body = f"""
-    <h1>Админка</h1>
-
-    <div class="card">
-      <form method="get" action="/admin">
-        <input type="hidden" name="token" value="{ADMIN_TOKEN}">
-        <div class="row">
-          <div>
-            <label>Офис</label>
-            <select name="office">{office_opts}</select>
-          </div>
-          <div>
-            <label>Дата</label>
-            <input type="date" name="date" value="{d.isoformat()}">
-          </div>
-        </div>
-        <button class="btn-primary" type="submit">Показать</button>
-      </form>
-
-      <p style="margin-top:14px;">
-        <a href="/export.csv?office={office}&date={d.isoformat()}&token={ADMIN_TOKEN}">
-          ⬇️ Выгрузка CSV (активные)
-        </a>
-        &nbsp;|&nbsp;
-        <a href="/admin/print?office={office}&date={d.isoformat()}&token={ADMIN_TOKEN}">
-          🖨 Печать активных (все)
-        </a>
-        &nbsp;|&nbsp;
-        <a href="/admin/summary?office={office}&date={d.isoformat()}&token={ADMIN_TOKEN}">
-          🧾 Сводка (печать)
-        </a>
-        &nbsp;|&nbsp;
-        <a href="/admin/specials?office={office}&date={d.isoformat()}&token={ADMIN_TOKEN}">
-          ⭐ Блюдо недели (управление)
-        </a>
-      </p>
-
-      <p>
-        <span class="pill">Опция 1: {opt_counts.get('opt1',0)}</span>
-        <span class="pill">Опция 2: {opt_counts.get('opt2',0)}</span>
-        <span class="pill">Опция 3: {opt_counts.get('opt3',0)}</span>
-      </p>
-    </div>
-
-    {active_html}
-
-    <div class="card">
-      <h3>Отменённые заказы</h3>
-      {_rows_table_v2(cancelled_rows)}
-    </div>
-
-    {_simple_table("Сводка по блюдам (активные)", dish_counts)}
-    {_simple_table("Сводка по напиткам (активные)", drink_counts)}
-    """
-    return html_page(body)
-
-
-# --- Summary page (kitchen/bar) ---
-ADMIN_SUMMARY_CSS = """
-<style>
-  @media print {
-    .no-print { display:none !important; }
-    body { margin:0; }
-    .card { border:none; margin:0; padding:0; }
-    a { color:#000; text-decoration:none; }
-  }
-</style>
-"""
-
-@app.get("/admin/summary")
-def admin_summary_v2():
-    if not check_admin():
-        return html_page("<h2>⛔ Нет доступа</h2><p>Нужен token.</p>"), 403
-
-    office = request.args.get("office", OFFICES[0])
-    if office not in OFFICES:
-        office = OFFICES[0]
-
-    d_str = request.args.get("date", date.today().isoformat())
-    try:
-        d = date.fromisoformat(d_str)
-    except ValueError:
-        d = date.today()
-
-    conn = db()
-    ensure_columns(conn)
-
-    rows = conn.execute(
-        """
-        SELECT option_code, soup, zakuska, hot, dessert, bread, drink_label
-        FROM orders
-        WHERE office=? AND order_date=? AND status='active'
-        """,
-        (office, d.isoformat()),
-    ).fetchall()
-    conn.close()
-
-    # превратим в “как будто полные rows”
-    fake = []
-    for r in rows:
-        fake.append({
-            "option_code": r["option_code"],
-            "soup": r["soup"], "zakuska": r["zakuska"], "hot": r["hot"], "dessert": r["dessert"], "bread": r["bread"],
-            "drink_label": r["drink_label"],
-        })
-    # быстро переиспользуем summary_counts, но он ждёт dict-like с ключами.
-    # проще: пересчитаем здесь напрямую.
-    dish_counts = {}
-    drink_counts = {}
-    for r in rows:
-        for k in ["soup", "zakuska", "hot", "dessert", "bread"]:
-            v = r[k]
-            if v:
-                vv = _short_name(v)
-                dish_counts[vv] = dish_counts.get(vv, 0) + 1
-        if r["drink_label"]:
-            dd = _ru_only(r["drink_label"])
-            drink_counts[dd] = drink_counts.get(dd, 0) + 1
-
-    body = f"""
-    {ADMIN_SUMMARY_CSS}
-    <h1>Сводка (кухня/бар)</h1>
-
-    <div class="card">
-      <p><b>Офис:</b> {office} &nbsp; | &nbsp; <b>Дата:</b> {d.isoformat()}</p>
-
-      <div class="no-print" style="margin-top:12px; display:flex; gap:10px; flex-wrap:wrap;">
-        <a class="btn-primary" href="/admin?office={office}&date={d.isoformat()}&token={ADMIN_TOKEN}">← Назад в админку</a>
-        <button class="btn-primary" type="button" onclick="window.print()">Печать / PDF</button>
-      </div>
-
-      <div style="margin-top:16px;">
-        {_simple_table("Блюда (активные)", dish_counts)}
-      </div>
-
-      <div style="margin-top:18px;">
-        {_simple_table("Напитки (активные)", drink_counts)}
-      </div>
-    </div>
-    """
-    return html_page(body)
-
-
-# --- Print active (all or by floor) ---
-ADMIN_PRINT_CSS = """
-<style>
-  @media print{
-    body{ margin:0; background:#fff !important; }
-    .card{ border:0 !important; margin:0; padding:0; background:#fff !important; }
-    table, th, td{ background:#fff !important; }
-    .admin-table th{ background:#fff !important; }
-    *{ -webkit-print-color-adjust: economy; print-color-adjust: economy; }
-
-    body{ font-size:11px; }
-    .admin-table{ font-size:10px; }
-    .admin-table th, .admin-table td{ padding:4px 6px; }
-    .admin-table td:last-child{ max-width:260px; white-space:normal; word-break:break-word; }
-
-    .no-print, button, a{ display:none !important; }
-  }
-</style>
-"""
-
-@app.get("/admin/print")
-def admin_print_active_v2():
-    if not check_admin():
-        return html_page("<h2>⛔ Нет доступа</h2><p>Нужен token.</p>"), 403
-
-    office = request.args.get("office", OFFICES[0])
-    if office not in OFFICES:
-        office = OFFICES[0]
-
-    d_str = request.args.get("date", date.today().isoformat())
-    try:
-        d = date.fromisoformat(d_str)
-    except ValueError:
-        d = date.today()
-
-    floor_filter = (request.args.get("floor", "") or "").strip()
-
-    conn = db()
-    ensure_columns(conn)
-
-    if floor_filter:
-        rows = conn.execute(
-            """
-            SELECT * FROM orders
-            WHERE office=? AND order_date=? AND status='active' AND COALESCE(floor,'')=?
-            ORDER BY created_at ASC
-            """,
-            (office, d.isoformat(), floor_filter if floor_filter != "Без этажа" else ""),
-        ).fetchall()
-    else:
-        rows = conn.execute(
-            """
-            SELECT * FROM orders
-            WHERE office=? AND order_date=? AND status='active'
-            ORDER BY created_at ASC
-            """,
-            (office, d.isoformat()),
-        ).fetchall()
-
-    conn.close()
-
-    title = "Печать — активные заказы" + (f" — {floor_filter}" if floor_filter else "")
-
-    body = f"""
-    {ADMIN_PRINT_CSS}
-    <h1 style="text-align:center;">{title}</h1>
-    <p style="text-align:center; font-weight:800;">
-      Офис: {office} &nbsp; | &nbsp; Дата: {d.isoformat()}
-    </p>
-
-    <div class="card">
-      {_rows_table_v2(rows)}
-
-      <div class="no-print" style="margin-top:14px; display:flex; gap:10px; flex-wrap:wrap;">
-        <button class="btn-primary" type="button" onclick="window.print()">🖨 Печать</button>
-        <a class="btn-danger" href="/admin?office={office}&date={d.isoformat()}&token={ADMIN_TOKEN}">← Назад</a>
-      </div>
-    </div>
-    """
-    return html_page(body)
-
-
-# --- Specials management: list + create + delete ---
-@app.get("/admin/specials")
-def admin_specials_get():
-    if not check_admin():
-        return html_page("<h2>⛔ Нет доступа</h2><p>Нужен token.</p>"), 403
-
-    office = request.args.get("office", OFFICES[0])
-    if office not in OFFICES:
-        office = OFFICES[0]
-
-    d_str = request.args.get("date", date.today().isoformat())
-    try:
-        d = date.fromisoformat(d_str)
-    except ValueError:
-        d = date.today()
-
-    conn = db()
-    rows = conn.execute(
-        """
-        SELECT * FROM weekly_special
-        WHERE office=?
-        ORDER BY id DESC
-        LIMIT 30
-        """,
-        (office,),
-    ).fetchall()
-    conn.close()
-
-    # form defaults
-    start_default = d.isoformat()
-    end_default = (d + timedelta(days=6)).isoformat()
-
-    office_opts = "".join([f"<option value='{o}' {'selected' if o==office else ''}>{o}</option>" for o in OFFICES])
-
-    list_html = ""
-    for r in rows:
-        list_html += f"""
-        <tr>
-          <td><b>{r['id']}</b></td>
-          <td>{r['start_date']} → {r['end_date']}</td>
-          <td>{r['title']}</td>
-          <td style="text-align:right;">+{int(r['surcharge_eur'])}€</td>
-          <td style="text-align:right;">
-            <form method="post" action="/admin/specials/delete?token={ADMIN_TOKEN}" onsubmit="return confirm('Удалить блюдо недели?');">
-              <input type="hidden" name="id" value="{r['id']}">
-              <input type="hidden" name="office" value="{office}">
-              <input type="hidden" name="date" value="{d.isoformat()}">
-              <button class="btn-danger" type="submit">Удалить</button>
-            </form>
-          </td>
-        </tr>
-        """
-
-    if not list_html:
-        list_html = "<tr><td colspan='5' class='muted'>—</td></tr>"
-
-    body = f"""
-    <h1>Блюдо недели — управление</h1>
-
-    <div class="card">
-      <form method="get" action="/admin/specials">
-        <input type="hidden" name="token" value="{ADMIN_TOKEN}">
-        <div class="row">
-          <div>
-            <label>Офис</label>
-            <select name="office">{office_opts}</select>
-          </div>
-          <div>
-            <label>Дата (для удобства)</label>
-            <input type="date" name="date" value="{d.isoformat()}">
-          </div>
-        </div>
-        <button class="btn-primary" type="submit">Показать</button>
-      </form>
-
-      <p style="margin-top:14px;">
-        <a href="/admin?office={office}&date={d.isoformat()}&token={ADMIN_TOKEN}">← Назад в админку</a>
-      </p>
-    </div>
-
-    <div class="card">
-      <h3>Создать / обновить (через добавление новой записи)</h3>
-      <form method="post" action="/admin/specials/create?token={ADMIN_TOKEN}">
-        <input type="hidden" name="office" value="{office}">
-
-        <div class="row">
-          <div>
-            <label>Начало</label>
-            <input type="date" name="start_date" value="{start_default}" required>
-          </div>
-          <div>
-            <label>Конец</label>
-            <input type="date" name="end_date" value="{end_default}" required>
-          </div>
-        </div>
-
-        <label>Название блюда недели (горячее)</label>
-        <input name="title" placeholder="Напр. Бефстроганов" required>
-
-        <label>Доплата, €</label>
-        <input name="surcharge_eur" type="number" min="0" step="1" value="0" required>
-
-        <button class="btn-primary" type="submit">Сохранить</button>
-      </form>
-      <p class="muted">Мы не “редактируем” старые — мы добавляем новую запись. История сохраняется.</p>
-    </div>
-
-    <div class="card">
-      <h3>Последние 30 записей</h3>
-      <table class="admin-table">
-        <thead>
-          <tr>
-            <th>ID</th>
-            <th>Период</th>
-            <th>Название</th>
-            <th style="text-align:right;">Доплата</th>
-            <th style="text-align:right;">Действия</th>
-          </tr>
-        </thead>
-        <tbody>
-          {list_html}
-        </tbody>
-      </table>
-    </div>
-    """
-    return html_page(body)
-
-
-@app.post("/admin/specials/create")
-def admin_specials_create_post():
-    if not check_admin():
-        return html_page("<h2>⛔ Нет доступа</h2><p>Нужен token.</p>"), 403
-
-    office = (request.form.get("office", "") or "").strip()
-    if office not in OFFICES:
-        return html_page("<p class='danger'>Ошибка: неизвестный офис.</p>"), 400
-
-    try:
-        start_date = date.fromisoformat((request.form.get("start_date", "") or "").strip())
-        end_date = date.fromisoformat((request.form.get("end_date", "") or "").strip())
-    except ValueError:
-        return html_page("<p class='danger'>Ошибка: неверные даты.</p>"), 400
-
-    if end_date < start_date:
-        return html_page("<p class='danger'>Ошибка: дата конца раньше даты начала.</p>"), 400
-
-    title = (request.form.get("title", "") or "").strip()
-    if not title:
-        return html_page("<p class='danger'>Ошибка: пустое название.</p>"), 400
-
-    try:
-        surcharge = int(request.form.get("surcharge_eur", "0"))
-        if surcharge < 0:
-            raise ValueError
-    except ValueError:
-        return html_page("<p class='danger'>Ошибка: доплата должна быть целым числом ≥ 0.</p>"), 400
-
-    conn = db()
-    conn.execute(
-        """
-        INSERT INTO weekly_special(office, start_date, end_date, title, surcharge_eur, created_at)
-        VALUES (?,?,?,?,?,?)
-        """,
-        (office, start_date.isoformat(), end_date.isoformat(), title, surcharge, datetime.utcnow().isoformat()),
-    )
-    conn.commit()
-    conn.close()
-
-    return redirect(f"/admin/specials?office={office}&date={start_date.isoformat()}&token={ADMIN_TOKEN}")
-
-
-@app.post("/admin/specials/delete")
-def admin_specials_delete_post():
-    if not check_admin():
-        return html_page("<h2>⛔ Нет доступа</h2><p>Нужен token.</p>"), 403
-
-    try:
-        sid = int(request.form.get("id", "0"))
-    except ValueError:
-        sid = 0
-    if sid <= 0:
-        return html_page("<p class='danger'>Ошибка: неверный id.</p>"), 400
-
-    conn = db()
-    conn.execute("DELETE FROM weekly_special WHERE id=?", (sid,))
-    conn.commit()
-    conn.close()
-
-    office = (request.form.get("office", OFFICES[0]) or "").strip()
-    if office not in OFFICES:
-        office = OFFICES[0]
-    d = (request.form.get("date", date.today().isoformat()) or "").strip()
-
-    return redirect(f"/admin/specials?office={office}&date={d}&token={ADMIN_TOKEN}")
-
-
-if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=int(os.getenv("PORT", "5000")), debug=True)
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
+import atexit
+import cProfile
+import csv
+import gzip
+import hashlib
+import hmac
+import io
+import json
+import marshal
+import os
+import pstats
+import re
+import sqlite3
+import sys
+import threading
+from html import escape
+from time import perf_counter, sleep
+from datetime import datetime, date, time, timedelta
+from zoneinfo import ZoneInfo
+from flask import Flask, request, Response, redirect, send_file, g, has_app_context, has_request_context, jsonify, stream_with_context
+
+# ---------------------------
+# Config
+# ---------------------------
+APP_TITLE = os.getenv("APP_TITLE", "VOLGA Lunch")
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "change-me")
+APP_VERSION = os.getenv("APP_VERSION", "1")
+DB_PATH = os.getenv("DB_PATH", "/tmp/orders.sqlite")
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+# Счётчики всех воркеров складываются в отдельную SQLite-базу (не в DB_PATH: свой замок)
+METRICS_DB_PATH = os.getenv("METRICS_DB_PATH", DB_PATH + ".metrics")
+METRICS_FLUSH_SEC = float(os.getenv("METRICS_FLUSH_SEC", "2"))
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))  # 0 — писать в лог все запросы
+IDEMPOTENCY_TTL_HOURS = int(os.getenv("IDEMPOTENCY_TTL_HOURS", "24"))
+# Ключ подписи ссылок /edit/<order_code>?s=... Обязателен: выводить его из ADMIN_TOKEN
+# (у которого есть значение по умолчанию) — значит дать подделывать ссылки на чужие заказы
+ORDER_LINK_SECRET = os.getenv("ORDER_LINK_SECRET", "").strip().encode()
+ORDER_LINK_SECRET_MIN_LEN = 16
+if len(ORDER_LINK_SECRET) < ORDER_LINK_SECRET_MIN_LEN or ORDER_LINK_SECRET == ADMIN_TOKEN.encode():
+    raise RuntimeError(
+        f"Задайте ORDER_LINK_SECRET: случайная строка от {ORDER_LINK_SECRET_MIN_LEN} символов, не ADMIN_TOKEN "
+        "(например, python -c 'import secrets; print(secrets.token_hex(32))')"
+    )
+DB_CACHED_STATEMENTS = int(os.getenv("DB_CACHED_STATEMENTS", "256"))
+TZ = ZoneInfo(os.getenv("TZ", "Europe/Madrid"))
+
+MAX_PER_DAY = int(os.getenv("MAX_PER_DAY", "30"))
+CUTOFF_HOUR = int(os.getenv("CUTOFF_HOUR", "11"))  # 11:00
+ORDER_PREFIX = os.getenv("ORDER_PREFIX", "VO")
+
+OFFICES = ["ALAMEDA", "MUSICA"]
+
+# ✅ временно отключаем офис для новых заказов
+INACTIVE_OFFICES = {"MUSICA"}
+
+# ✅ этажи по офисам
+FLOORS_BY_OFFICE = {
+    "ALAMEDA": ["1st floor", "6th floor"]
+}
+
+# --- Меню: RU / EN ---
+MENU = {
+    "zakuska": [
+        "Оливье / Olivier salad",
+        "Винегрет / Vinigret salad",
+        "Икра из баклажанов / Eggplant caviar",
+        "Паштет из куриной печени / Chicken liver pâté",
+        "Шуба / Herring under a fur coat",
+    ],
+    "soup": [
+        "Борщ / Borscht",
+        "Солянка сборная мясная / Meat soup solyanka",
+        "Куриный суп с лапшой и яйцом / Chicken soup with noodles & egg",
+    ],
+    "hot": [
+        "Куриные котлеты с пюре / Chicken cutlets with mashed potatoes",
+        "Куриные котлеты с гречкой / Chicken cutlets with buckwheat",
+        "Вареники с картошкой / Vareniki with potatoes",
+        "Пельмени со сметаной / Pelmeni with sour cream",
+        "Плов с бараниной / Lamb plov (+3€)",
+    ],
+    "dessert": [
+        "Торт Наполеон / Napoleon cake",
+        "Пирожное Картошка / Kartoshka cake",
+        "Трубочка со сгущенкой / Wafer roll with dulce de leche",
+    ],
+}
+
+PRICES = {"opt1": 15.0, "opt2": 16.0, "opt3": 17.0}
+PLOV_SURCHARGE = 3.0
+
+BREAD_OPTIONS = ["Белый / White", "Чёрный / Black"]
+
+# --- Напитки (дополнительно) ---
+DRINKS = [
+    ("", "— без напитка / no drink —", 0.0),
+    ("kvas", "Квас / Kvas €3.5", 3.5),
+    ("mors", "Морс / Berry drink (Mors) €4.0", 4.0),
+    ("water", "Вода / Water €2.2", 2.2),
+    ("tea_black", "Чай чёрный с чабрецом (сашет) / Black tea with thyme (sachet) €3.5", 3.5),
+    ("tea_green", "Чай зелёный (сашет) / Green tea (sachet) €3.5", 3.5),
+    ("tea_herbal", "Чай травяной (сашет) / Herbal tea (sachet) €3.5", 3.5),
+]
+DRINK_PRICE = {k: p for (k, _, p) in DRINKS}
+DRINK_LABEL = {k: lbl for (k, lbl, _) in DRINKS}
+
+app = Flask(__name__, static_folder=None)
+
+
+# ---------------------------
+# DB
+# ---------------------------
+# Одно соединение на поток воркера (gunicorn sync = один поток на процесс).
+_db_local = threading.local()
+
+
+class PooledConnection(sqlite3.Connection):
+    """
+    Соединение живёт столько же, сколько поток воркера.
+    close() в обработчиках только откатывает незавершённую транзакцию,
+    по-настоящему закрывает close_db().
+    """
+
+    # каждый запрос к базе — в счётчики /metrics, трассу и slow log (время шага до первой строки, без fetch*)
+    def execute(self, sql, parameters=(), /):
+        t0 = perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            trace_sql(self, sql, parameters, t0)
+
+    def executemany(self, sql, seq_of_parameters, /):
+        t0 = perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            trace_sql(self, sql, None, t0)
+
+    def close(self):
+        if self.in_transaction:
+            self.rollback()
+
+    def really_close(self):
+        super().close()
+
+
+def _connect() -> PooledConnection:
+    conn = sqlite3.connect(
+        DB_PATH,
+        timeout=DB_BUSY_TIMEOUT_MS / 1000,
+        cached_statements=DB_CACHED_STATEMENTS,
+        factory=PooledConnection,
+    )
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}")
+    return conn
+
+
+def db() -> PooledConnection:
+    conn = getattr(_db_local, "conn", None)
+    # после fork соединение родителя не переиспользуем
+    if conn is None or _db_local.pid != os.getpid():
+        conn = _connect()
+        _db_local.conn = conn
+        _db_local.pid = os.getpid()
+    if has_app_context():
+        g._db = conn
+    return conn
+
+
+def close_db():
+    conn = getattr(_db_local, "conn", None)
+    if conn is not None:
+        conn.really_close()
+        _db_local.conn = None
+
+
+@app.teardown_appcontext
+def release_db(exc):
+    # незакоммиченное (исключение посреди транзакции) не должно утечь в следующий запрос
+    conn = g.pop("_db", None)
+    if conn is not None and conn.in_transaction:
+        conn.rollback()
+
+
+# ---------------------------
+# Compression + ETag
+# ---------------------------
+# gzip всегда, Brotli — если установлен модуль brotli (необязательная зависимость).
+# Постоянные тела (sw.js, manifest, icon.svg, /static/*) — StaticBody: сжатые варианты
+# и сильный ETag считаются при импорте, If-None-Match -> 304.
+# Остальные текстовые ответы сжимаются на лету в compress_response. Этот after_request
+# зарегистрирован первым, поэтому выполняется последним — после трассы SQL и т.п.
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_MIN_BYTES = 512
+COMPRESS_MIMETYPES = {
+    "text/html", "text/plain", "text/css", "text/csv",
+    "application/javascript", "application/json", "application/manifest+json", "image/svg+xml",
+}
+
+
+def _accepted_encoding(available) -> str:
+    accept = request.accept_encodings
+    if brotli is not None and "br" in available and accept["br"] > 0:
+        return "br"
+    if "gzip" in available and accept["gzip"] > 0:
+        return "gzip"
+    return "identity"
+
+
+class StaticBody:
+    """Неизменяемое тело ответа: ETag и сжатые варианты — один раз, при импорте."""
+
+    def __init__(self, content: str | bytes, mimetype: str):
+        data = content.encode("utf-8") if isinstance(content, str) else content
+        self.mimetype = mimetype
+        self.etag = hashlib.sha256(data).hexdigest()[:20]
+        self.variants = {"identity": data, "gzip": gzip.compress(data, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            self.variants["br"] = brotli.compress(data, quality=11)
+
+
+def static_response(body: StaticBody, cache_control: str | None = None) -> Response:
+    enc = _accepted_encoding(body.variants)
+    resp = Response(body.variants[enc], mimetype=body.mimetype)
+    # у каждого варианта свой сильный ETag: байты-то разные
+    resp.set_etag(body.etag if enc == "identity" else f"{body.etag}-{enc}")
+    resp.vary.add("Accept-Encoding")
+    if enc != "identity":
+        resp.headers["Content-Encoding"] = enc
+    if cache_control:
+        resp.headers["Cache-Control"] = cache_control
+    return resp.make_conditional(request)
+
+
+@app.after_request
+def compress_response(resp):
+    if (
+        resp.status_code < 200
+        or resp.status_code in (204, 304)
+        or resp.direct_passthrough
+        or resp.is_streamed
+        or "Content-Encoding" in resp.headers
+        or resp.mimetype not in COMPRESS_MIMETYPES
+    ):
+        return resp
+    data = resp.get_data()
+    if len(data) < COMPRESS_MIN_BYTES:
+        return resp
+
+    resp.vary.add("Accept-Encoding")
+    enc = _accepted_encoding(("br", "gzip"))
+    if enc == "br":
+        resp.set_data(brotli.compress(data, quality=5))
+    elif enc == "gzip":
+        resp.set_data(gzip.compress(data, compresslevel=6))
+    else:
+        return resp
+    resp.headers["Content-Encoding"] = enc
+    return resp
+
+
+# ---------------------------
+# Metrics (Prometheus, /metrics)
+# ---------------------------
+# Каждый воркер копит приращения в памяти и раз в METRICS_FLUSH_SEC добавляет их
+# в общую базу METRICS_DB_PATH (UPSERT value = value + delta) из фонового потока.
+# /metrics читает сумму по всем воркерам. Гистограммы хранятся как обычные счётчики _bucket/_sum/_count.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+
+METRICS = {
+    # имя: (тип, описание)
+    "volga_http_requests_total": ("counter", "HTTP requests by route, method and status."),
+    "volga_http_request_duration_seconds": ("histogram", "HTTP request latency."),
+    "volga_sql_queries_total": ("counter", "SQLite statements executed."),
+    "volga_sql_duration_seconds_total": ("counter", "Time spent in SQLite statements."),
+    "volga_request_sql_queries": ("histogram", "SQLite statements per request."),
+    "volga_request_sql_duration_seconds": ("histogram", "Time in SQLite per request."),
+    "volga_write_lock_wait_seconds": ("histogram", "Wait for BEGIN IMMEDIATE (write lock)."),
+    "volga_rejections_total": ("counter", "Rejected orders/edits: capacity, window, duplicate_phone."),
+    "volga_idempotent_replays_total": ("counter", "Submissions answered from idempotency_keys."),
+}
+
+_metrics_lock = threading.Lock()
+_metrics_pending = {}  # (name, labels) -> delta
+_metrics_local = threading.local()
+_metrics_state = {"pid": None}
+
+
+def _labels(**kw) -> str:
+    def esc(v) -> str:
+        return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return ",".join(f'{k}="{esc(v)}"' for k, v in kw.items())
+
+
+def inc_metric(name: str, value: float = 1.0, **labels):
+    key = (name, _labels(**labels))
+    with _metrics_lock:
+        _metrics_pending[key] = _metrics_pending.get(key, 0.0) + value
+
+
+def observe_metric(name: str, value: float, buckets=LATENCY_BUCKETS, **labels):
+    base = _labels(**labels)
+    sep = "," if base else ""
+    with _metrics_lock:
+        p = _metrics_pending
+        # бакеты кумулятивные; нулевые тоже заводим, чтобы серия была полной
+        for le in buckets:
+            k = (name + "_bucket", f'{base}{sep}le="{le:g}"')
+            p[k] = p.get(k, 0.0) + (1 if value <= le else 0)
+        k = (name + "_bucket", f'{base}{sep}le="+Inf"')
+        p[k] = p.get(k, 0.0) + 1
+        p[(name + "_sum", base)] = p.get((name + "_sum", base), 0.0) + value
+        p[(name + "_count", base)] = p.get((name + "_count", base), 0.0) + 1
+
+
+def observe_sql(seconds: float):
+    # вне запроса (миграции, CLI) — не считаем
+    if has_request_context():
+        g.sql_queries = g.get("sql_queries", 0) + 1
+        g.sql_seconds = g.get("sql_seconds", 0.0) + seconds
+
+
+def _route_label() -> str:
+    # шаблон маршрута, а не путь: /static/<name>, а не каждое имя файла
+    return request.url_rule.rule if request.url_rule is not None else "unmatched"
+
+
+def count_rejection(reason: str):
+    inc_metric("volga_rejections_total", route=_route_label(), reason=reason)
+
+
+def _metrics_conn() -> sqlite3.Connection:
+    conn = getattr(_metrics_local, "conn", None)
+    if conn is None or _metrics_local.pid != os.getpid():
+        conn = sqlite3.connect(METRICS_DB_PATH, timeout=DB_BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=OFF")  # счётчики не стоят fsync
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS metrics (
+                name TEXT NOT NULL,
+                labels TEXT NOT NULL,
+                value REAL NOT NULL,
+                PRIMARY KEY (name, labels)
+            ) WITHOUT ROWID
+            """
+        )
+        _metrics_local.conn = conn
+        _metrics_local.pid = os.getpid()
+    return conn
+
+
+def flush_metrics():
+    with _metrics_lock:
+        if not _metrics_pending:
+            return
+        batch = list(_metrics_pending.items())
+        _metrics_pending.clear()
+    conn = None
+    try:
+        conn = _metrics_conn()
+        conn.execute("BEGIN IMMEDIATE")
+        conn.executemany(
+            """
+            INSERT INTO metrics(name, labels, value) VALUES (?, ?, ?)
+            ON CONFLICT(name, labels) DO UPDATE SET value = value + excluded.value
+            """,
+            [(name, labels, v) for (name, labels), v in batch],
+        )
+        conn.execute("COMMIT")
+    except sqlite3.Error:
+        # метрики не должны ронять запрос: вернём приращения, попробуем в следующий раз
+        if conn is not None and conn.in_transaction:
+            conn.rollback()
+        with _metrics_lock:
+            for key, v in batch:
+                _metrics_pending[key] = _metrics_pending.get(key, 0.0) + v
+
+
+def _metrics_flusher():
+    while True:
+        sleep(METRICS_FLUSH_SEC)
+        flush_metrics()
+
+
+def _ensure_metrics_flusher():
+    # свой поток сброса в каждом воркере: простаивающий воркер тоже отдаёт накопленное
+    if _metrics_state["pid"] == os.getpid():
+        return
+    with _metrics_lock:
+        if _metrics_state["pid"] == os.getpid():
+            return
+        # после fork приращения родителя не наши — их сбросит сам родитель
+        _metrics_pending.clear()
+        _metrics_state["pid"] = os.getpid()
+    threading.Thread(target=_metrics_flusher, name="metrics-flush", daemon=True).start()
+
+
+atexit.register(flush_metrics)
+
+
+@app.before_request
+def metrics_start():
+    _ensure_metrics_flusher()
+    g.t_start = perf_counter()
+
+
+@app.after_request
+def metrics_finish(resp):
+    route = _route_label()
+    dt = perf_counter() - g.get("t_start", perf_counter())
+    inc_metric("volga_http_requests_total", route=route, method=request.method, status=resp.status_code)
+    observe_metric("volga_http_request_duration_seconds", dt, route=route)
+    n = g.get("sql_queries", 0)
+    if n:
+        sql_s = g.get("sql_seconds", 0.0)
+        inc_metric("volga_sql_queries_total", n, route=route)
+        inc_metric("volga_sql_duration_seconds_total", sql_s, route=route)
+        observe_metric("volga_request_sql_queries", n, QUERY_COUNT_BUCKETS, route=route)
+        observe_metric("volga_request_sql_duration_seconds", sql_s, route=route)
+    return resp
+
+
+def _metric_family(name: str) -> str:
+    for suffix in ("_bucket", "_sum", "_count"):
+        if name.endswith(suffix) and name[: -len(suffix)] in METRICS:
+            return name[: -len(suffix)]
+    return name
+
+
+def _metric_sort_key(row):
+    # семейство вместе, внутри серии бакеты по возрастанию le (+Inf последним)
+    name, labels, _ = row
+    base, _, le = labels.partition('le="')
+    le = le.rstrip('"')
+    return (_metric_family(name), base.rstrip(","), name, float("inf") if le == "+Inf" else float(le or 0))
+
+
+def metrics_text(rows) -> str:
+    """rows: (name, labels, value) -> текстовый формат Prometheus."""
+    out = []
+    seen = set()
+    for name, labels, value in sorted(rows, key=_metric_sort_key):
+        family = _metric_family(name)
+        if family not in seen:
+            seen.add(family)
+            kind, help_ = METRICS.get(family, ("untyped", ""))
+            out.append(f"# HELP {family} {help_}")
+            out.append(f"# TYPE {family} {kind}")
+        out.append(f"{name}{{{labels}}} {value:g}" if labels else f"{name} {value:g}")
+    return "\n".join(out) + "\n"
+
+
+@app.get("/metrics")
+def metrics():
+    bearer = request.headers.get("Authorization", "")
+    if not (check_admin() or bearer == f"Bearer {ADMIN_TOKEN}"):
+        return Response("forbidden", status=403, mimetype="text/plain")
+
+    flush_metrics()
+    rows = _metrics_conn().execute("SELECT name, labels, value FROM metrics").fetchall()
+    resp = Response(metrics_text(rows), mimetype="text/plain")
+    resp.headers["Content-Type"] = "text/plain; version=0.0.4; charset=utf-8"
+    resp.headers["Cache-Control"] = "no-store"
+    return resp
+
+
+# ---------------------------
+# SQL: slow log + ?trace=1
+# ---------------------------
+# Время меряет PooledConnection.execute (set_trace_callback отдаёт SQL уже с подставленными
+# значениями — телефоны попали бы в лог — и без длительности).
+# Запросы дольше SLOW_QUERY_MS пишутся в лог с маршрутом, планом и замазанными параметрами.
+# Админ с ?trace=1&token=... получает в конце HTML таблицу всех запросов своего запроса.
+
+# что можно писать в лог как есть; телефоны, имена, комментарии — нет
+_SAFE_PARAM_VALUES = set(OFFICES) | set(PRICES) | set(MENU) | {k for k in DRINK_PRICE if k} | {
+    f for floors in FLOORS_BY_OFFICE.values() for f in floors
+} | {
+    "active", "cancelled", "bread", "drink", "weekly_special", ORDER_PREFIX,
+}
+_SAFE_PARAM_RE = re.compile(r"\d{4}-\d{2}-\d{2}(T[\d:.]+)?|[A-Z]+-\d{8}-\d+")
+_SQL_SPACE_RE = re.compile(r"\s+")
+
+
+def _redact_param(v):
+    if v is None or isinstance(v, (int, float)):
+        return v
+    if isinstance(v, str) and (v in _SAFE_PARAM_VALUES or _SAFE_PARAM_RE.fullmatch(v)):
+        return v
+    return f"<{type(v).__name__}:{len(v) if isinstance(v, (str, bytes)) else '?'}>"
+
+
+def redact_params(params):
+    if params is None:
+        return "[executemany]"
+    if isinstance(params, dict):
+        return {k: _redact_param(v) for k, v in params.items()}
+    return [_redact_param(v) for v in params]
+
+
+def _sql_oneline(sql: str) -> str:
+    return _SQL_SPACE_RE.sub(" ", sql).strip()
+
+
+def _sql_plan(conn: sqlite3.Connection, sql: str, params) -> list[str]:
+    head = sql.lstrip()[:8].upper()
+    if params is None or head.startswith(("BEGIN", "COMMIT", "ROLLBACK", "PRAGMA", "END")):
+        return []
+    try:
+        # мимо PooledConnection.execute: EXPLAIN не должен попадать в счётчики и трассу
+        return [r[3] for r in sqlite3.Connection.execute(conn, "EXPLAIN QUERY PLAN " + sql, params)]
+    except sqlite3.Error:
+        return []
+
+
+def trace_sql(conn: sqlite3.Connection, sql: str, params, t0: float):
+    """Зовётся из PooledConnection после каждого execute/executemany (params=None — executemany)."""
+    seconds = perf_counter() - t0
+    in_request = has_request_context()
+    if in_request:
+        observe_sql(seconds)
+        trace = g.get("sql_trace")
+        if trace is not None:
+            trace.append((t0 - g.get("t_start", t0), seconds, _sql_oneline(sql), redact_params(params)))
+
+    if seconds * 1000 >= SLOW_QUERY_MS:
+        app.logger.warning(
+            "slow query %.1f ms route=%s sql=%s params=%s plan=%s",
+            seconds * 1000,
+            f"{request.method} {_route_label()}" if in_request else "-",
+            _sql_oneline(sql),
+            redact_params(params),
+            " | ".join(_sql_plan(conn, sql, params)),
+        )
+
+
+@app.before_request
+def sql_trace_start():
+    if request.args.get("trace") == "1" and check_admin():
+        g.sql_trace = []
+
+
+@app.after_request
+def sql_trace_inject(resp):
+    trace = g.get("sql_trace")
+    if trace is None or resp.mimetype != "text/html" or resp.is_streamed:
+        return resp
+
+    rows = ""
+    for i, (start, dur, sql, params) in enumerate(trace, 1):
+        slow = " class='danger'" if dur * 1000 >= SLOW_QUERY_MS else ""
+        rows += (
+            f"<tr{slow}><td>{i}</td><td style='text-align:right;'>{start * 1000:.2f}</td>"
+            f"<td style='text-align:right;'><b>{dur * 1000:.2f}</b></td>"
+            f"<td><code>{escape(sql[:400])}</code></td><td><small>{escape(str(params))}</small></td></tr>"
+        )
+    total = sum(t[1] for t in trace) * 1000
+    table = f"""
+    <div class="card">
+      <h3>SQL trace: {len(trace)} запросов, {total:.2f} ms</h3>
+      <table class="admin-table">
+        <thead><tr><th>#</th><th>+ms</th><th>ms</th><th>SQL</th><th>params</th></tr></thead>
+        <tbody>{rows or "<tr><td colspan='5' class='muted'>—</td></tr>"}</tbody>
+      </table>
+    </div>
+    """
+    body = resp.get_data(as_text=True)
+    pos = body.rfind("</body>")
+    if pos != -1:
+        resp.set_data(body[:pos] + table + body[pos:])
+    return resp
+
+
+# ---------------------------
+# Migrations (PRAGMA user_version)
+# ---------------------------
+def _m001_base_schema(conn: sqlite3.Connection):
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS orders (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_code TEXT NOT NULL UNIQUE,
+            office TEXT NOT NULL,
+            order_date TEXT NOT NULL,
+
+            floor TEXT,
+
+            name TEXT NOT NULL,
+            phone_raw TEXT NOT NULL,
+            phone_norm TEXT NOT NULL,
+
+            zakuska TEXT,
+            soup TEXT NOT NULL,
+            hot TEXT,
+            dessert TEXT,
+
+            bread TEXT,
+
+            option_code TEXT NOT NULL,
+            price_eur REAL NOT NULL,
+            comment TEXT,
+            status TEXT NOT NULL DEFAULT 'active',
+            created_at TEXT NOT NULL
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_orders_office_date ON orders(office, order_date)")
+    conn.execute(
+        """
+        CREATE UNIQUE INDEX IF NOT EXISTS uq_orders_office_date_phone_norm
+        ON orders(office, order_date, phone_norm)
+        """
+    )
+
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS weekly_special (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            office TEXT NOT NULL,
+            start_date TEXT NOT NULL,
+            end_date TEXT NOT NULL,
+            title TEXT NOT NULL,
+            surcharge_eur INTEGER NOT NULL DEFAULT 0,
+            created_at TEXT NOT NULL
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_special_office_dates ON weekly_special(office, start_date, end_date)")
+
+
+def _m002_drink_floor_columns(conn: sqlite3.Connection):
+    # базы, созданные до появления напитков и этажа (бывший ensure_columns)
+    cols = {r["name"] for r in conn.execute("PRAGMA table_info(orders)").fetchall()}
+    if "drink_code" not in cols:
+        conn.execute("ALTER TABLE orders ADD COLUMN drink_code TEXT")
+    if "drink_label" not in cols:
+        conn.execute("ALTER TABLE orders ADD COLUMN drink_label TEXT")
+    if "drink_price_eur" not in cols:
+        conn.execute("ALTER TABLE orders ADD COLUMN drink_price_eur REAL")
+    if "floor" not in cols:
+        conn.execute("ALTER TABLE orders ADD COLUMN floor TEXT")
+
+
+def _m003_cache_generation(conn: sqlite3.Connection):
+    # счётчики поколений для сброса кэшей во всех воркерах
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS cache_generation (
+            name TEXT PRIMARY KEY,
+            gen INTEGER NOT NULL DEFAULT 0
+        )
+        """
+    )
+    conn.execute("INSERT OR IGNORE INTO cache_generation(name, gen) VALUES ('weekly_special', 0)")
+
+
+def _m004_order_code_seq(conn: sqlite3.Connection):
+    # счётчик номеров заказов: общий для всех офисов, т.к. офис в номер не входит
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS order_code_seq (
+            prefix TEXT NOT NULL,
+            order_date TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            PRIMARY KEY (prefix, order_date)
+        ) WITHOUT ROWID
+        """
+    )
+    # продолжаем с уже выданных номеров: PREFIX-YYYYMMDD-NNN
+    last = {}
+    for r in conn.execute("SELECT order_code FROM orders"):
+        parts = r["order_code"].rsplit("-", 2)
+        if len(parts) != 3:
+            continue
+        prefix, ymd, seq = parts
+        try:
+            key = (prefix, datetime.strptime(ymd, "%Y%m%d").date().isoformat())
+            seq = int(seq)
+        except ValueError:
+            continue
+        last[key] = max(last.get(key, 0), seq)
+    conn.executemany(
+        """
+        INSERT INTO order_code_seq(prefix, order_date, seq) VALUES (?,?,?)
+        ON CONFLICT(prefix, order_date) DO UPDATE SET seq = max(seq, excluded.seq)
+        """,
+        [(prefix, d, seq) for (prefix, d), seq in last.items()],
+    )
+
+
+def _m005_daily_capacity(conn: sqlite3.Connection):
+    # число активных заказов на (офис, дата) — проверка лимита одним чтением по ключу.
+    # Поддерживается триггерами: любые INSERT/DELETE/смена статуса в orders.
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS daily_capacity (
+            office TEXT NOT NULL,
+            order_date TEXT NOT NULL,
+            active_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (office, order_date)
+        ) WITHOUT ROWID
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_orders_capacity_insert
+        AFTER INSERT ON orders WHEN NEW.status='active'
+        BEGIN
+            INSERT INTO daily_capacity(office, order_date, active_count) VALUES (NEW.office, NEW.order_date, 1)
+            ON CONFLICT(office, order_date) DO UPDATE SET active_count = active_count + 1;
+        END
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_orders_capacity_delete
+        AFTER DELETE ON orders WHEN OLD.status='active'
+        BEGIN
+            UPDATE daily_capacity SET active_count = active_count - 1
+            WHERE office=OLD.office AND order_date=OLD.order_date;
+        END
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_orders_capacity_update
+        AFTER UPDATE OF status, office, order_date ON orders
+        WHEN OLD.status='active' OR NEW.status='active'
+        BEGIN
+            UPDATE daily_capacity SET active_count = active_count - 1
+            WHERE OLD.status='active' AND office=OLD.office AND order_date=OLD.order_date;
+            INSERT INTO daily_capacity(office, order_date, active_count)
+            SELECT NEW.office, NEW.order_date, 1 WHERE NEW.status='active'
+            ON CONFLICT(office, order_date) DO UPDATE SET active_count = active_count + 1;
+        END
+        """
+    )
+    conn.execute("DELETE FROM daily_capacity")
+    conn.execute(
+        """
+        INSERT INTO daily_capacity(office, order_date, active_count)
+        SELECT office, order_date, COUNT(*) FROM orders
+        WHERE status='active'
+        GROUP BY office, order_date
+        """
+    )
+
+
+def _m006_order_indexes(conn: sqlite3.Connection):
+    # Частичные индексы только по активным заказам (отменённые в них не попадают).
+    # /admin и /admin/print: порядок created_at берётся прямо из индекса, без сортировки.
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_orders_active_created
+        ON orders(office, order_date, created_at)
+        WHERE status='active'
+        """
+    )
+    # Сводка кухни — покрывающий индекс, таблицу не читаем. status стоит в колонках,
+    # иначе SQLite не считает индекс покрывающим (условие status='active' в WHERE запроса).
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_orders_active_summary
+        ON orders(office, order_date, status, option_code, soup, zakuska, hot, dessert, bread, drink_label)
+        WHERE status='active'
+        """
+    )
+
+
+def _m007_active_phone_unique(conn: sqlite3.Connection):
+    # один активный заказ на телефон в день; отменённые не мешают заказать заново
+    conn.execute("DROP INDEX IF EXISTS uq_orders_office_date_phone_norm")
+    conn.execute(
+        """
+        CREATE UNIQUE INDEX IF NOT EXISTS uq_orders_active_office_date_phone
+        ON orders(office, order_date, phone_norm)
+        WHERE status='active'
+        """
+    )
+
+
+# --- Снимок для m008 / m012 ---
+# Миграция при повторе на старой базе должна давать те же строки, что и в день выпуска,
+# поэтому она не зовёт живой код (MENU, SHORT, special_label, текущий вид orders_v).
+# Ниже — их копии на момент m008. Не править: меню доносит в dishes sync_menu_dishes,
+# новая версия orders_v — новой миграцией (m016).
+_M008_DISH_COLUMNS = ["zakuska", "soup", "hot", "dessert", "bread"]
+_M008_SHORT = {
+    "Оливье": "Оливье",
+    "Винегрет": "Винегрет",
+    "Икра из баклажанов": "Икра",
+    "Паштет из куриной печени": "Паштет",
+    "Шуба": "Шуба",
+    "Борщ": "Борщ",
+    "Солянка сборная мясная": "Солянка",
+    "Куриный суп с лапшой и яйцом": "Кур. суп",
+    "Куриные котлеты с пюре": "Котл+пюре",
+    "Куриные котлеты с гречкой": "Котл+греча",
+    "Вареники с картошкой": "Вареники",
+    "Пельмени со сметаной": "Пельмени",
+    "Плов с бараниной": "Плов",
+    "Торт Наполеон": "Наполеон",
+    "Пирожное Картошка": "Картошка",
+    "Трубочка со сгущенкой": "Трубочка",
+    "Белый": "Хлеб белый",
+    "Чёрный": "Хлеб чёрный",
+}
+
+
+def _m008_short_name(label: str) -> str:
+    ru = label.split(" / ")[0].strip()
+    return _M008_SHORT.get(ru, ru)
+
+
+def _m008_special_label(sp) -> str:
+    label = f"Блюдо недели: {sp['title']} / Weekly special: {sp['title']}"
+    if int(sp["surcharge_eur"]) > 0:
+        label += f" (+{int(sp['surcharge_eur'])}€)"
+    return label
+
+
+_M008_ORDERS_V_SQL = """
+    CREATE VIEW orders_v AS
+    SELECT o.*,
+           z.label AS zakuska, s.label AS soup, h.label AS hot, ds.label AS dessert, b.label AS bread,
+           dr.code AS drink_code, dr.label AS drink_label
+    FROM orders o
+    LEFT JOIN dishes z ON z.id = o.zakuska_id
+    LEFT JOIN dishes s ON s.id = o.soup_id
+    LEFT JOIN dishes h ON h.id = o.hot_id
+    LEFT JOIN dishes ds ON ds.id = o.dessert_id
+    LEFT JOIN dishes b ON b.id = o.bread_id
+    LEFT JOIN dishes dr ON dr.id = o.drink_id
+"""
+
+
+def _m008_dishes(conn: sqlite3.Connection):
+    # Справочник блюд; в orders вместо полных "RU / EN" строк — id из dishes.
+    # Прочитать заказ с названиями — через представление orders_v.
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS dishes (
+            id INTEGER PRIMARY KEY,
+            category TEXT NOT NULL,
+            label TEXT NOT NULL,
+            short_name TEXT NOT NULL,
+            code TEXT,
+            special_id INTEGER REFERENCES weekly_special(id),
+            UNIQUE (category, label)
+        )
+        """
+    )
+
+    # блюда нынешнего меню добавит sync_menu_dishes после миграций; здесь — названия из заказов
+    rows = []
+    for col in _M008_DISH_COLUMNS:
+        for r in conn.execute(f"SELECT DISTINCT {col} FROM orders WHERE {col} IS NOT NULL AND {col} <> ''").fetchall():
+            rows.append((col, r[0], _m008_short_name(r[0]), None))
+    for r in conn.execute(
+        """
+        SELECT drink_label, MAX(drink_code) FROM orders
+        WHERE drink_label IS NOT NULL AND drink_label <> ''
+        GROUP BY drink_label
+        """
+    ).fetchall():
+        rows.append(("drink", r[0], _m008_short_name(r[0]), r[1]))
+    conn.executemany(
+        "INSERT OR IGNORE INTO dishes(category, label, short_name, code) VALUES (?,?,?,?)",
+        rows,
+    )
+    for sp in conn.execute("SELECT * FROM weekly_special ORDER BY id").fetchall():
+        label = _m008_special_label(sp)
+        conn.execute(
+            """
+            INSERT INTO dishes(category, label, short_name, special_id) VALUES ('hot', ?, ?, ?)
+            ON CONFLICT(category, label) DO UPDATE SET special_id = excluded.special_id
+            """,
+            (label, _m008_short_name(label), sp["id"]),
+        )
+
+    for col in _M008_DISH_COLUMNS + ["drink"]:
+        conn.execute(f"ALTER TABLE orders ADD COLUMN {col}_id INTEGER")
+    for col in _M008_DISH_COLUMNS:
+        conn.execute(
+            f"""
+            UPDATE orders SET {col}_id = (SELECT id FROM dishes WHERE category='{col}' AND label=orders.{col})
+            WHERE {col} IS NOT NULL
+            """
+        )
+    conn.execute(
+        """
+        UPDATE orders SET drink_id = (SELECT id FROM dishes WHERE category='drink' AND label=orders.drink_label)
+        WHERE drink_label IS NOT NULL
+        """
+    )
+
+    # место освободится после VACUUM
+    conn.execute("DROP INDEX IF EXISTS idx_orders_active_summary")
+    for col in _M008_DISH_COLUMNS + ["drink_code", "drink_label"]:
+        conn.execute(f"ALTER TABLE orders DROP COLUMN {col}")
+    conn.execute(
+        """
+        CREATE INDEX idx_orders_active_summary
+        ON orders(office, order_date, status, option_code, soup_id, zakuska_id, hot_id, dessert_id, bread_id, drink_id)
+        WHERE status='active'
+        """
+    )
+    conn.execute(_M008_ORDERS_V_SQL)
+
+
+def _m009_idempotency_keys(conn: sqlite3.Connection):
+    # Ответы на уже обработанные отправки форм: ключ генерирует страница (один на загрузку),
+    # повтор с тем же ключом (двойной тап, outbox service worker) получает прежний ответ.
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS idempotency_keys (
+            endpoint TEXT NOT NULL,
+            key TEXT NOT NULL,
+            order_code TEXT NOT NULL,
+            status INTEGER NOT NULL,
+            body TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            PRIMARY KEY (endpoint, key)
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_idempotency_created ON idempotency_keys(created_at)")
+
+
+def _m010_orders_phone_created(conn: sqlite3.Connection):
+    # История заказов телефона (/history, /api/v1/history): последние N по created_at
+    # читаются прямо из индекса, без сортировки всех заказов телефона.
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_orders_phone_created ON orders(phone_norm, created_at)")
+
+
+def _m011_orders_office_date_status_created(conn: sqlite3.Connection):
+    # /admin: активные и отменённые, ORDER BY status, created_at — порядок прямо из индекса.
+    # Префикс (office, order_date) заменяет прежний idx_orders_office_date.
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_orders_office_date_status_created
+        ON orders(office, order_date, status, created_at)
+        """
+    )
+    conn.execute("DROP INDEX IF EXISTS idx_orders_office_date")
+
+
+def _m012_dishes_per_special(conn: sqlite3.Connection):
+    # Блюдо недели — своя строка dishes на каждый weekly_special. С UNIQUE(category, label)
+    # две недели с одинаковыми названием и доплатой делили строку, и special_id указывал на последнюю.
+    # UNIQUE в SQLite не снять без пересборки таблицы; orders_v на время пересборки убираем
+    # и ставим ту же (версия m008; m016 заменит её позже).
+    conn.execute("DROP VIEW IF EXISTS orders_v")
+    conn.execute(
+        """
+        CREATE TABLE dishes_new (
+            id INTEGER PRIMARY KEY,
+            category TEXT NOT NULL,
+            label TEXT NOT NULL,
+            short_name TEXT NOT NULL,
+            code TEXT,
+            special_id INTEGER REFERENCES weekly_special(id)
+        )
+        """
+    )
+    conn.execute(
+        """
+        INSERT INTO dishes_new(id, category, label, short_name, code, special_id)
+        SELECT id, category, label, short_name, code, special_id FROM dishes
+        """
+    )
+    conn.execute("DROP TABLE dishes")
+    conn.execute("ALTER TABLE dishes_new RENAME TO dishes")
+    conn.execute("CREATE UNIQUE INDEX uq_dishes_label ON dishes(category, label) WHERE special_id IS NULL")
+    conn.execute("CREATE UNIQUE INDEX uq_dishes_special ON dishes(special_id) WHERE special_id IS NOT NULL")
+    conn.execute(_M008_ORDERS_V_SQL)
+
+    # строки для недель, чью общую строку перехватила более поздняя неделя
+    for sp in conn.execute(
+        """
+        SELECT * FROM weekly_special
+        WHERE id NOT IN (SELECT special_id FROM dishes WHERE special_id IS NOT NULL)
+        ORDER BY id
+        """
+    ).fetchall():
+        label = _m008_special_label(sp)
+        conn.execute(
+            "INSERT INTO dishes(category, label, short_name, special_id) VALUES ('hot', ?, ?, ?)",
+            (label, _m008_short_name(label), sp["id"]),
+        )
+    # заказ блюда недели -> строка той недели, в которую попадает его дата
+    conn.execute(
+        """
+        UPDATE orders SET hot_id = COALESCE((
+            SELECT d.id FROM weekly_special ws JOIN dishes d ON d.special_id = ws.id
+            WHERE ws.office = orders.office
+              AND orders.order_date BETWEEN ws.start_date AND ws.end_date
+              AND d.label = (SELECT label FROM dishes WHERE id = orders.hot_id)
+            ORDER BY ws.id DESC LIMIT 1
+        ), hot_id)
+        WHERE hot_id IN (SELECT id FROM dishes WHERE special_id IS NOT NULL)
+        """
+    )
+
+
+
+def _m013_idempotency_request_hash(conn: sqlite3.Connection):
+    # Ответ по ключу отдаётся только той же отправке (request_fingerprint): в нём телефон, имя
+    # и подписанная ссылка. У старых ключей отпечатка нет — просто забываем их (TTL всё равно сутки).
+    conn.execute("DELETE FROM idempotency_keys")
+    conn.execute("ALTER TABLE idempotency_keys ADD COLUMN request_hash TEXT NOT NULL DEFAULT ''")
+
+
+
+def _m014_drop_orders_active_created(conn: sqlite3.Connection):
+    # /admin и /admin/print читают idx_orders_office_date_status_created (m011) — активные
+    # идут там префиксом (office, order_date, 'active') уже по created_at. Лишний индекс —
+    # лишняя запись на каждый INSERT/UPDATE заказа.
+    conn.execute("DROP INDEX IF EXISTS idx_orders_active_created")
+
+
+def _m015_weekly_special_office_index(conn: sqlite3.Connection):
+    # Блюдо недели на дату и список /admin/specials — ORDER BY id DESC по офису. Индекс (office)
+    # хранит строки офиса в порядке rowid = id: идём с конца и останавливаемся на первой
+    # подходящей неделе, без сортировки. (office, start_date, end_date) сортировать не давал.
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_special_office ON weekly_special(office)")
+    conn.execute("DROP INDEX IF EXISTS idx_special_office_dates")
+
+
+def _m016_orders_v_short_names(conn: sqlite3.Connection):
+    # Короткие названия для кухни (/admin, печать) — из dishes.short_name, как в сводке,
+    # а не вторым словарём в коде.
+    conn.execute("DROP VIEW IF EXISTS orders_v")
+    conn.execute(
+        """
+        CREATE VIEW orders_v AS
+        SELECT o.*,
+               z.label AS zakuska, s.label AS soup, h.label AS hot, ds.label AS dessert, b.label AS bread,
+               dr.code AS drink_code, dr.label AS drink_label,
+               z.short_name AS zakuska_short, s.short_name AS soup_short, h.short_name AS hot_short,
+               ds.short_name AS dessert_short, b.short_name AS bread_short, dr.short_name AS drink_short
+        FROM orders o
+        LEFT JOIN dishes z ON z.id = o.zakuska_id
+        LEFT JOIN dishes s ON s.id = o.soup_id
+        LEFT JOIN dishes h ON h.id = o.hot_id
+        LEFT JOIN dishes ds ON ds.id = o.dessert_id
+        LEFT JOIN dishes b ON b.id = o.bread_id
+        LEFT JOIN dishes dr ON dr.id = o.drink_id
+        """
+    )
+
+
+def _m017_app_meta(conn: sqlite3.Connection):
+    # Мелкие служебные значения. menu_dishes_hash — меню, с которым последний раз
+    # синхронизирован dishes (sync_menu_dishes).
+    conn.execute("CREATE TABLE IF NOT EXISTS app_meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+
+# Порядок не менять, только дописывать в конец: номер шага = user_version после него.
+MIGRATIONS = [
+    _m001_base_schema,
+    _m002_drink_floor_columns,
+    _m003_cache_generation,
+    _m004_order_code_seq,
+    _m005_daily_capacity,
+    _m006_order_indexes,
+    _m007_active_phone_unique,
+    _m008_dishes,
+    _m009_idempotency_keys,
+    _m010_orders_phone_created,
+    _m011_orders_office_date_status_created,
+    _m012_dishes_per_special,
+    _m013_idempotency_request_hash,
+    _m014_drop_orders_active_created,
+    _m015_weekly_special_office_index,
+    _m016_orders_v_short_names,
+    _m017_app_meta,
+]
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate_db() -> int:
+    """
+    Применяет недостающие шаги MIGRATIONS. Возвращает, сколько шагов применено.
+    BEGIN IMMEDIATE — общий замок: если воркеры стартуют одновременно,
+    мигрирует первый, остальные после ожидания видят актуальную версию.
+    """
+    conn = db()
+    target = len(MIGRATIONS)
+    if schema_version(conn) >= target:
+        sync_menu_dishes(conn)
+        return 0
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        current = schema_version(conn)
+        for n in range(current, target):
+            MIGRATIONS[n](conn)
+            conn.execute(f"PRAGMA user_version={n + 1}")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    sync_menu_dishes(conn)
+    return max(0, target - current)
+
+
+def _menu_dish_rows() -> list:
+    rows = [(cat, label, _short_name(label), None) for cat, items in MENU.items() for label in items]
+    rows += [("bread", label, _short_name(label), None) for label in BREAD_OPTIONS]
+    rows += [("drink", label, _short_name(label), code) for code, label, _ in DRINKS if code]
+    return rows
+
+
+def sync_menu_dishes(conn: sqlite3.Connection) -> bool:
+    """
+    Строки dishes для блюд из кода (MENU, BREAD_OPTIONS, DRINKS): после деплоя с новым блюдом
+    id уже есть к первому заказу, поправленное SHORT доходит до кухни. Названия из запросов
+    в dishes не пишутся никогда.
+    Пишет, только если меню в коде отличается от записанного (хэш в app_meta): обычный
+    старт воркера — одно чтение, без замка записи. -> было ли что писать.
+    """
+    rows = _menu_dish_rows()
+    menu_hash = hashlib.sha256(json.dumps(rows, ensure_ascii=False).encode("utf-8")).hexdigest()
+    if _stored_menu_hash(conn) == menu_hash:
+        return False
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # воркер рядом мог успеть, пока мы ждали замок
+        if _stored_menu_hash(conn) == menu_hash:
+            conn.rollback()
+            return False
+        conn.executemany(
+            """
+            INSERT INTO dishes(category, label, short_name, code) VALUES (?,?,?,?)
+            ON CONFLICT(category, label) WHERE special_id IS NULL
+            DO UPDATE SET short_name = excluded.short_name, code = excluded.code
+            """,
+            rows,
+        )
+        conn.execute("INSERT OR REPLACE INTO app_meta(key, value) VALUES ('menu_dishes_hash', ?)", (menu_hash,))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return True
+
+
+def _stored_menu_hash(conn: sqlite3.Connection) -> str | None:
+    row = conn.execute("SELECT value FROM app_meta WHERE key='menu_dishes_hash'").fetchone()
+    return row["value"] if row else None
+
+
+@app.cli.command("migrate")
+def migrate_command():
+    """Применить миграции схемы к DB_PATH."""
+    applied = migrate_db()
+    print(f"{DB_PATH}: applied {applied}, schema version {schema_version(db())}")
+
+
+def hot_queries() -> list:
+    """
+    Горячие запросы для check-plans — те же константы SQL, что выполняют маршруты
+    (определены ниже по модулю, поэтому список собирается при вызове).
+    (имя, SQL, параметры, почему сортировка без индекса допустима — или None: тогда это FAIL)
+    """
+    return [
+        ("active order by phone (/order, /edit, /cancel)", ACTIVE_ORDER_BY_PHONE_SQL, ("ALAMEDA", "2000-01-04", "+0"), None),
+        ("active order by phone, with names (/edit form)", ACTIVE_ORDER_V_BY_PHONE_SQL, ("ALAMEDA", "2000-01-04", "+0"), None),
+        ("order by code (/edit/<code>, /api/v1/orders/<code>)", ORDER_BY_CODE_SQL, ("VO-20000104-001",), None),
+        ("history by phone (/history, /api/v1/history)", HISTORY_SQL, ("+0", HISTORY_LIMIT), None),
+        ("capacity", CAPACITY_SQL, ("ALAMEDA", "2000-01-04"), None),
+        ("idempotency replay", IDEMPOTENCY_REPLAY_SQL, ("/order", "00000000", "2000-01-04"), None),
+        ("idempotency eviction", IDEMPOTENCY_EVICT_SQL, ("2000-01-04",), None),
+        ("weekly special", WEEKLY_SPECIAL_SQL, ("ALAMEDA", "2000-01-04", "2000-01-04"), None),
+        ("/admin/specials", ADMIN_SPECIALS_SQL, ("ALAMEDA",), None),
+        ("/admin (active + cancelled)", ADMIN_ORDERS_SQL, ("ALAMEDA", "2000-01-04"), None),
+        ("/admin/print by floor", PRINT_BY_FLOOR_SQL, ("ALAMEDA", "2000-01-04", "1st floor"), None),
+        ("/admin/print active", PRINT_ACTIVE_SQL, ("ALAMEDA", "2000-01-04"), None),
+        (
+            "/admin + /admin/summary counts", SUMMARY_COUNTS_SQL, {"office": "ALAMEDA", "d": "2000-01-04"},
+            # GROUP BY по уже отобранным id блюд одного дня (UNION пяти колонок и напитки) —
+            # сортируются счётчики, а не заказы; индекс под это не построить
+            "GROUP BY over one day's dish ids",
+        ),
+    ]
+
+
+def query_plan(conn: sqlite3.Connection, sql: str, params) -> list[str]:
+    return [r["detail"] for r in conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()]
+
+
+def full_scans(plan: list[str]) -> list[str]:
+    # SEARCH — поиск по индексу; SCAN <таблица> (в т.ч. "USING COVERING INDEX") — полный проход.
+    # SCAN подзапроса (MATERIALIZE / CO-ROUTINE выше в плане) — проход по уже отобранным строкам.
+    subqueries = {"CONSTANT"}
+    for step in plan:
+        if step.startswith(("MATERIALIZE ", "CO-ROUTINE ")):
+            subqueries.add(step.split(" ", 1)[1])
+    return [
+        step for step in plan
+        if step.startswith("SCAN ")
+        and step.split()[1] not in subqueries
+        and not step.startswith("SCAN (subquery")
+    ]
+
+
+@app.cli.command("check-plans")
+def check_plans_command():
+    """
+    Падает (exit 1), если какой-то из hot_queries() читает таблицу целиком или сортирует
+    без индекса (USE TEMP B-TREE), когда в hot_queries() это не объяснено.
+    """
+    conn = db()
+    failed = 0
+    for name, sql, params, sort_ok in hot_queries():
+        plan = query_plan(conn, sql, params)
+        sorts = [step for step in plan if step.startswith("USE TEMP B-TREE")]
+        bad = full_scans(plan) or (sorts if not sort_ok else [])
+        print(f"{'FAIL' if bad else 'ok  '} {name}")
+        for step in plan:
+            note = ""
+            if step in sorts:
+                note = f"   <- сортировка без индекса ({sort_ok})" if sort_ok else "   <- сортировка без индекса"
+            print(f"       {step}{note}")
+        failed += bool(bad)
+    if failed:
+        raise SystemExit(1)
+
+
+# ---------------------------
+# Helpers
+# ---------------------------
+# Для нагрузочных прогонов: FROZEN_NOW=2030-01-08T10:55:00 — часы стоят.
+# Без смещения — местное время TZ; со смещением (…+00:00, …Z) — переводится в TZ.
+def _parse_frozen_now(value: str) -> datetime:
+    dt = datetime.fromisoformat(value)
+    return dt.astimezone(TZ) if dt.tzinfo else dt.replace(tzinfo=TZ)
+
+
+FROZEN_NOW = _parse_frozen_now(os.environ["FROZEN_NOW"]) if os.getenv("FROZEN_NOW") else None
+
+
+def now_local():
+    if FROZEN_NOW is not None:
+        return FROZEN_NOW
+    return datetime.now(TZ)
+
+
+def cutoff_dt(d: date) -> datetime:
+    return datetime.combine(d, time(CUTOFF_HOUR, 0), TZ)
+
+
+def is_workday(d: date) -> bool:
+    # Доставка/заказы доступны Tue–Fri
+    return d.weekday() in (1, 2, 3, 4)  # Tue=1 ... Fri=4
+
+
+def next_workday(d: date) -> date:
+    x = d + timedelta(days=1)
+    while not is_workday(x):
+        x += timedelta(days=1)
+    return x
+
+
+def prev_workday(d: date) -> date:
+    x = d - timedelta(days=1)
+    while not is_workday(x):
+        x -= timedelta(days=1)
+    return x
+
+
+def ordering_window_for(d: date):
+    """
+    Окно приёма заказов на дату d:
+    start = cutoff(предыдущий рабочий день)
+    end   = cutoff(d)
+    """
+    start = cutoff_dt(prev_workday(d))
+    end = cutoff_dt(d)
+    return start, end
+
+
+def is_closed_day(d: date) -> bool:
+    return not is_workday(d)
+
+
+class RequestCtx:
+    """
+    Всё, что в пределах одного запроса должно считаться один раз:
+    "сейчас" (все проверки видят один момент — окно не "перещёлкнется"
+    между двумя вызовами now_local() в 10:59:59.999), окна приёма по датам
+    и блюда недели по (office, date).
+    """
+
+    def __init__(self, now: datetime):
+        self.now = now
+        self._windows = {}
+        self._specials = {}
+
+    def window(self, d: date):
+        w = self._windows.get(d)
+        if w is None:
+            w = self._windows[d] = ordering_window_for(d)
+        return w
+
+    def special(self, office: str, d: date):
+        key = (office, d)
+        if key not in self._specials:
+            self._specials[key] = get_weekly_special(office, d)
+        return self._specials[key]
+
+
+def request_ctx() -> RequestCtx:
+    # вне запроса (CLI, бенчмарки) — каждый раз новый
+    if not has_request_context():
+        return RequestCtx(now_local())
+    ctx = g.get("req_ctx")
+    if ctx is None:
+        ctx = g.req_ctx = RequestCtx(now_local())
+    return ctx
+
+
+def validate_order_time(d: date, ctx: RequestCtx | None = None):
+    ctx = ctx or request_ctx()
+    n = ctx.now
+    start, end = ctx.window(d)
+    if is_closed_day(d):
+        return False, start, end, n
+    return (start <= n < end), start, end, n
+
+
+def normalize_phone(raw: str) -> str:
+    raw = (raw or "").strip()
+    if not raw:
+        return ""
+    has_plus = raw.lstrip().startswith("+")
+    digits = re.sub(r"\D+", "", raw)
+    if not digits:
+        return ""
+    return ("+" if has_plus else "") + digits
+
+
+def compute_default_date(ctx: RequestCtx | None = None):
+    n = (ctx or request_ctx()).now
+    today = n.date()
+    if is_workday(today) and n < cutoff_dt(today):
+        return today
+    return next_workday(today)
+
+
+def check_admin():
+    return request.args.get("token", "") == ADMIN_TOKEN
+
+
+def options_html(items):
+    return "".join([f"<option>{x}</option>" for x in items])
+
+
+# --- Кэш блюда недели ---
+# Ключ (office, date). Общий для процесса, сбрасывается, когда растёт поколение
+# 'weekly_special' в cache_generation. Само поколение перечитываем не чаще раза
+# в SPECIAL_CACHE_CHECK_SEC на процесс: в час пик — ни одного лишнего запроса.
+# Блюдо недели, изменённое в другом воркере, видно здесь не позже чем через столько
+# секунд; в своём процессе админка сбрасывает кэш сразу (invalidate_special_cache).
+SPECIAL_CACHE_MAX = 4096
+SPECIAL_CACHE_CHECK_SEC = 1.0
+_special_cache = {}
+_special_cache_gen = None
+_special_cache_checked = 0.0  # perf_counter() последней сверки поколения
+
+
+def bump_cache_generation(conn: sqlite3.Connection, name: str):
+    conn.execute("UPDATE cache_generation SET gen=gen+1 WHERE name=?", (name,))
+
+
+def invalidate_special_cache():
+    global _special_cache_gen
+    _special_cache.clear()
+    _special_cache_gen = None
+
+
+def _check_special_cache(conn: sqlite3.Connection):
+    global _special_cache_gen, _special_cache_checked
+    now = perf_counter()
+    if _special_cache_gen is not None and now - _special_cache_checked < SPECIAL_CACHE_CHECK_SEC:
+        return
+    _special_cache_checked = now
+    gen = conn.execute("SELECT gen FROM cache_generation WHERE name='weekly_special'").fetchone()[0]
+    if gen != _special_cache_gen:
+        _special_cache.clear()
+        _special_cache_gen = gen
+
+
+WEEKLY_SPECIAL_SQL = """
+    SELECT * FROM weekly_special
+    WHERE office=? AND start_date <= ? AND end_date >= ?
+    ORDER BY id DESC
+    LIMIT 1
+"""
+
+
+ADMIN_SPECIALS_SQL = "SELECT * FROM weekly_special WHERE office=? ORDER BY id DESC LIMIT 30"
+
+
+def get_weekly_special(office: str, d: date):
+    conn = db()
+    _check_special_cache(conn)
+
+    key = (office, d.isoformat())
+    if key in _special_cache:
+        return _special_cache[key]
+
+    row = conn.execute(WEEKLY_SPECIAL_SQL, (office, d.isoformat(), d.isoformat())).fetchone()
+
+    if len(_special_cache) >= SPECIAL_CACHE_MAX:
+        _special_cache.clear()
+    _special_cache[key] = row
+    return row
+
+
+def special_label(special) -> str:
+    label = f"Блюдо недели: {special['title']} / Weekly special: {special['title']}"
+    s = int(special["surcharge_eur"])
+    if s > 0:
+        label += f" (+{s}€)"
+    return label
+
+
+def hot_menu_with_special(office: str, d: date, ctx: RequestCtx | None = None):
+    items = MENU["hot"].copy()
+    special = (ctx or request_ctx()).special(office, d)
+    if special:
+        items.insert(0, special_label(special))
+    return items
+
+
+# --- Справочник блюд: (category, label) / ("special", weekly_special.id) -> dishes.id ---
+# Ключи — только блюда меню (проверены off_menu_dish) и блюда недели; на всякий случай — потолок.
+DISH_ID_CACHE_MAX = 1024
+_dish_ids = {}
+
+
+class DishNotFound(LookupError):
+    """
+    Проверенного по меню блюда нет в dishes: база отстала от кода (MIGRATE_ON_START=0,
+    а flask migrate после деплоя не прогнали). Записи отвечают 503, а не 500.
+    """
+
+    def __init__(self, what: str):
+        super().__init__(f"dish not found: {what}")
+        app.logger.error("dishes out of date (%s) — run `flask migrate`", what)
+
+
+def dish_id(conn: sqlite3.Connection, category: str, label: str | None):
+    """
+    Только поиск: строки dishes создают миграции / sync_menu_dishes и админка блюда недели.
+    Нет строки — DishNotFound.
+    """
+    if not label:
+        return None
+    key = (category, label)
+    did = _dish_ids.get(key)
+    if did is not None:
+        return did
+
+    row = conn.execute("SELECT id FROM dishes WHERE category=? AND label=? AND special_id IS NULL", key).fetchone()
+    if row is None:
+        raise DishNotFound(f"{category} {label!r}")
+    return _remember_dish_id(key, row["id"])
+
+
+def special_dish_id(conn: sqlite3.Connection, special_id: int):
+    """Строка dishes блюда недели (создаётся вместе с weekly_special)."""
+    key = ("special", special_id)
+    did = _dish_ids.get(key)
+    if did is not None:
+        return did
+
+    row = conn.execute("SELECT id FROM dishes WHERE special_id=?", (special_id,)).fetchone()
+    if row is None:
+        raise DishNotFound(f"weekly_special {special_id}")
+    return _remember_dish_id(key, row["id"])
+
+
+def _remember_dish_id(key: tuple, did: int) -> int:
+    if len(_dish_ids) >= DISH_ID_CACHE_MAX:
+        _dish_ids.clear()
+    _dish_ids[key] = did
+    return did
+
+
+def resolve_dish_ids(
+    conn: sqlite3.Connection, office: str, d: date, zakuska, soup, hot, dessert, bread, drink_code,
+    ctx: RequestCtx | None = None,
+) -> dict:
+    """
+    id блюд заказа для INSERT/UPDATE в orders. Названия должны быть уже проверены
+    off_menu_dish — здесь только поиск id; нет строки — DishNotFound (_dish_not_found_page / 503).
+    """
+    hot_id = dish_id(conn, "hot", hot) if hot in MENU["hot"] else None
+    if hot and hot_id is None:
+        special = (ctx or request_ctx()).special(office, d)
+        if not special or special_label(special) != hot:
+            raise DishNotFound(f"hot {hot!r}")
+        hot_id = special_dish_id(conn, special["id"])
+    return {
+        "zakuska_id": dish_id(conn, "zakuska", zakuska),
+        "soup_id": dish_id(conn, "soup", soup),
+        "hot_id": hot_id,
+        "dessert_id": dish_id(conn, "dessert", dessert),
+        "bread_id": dish_id(conn, "bread", bread),
+        "drink_id": dish_id(conn, "drink", DRINK_LABEL.get(drink_code)) if drink_code else None,
+    }
+
+
+def compute_option_base_price(zakuska, soup, hot, dessert, office: str, d: date, ctx: RequestCtx | None = None):
+    has_z = bool(zakuska)
+    has_s = bool(soup)
+    has_h = bool(hot)
+    has_d = bool(dessert)
+
+    if not has_s:
+        return None, None, "Суп обязателен / Soup is required."
+
+    if has_z and has_s and has_d and not has_h:
+        option = "opt1"
+        price = PRICES[option]
+    elif (not has_z) and has_s and has_h and has_d:
+        option = "opt2"
+        price = PRICES[option]
+    elif has_z and has_s and has_h and (not has_d):
+        option = "opt3"
+        price = PRICES[option]
+    else:
+        return None, None, "Нужно выбрать ровно 3 категории по правилам опций / Please select exactly 3 categories per options."
+
+    if hot and "Плов с бараниной" in hot:
+        price += PLOV_SURCHARGE
+
+    if hot and hot.startswith("Блюдо недели:"):
+        special = (ctx or request_ctx()).special(office, d)
+        if special:
+            price += float(int(special["surcharge_eur"]))
+
+    return option, float(price), None
+
+
+def off_menu_dish(office: str, d: date, zakuska, soup, hot, dessert, bread, ctx: RequestCtx | None = None) -> str | None:
+    """Первая категория, чьего блюда нет в меню на (office, d); блюдо недели — только своей недели."""
+    menu = {
+        "zakuska": (zakuska, MENU["zakuska"]),
+        "soup": (soup, MENU["soup"]),
+        "hot": (hot, hot_menu_with_special(office, d, ctx)),
+        "dessert": (dessert, MENU["dessert"]),
+        "bread": (bread, BREAD_OPTIONS),
+    }
+    for category, (label, items) in menu.items():
+        if label and label not in items:
+            return category
+    return None
+
+
+def compute_total_price(base_price: float, drink_code: str) -> float:
+    add = float(DRINK_PRICE.get((drink_code or "").strip(), 0.0))
+    return round(float(base_price) + add, 2)
+
+
+def generate_order_code(conn: sqlite3.Connection, d: date) -> str:
+    """
+    Следующий номер на дату d. Вызывать внутри транзакции записи (BEGIN IMMEDIATE):
+    UPSERT выдаёт номер атомарно, без поиска по orders.
+    """
+    seq = conn.execute(
+        """
+        INSERT INTO order_code_seq(prefix, order_date, seq) VALUES (?, ?, 1)
+        ON CONFLICT(prefix, order_date) DO UPDATE SET seq = seq + 1
+        RETURNING seq
+        """,
+        (ORDER_PREFIX, d.isoformat()),
+    ).fetchone()[0]
+    return f"{ORDER_PREFIX}-{d.strftime('%Y%m%d')}-{seq:03d}"
+
+
+CAPACITY_SQL = "SELECT active_count FROM daily_capacity WHERE office=? AND order_date=?"
+ACTIVE_ORDER_BY_PHONE_SQL = "SELECT * FROM orders WHERE office=? AND order_date=? AND phone_norm=? AND status='active'"
+# то же с названиями блюд — для формы /edit
+ACTIVE_ORDER_V_BY_PHONE_SQL = "SELECT * FROM orders_v WHERE office=? AND order_date=? AND phone_norm=? AND status='active'"
+
+
+def active_order_count(conn: sqlite3.Connection, office: str, d: date) -> int:
+    row = conn.execute(CAPACITY_SQL, (office, d.isoformat())).fetchone()
+    return row["active_count"] if row else 0
+
+
+def active_order_for_phone(conn: sqlite3.Connection, office: str, d: date, phone_norm: str):
+    """Активный заказ телефона на (office, d) — один на день (uq_orders_active_office_date_phone)."""
+    return conn.execute(ACTIVE_ORDER_BY_PHONE_SQL, (office, d.isoformat(), phone_norm)).fetchone()
+
+
+# --- Идемпотентность отправок форм ---
+IDEMPOTENCY_KEY_RE = re.compile(r"[A-Za-z0-9-]{8,64}")
+
+
+def idempotency_key() -> str | None:
+    # формы шлют скрытое поле, клиенты /api/v1 — заголовок Idempotency-Key
+    key = (request.headers.get("Idempotency-Key") or request.form.get("idempotency_key", "") or "").strip()
+    return key if IDEMPOTENCY_KEY_RE.fullmatch(key) else None
+
+
+def _idempotency_cutoff() -> str:
+    return (datetime.utcnow() - timedelta(hours=IDEMPOTENCY_TTL_HOURS)).isoformat()
+
+
+def request_fingerprint() -> str:
+    """
+    sha256 отправки: путь, параметры, поля формы (без idempotency_key) или JSON.
+    Сохранённый ответ отдаём только той же отправке — в нём телефон, имя и подписанная ссылка.
+    """
+    fp = g.get("request_fingerprint")
+    if fp is None:
+        if request.is_json:
+            payload = request.get_json(silent=True)
+        else:
+            payload = sorted((k, v) for k, v in request.form.items(multi=True) if k != "idempotency_key")
+        raw = json.dumps(
+            [request.method, request.path, sorted(request.args.items(multi=True)), payload],
+            ensure_ascii=False, sort_keys=True,
+        )
+        fp = g.request_fingerprint = hashlib.sha256(raw.encode("utf-8")).hexdigest()
+    return fp
+
+
+IDEMPOTENCY_REPLAY_SQL = "SELECT status, body, request_hash FROM idempotency_keys WHERE endpoint=? AND key=? AND created_at >= ?"
+IDEMPOTENCY_EVICT_SQL = "DELETE FROM idempotency_keys WHERE created_at < ?"
+
+
+def idempotent_replay(conn: sqlite3.Connection, endpoint: str, key: str | None):
+    """
+    Сохранённый ответ на отправку с этим ключом или None. Замок записи не нужен.
+    Ключ уже занят другой отправкой (другой телефон, состав, адрес) — 422, не чужой ответ.
+    """
+    if not key:
+        return None
+    row = conn.execute(IDEMPOTENCY_REPLAY_SQL, (endpoint, key, _idempotency_cutoff())).fetchone()
+    if row is None:
+        return None
+    if not hmac.compare_digest(row["request_hash"], request_fingerprint()):
+        if endpoint.startswith("/api/"):
+            return api_error(422, "idempotency_key_reused", "Ключ уже использован для другого запроса / Idempotency-Key was used for a different request.")
+        return Response(
+            html_page("<p class='danger'>Форма уже отправлена с другими данными. Обновите страницу. / This form was already submitted with different data. Please reload the page.</p><p><a href='/'>Назад / Back</a></p>"),
+            status=422, mimetype="text/html",
+        )
+    inc_metric("volga_idempotent_replays_total", route=_route_label())
+    return Response(row["body"], status=row["status"], mimetype="application/json" if endpoint.startswith("/api/") else "text/html")
+
+
+def remember_response(conn: sqlite3.Connection, endpoint: str, key: str | None, order_code: str, body: str, status: int = 200):
+    """
+    Вызывать в той же транзакции, что и само изменение: ключ появляется ровно тогда,
+    когда изменение закоммичено. Заодно выметаем ключи старше IDEMPOTENCY_TTL_HOURS.
+    """
+    if not key:
+        return
+    conn.execute(IDEMPOTENCY_EVICT_SQL, (_idempotency_cutoff(),))
+    conn.execute(
+        """
+        INSERT OR REPLACE INTO idempotency_keys(endpoint, key, order_code, status, body, created_at, request_hash)
+        VALUES (?,?,?,?,?,?,?)
+        """,
+        (endpoint, key, order_code, status, body, datetime.utcnow().isoformat(), request_fingerprint()),
+    )
+
+
+def file_path(name: str) -> str:
+    return os.path.join(os.path.dirname(__file__), name)
+
+
+def validate_floor_for_office(office: str, floor: str | None) -> tuple[bool, str | None]:
+    """
+    Возвращает (ok, normalized_floor)
+    """
+    if office in FLOORS_BY_OFFICE:
+        allowed = set(FLOORS_BY_OFFICE[office])
+        if floor not in allowed:
+            return False, None
+        return True, floor
+    return True, None
+
+
+# --- Запись заказа: общая для HTML-форм (/order, /edit) и /api/v1 ---
+class OrderRejected(Exception):
+    """Заказ не принят внутри транзакции записи: reason = "capacity" | "duplicate_phone"."""
+
+    def __init__(self, reason: str, existing=None):
+        super().__init__(reason)
+        self.reason = reason
+        self.existing = existing
+
+
+def order_values(name, floor, ids: dict, drink_code, option_code, total_price, comment) -> dict:
+    """Колонки orders, которые задаёт заказчик: INSERT в place_order, UPDATE в update_order."""
+    return {
+        "name": name,
+        "floor": floor,
+        **ids,
+        "drink_price_eur": float(DRINK_PRICE[drink_code]) if drink_code else None,
+        "option_code": option_code,
+        "price_eur": float(total_price),
+        "comment": comment,
+    }
+
+
+def selection_values(conn: sqlite3.Connection, office: str, d: date, sel: dict, ctx: RequestCtx) -> dict:
+    """Проверенный состав (name, floor, блюда, drink_code, option_code, total_price, comment) -> order_values."""
+    ids = resolve_dish_ids(
+        conn, office, d, sel["zakuska"], sel["soup"], sel["hot"], sel["dessert"], sel["bread"], sel["drink_code"], ctx
+    )
+    return order_values(sel["name"], sel["floor"], ids, sel["drink_code"], sel["option_code"], sel["total_price"], sel["comment"])
+
+
+def repeat_selection(row, d: date, ctx: RequestCtx):
+    """
+    Состав прошлого заказа (строка orders_v) — на дату d по сегодняшнему меню, блюду недели и ценам.
+    -> (состав для selection_values, None) или (None, (код, текст)).
+    """
+    office = row["office"]
+    if office in INACTIVE_OFFICES:
+        return None, ("office_unavailable", "Этот офис временно недоступен / This office is temporarily unavailable.")
+    ok_floor, floor = validate_floor_for_office(office, row["floor"])
+    if not ok_floor:
+        return None, ("floor_required", "Выберите этаж / Please choose floor.")
+    field = off_menu_dish(office, d, row["zakuska"], row["soup"], row["hot"], row["dessert"], row["bread"], ctx)
+    if field:
+        return None, ("unknown_dish", f"Сейчас нет в меню / Not on the menu now: {row[field]}")
+
+    drink_code = row["drink_code"] if row["drink_code"] in DRINK_PRICE else ""
+    option_code, base_price, err = compute_option_base_price(row["zakuska"], row["soup"], row["hot"], row["dessert"], office, d, ctx)
+    if err:
+        return None, ("invalid_option", err)
+    return {
+        "name": row["name"],
+        "floor": floor,
+        "zakuska": row["zakuska"],
+        "soup": row["soup"],
+        "hot": row["hot"],
+        "dessert": row["dessert"],
+        "drink_code": drink_code,
+        "bread": row["bread"],
+        "comment": row["comment"],
+        "option_code": option_code,
+        "total_price": compute_total_price(base_price, drink_code),
+    }, None
+
+
+def place_order(
+    conn: sqlite3.Connection, endpoint: str, key: str | None,
+    office: str, d: date, phone_raw: str, phone_norm: str, values: dict, render, status: int = 200,
+):
+    """
+    BEGIN IMMEDIATE -> повтор по ключу -> лимит -> дубль телефона -> номер -> INSERT -> COMMIT.
+    render(order_code) строит тело ответа внутри транзакции; оно же запоминается под ключом
+    идемпотентности. Возвращает тело или Response-повтор; не принят — OrderRejected.
+    Соединение закрывает сама.
+    """
+    try:
+        t_lock = perf_counter()
+        conn.execute("BEGIN IMMEDIATE")
+        observe_metric("volga_write_lock_wait_seconds", perf_counter() - t_lock, route=_route_label())
+
+        # параллельный двойной тап: первый успел закоммитить, пока мы ждали замок
+        replay = idempotent_replay(conn, endpoint, key)
+        if replay is not None:
+            conn.execute("ROLLBACK")
+            return replay
+
+        if active_order_count(conn, office, d) >= MAX_PER_DAY:
+            conn.execute("ROLLBACK")
+            count_rejection("capacity")
+            raise OrderRejected("capacity")
+
+        existing = active_order_for_phone(conn, office, d, phone_norm)
+        if existing:
+            conn.execute("ROLLBACK")
+            count_rejection("duplicate_phone")
+            raise OrderRejected("duplicate_phone", existing)
+
+        order_code = generate_order_code(conn, d)
+        row = {
+            "order_code": order_code, "office": office, "order_date": d.isoformat(),
+            "phone_raw": phone_raw, "phone_norm": phone_norm,
+            **values,
+            "status": "active", "created_at": datetime.utcnow().isoformat(),
+        }
+        conn.execute(
+            f"INSERT INTO orders({', '.join(row)}) VALUES ({', '.join('?' * len(row))})",
+            tuple(row.values()),
+        )
+
+        body = render(order_code)
+        remember_response(conn, endpoint, key, order_code, body, status)
+        conn.commit()
+    finally:
+        conn.close()
+    return body
+
+
+ORDER_BY_CODE_SQL = "SELECT * FROM orders_v WHERE order_code=?"
+
+
+def order_by_code(conn: sqlite3.Connection, order_code: str):
+    """Заказ с названиями блюд — точечный поиск по UNIQUE order_code."""
+    return conn.execute(ORDER_BY_CODE_SQL, (order_code,)).fetchone()
+
+
+# --- Подписанные ссылки на заказ: /edit/<order_code>?s=<HMAC> ---
+# Ссылку выдаёт страница подтверждения; по ней заказ открывается без офиса/даты/телефона.
+ORDER_LINK_SIG_LEN = 16  # hex-символов, 64 бита
+
+
+def order_link_signature(order_code: str) -> str:
+    return hmac.new(ORDER_LINK_SECRET, order_code.encode(), hashlib.sha256).hexdigest()[:ORDER_LINK_SIG_LEN]
+
+
+def order_link(order_code: str, action: str = "edit") -> str:
+    return f"/{action}/{order_code}?s={order_link_signature(order_code)}"
+
+
+def valid_order_link(order_code: str, sig: str | None) -> bool:
+    return hmac.compare_digest(order_link_signature(order_code).encode(), (sig or "").strip().encode())
+
+
+def update_order(conn: sqlite3.Connection, order_id: int, values: dict):
+    """UPDATE состава заказа; коммит — на вызывающем (вместе с remember_response)."""
+    conn.execute(
+        f"UPDATE orders SET {', '.join(f'{k}=?' for k in values)} WHERE id=?",
+        (*values.values(), order_id),
+    )
+
+
+def change_order(
+    conn: sqlite3.Connection, endpoint: str, key: str | None, order_code: str, apply, render, status: int = 200,
+):
+    """
+    BEGIN IMMEDIATE -> повтор по ключу -> apply(conn) -> render() -> remember_response -> COMMIT.
+    Правка и отмена: два параллельных повтора с одним ключом применяются один раз — второй
+    дожидается замка и получает ответ первого. Возвращает тело или Response-повтор.
+    Соединение закрывает сама.
+    """
+    try:
+        t_lock = perf_counter()
+        conn.execute("BEGIN IMMEDIATE")
+        observe_metric("volga_write_lock_wait_seconds", perf_counter() - t_lock, route=_route_label())
+
+        replay = idempotent_replay(conn, endpoint, key)
+        if replay is not None:
+            conn.execute("ROLLBACK")
+            return replay
+
+        apply(conn)
+        body = render()
+        remember_response(conn, endpoint, key, order_code, body, status)
+        conn.commit()
+    finally:
+        conn.close()
+    return body
+
+
+# ---------------------------
+# PWA minimal
+# ---------------------------
+# Тела manifest / icon.svg / sw.js зависят только от конфига — собираются один раз
+# (StaticBody: ETag и сжатые варианты тоже считаются при импорте).
+MANIFEST_BODY = StaticBody(
+    json.dumps(
+        {
+            "name": APP_TITLE,
+            "short_name": "VOLGA Lunch",
+            "start_url": "/",
+            "display": "standalone",
+            "background_color": "#EDE7D3",
+            "theme_color": "#EDE7D3",
+            "icons": [{"src": "/icon.svg", "sizes": "any", "type": "image/svg+xml"}],
+        },
+        ensure_ascii=False,
+    ),
+    "application/manifest+json",
+)
+
+
+@app.get("/manifest.webmanifest")
+def manifest():
+    return static_response(MANIFEST_BODY)
+
+
+ICON_SVG_BODY = StaticBody(
+    """<svg xmlns="http://www.w3.org/2000/svg" width="512" height="512" viewBox="0 0 512 512">
+<rect width="512" height="512" fill="#EDE7D3"/>
+<rect x="64" y="64" width="384" height="384" fill="#EDE7D3" stroke="#0E238E" stroke-width="14"/>
+<path d="M110 170 L402 110 L402 180 L110 240 Z" fill="#E73F24" opacity="0.95"/>
+<path d="M110 330 L402 270 L402 340 L110 400 Z" fill="#0E238E" opacity="0.95"/>
+<text x="256" y="290" font-family="Arial, sans-serif" font-size="64" text-anchor="middle" fill="#0E238E">VOLGA</text>
+</svg>""",
+    "image/svg+xml",
+)
+
+
+@app.get("/icon.svg")
+def icon_svg():
+    return static_response(ICON_SVG_BODY)
+
+
+@app.get("/logo.png")
+def logo_png():
+    p = file_path("logo.png")
+    if not os.path.exists(p):
+        return Response("logo.png not found", status=404, mimetype="text/plain")
+    return send_file(p)
+
+
+@app.get("/banner.png")
+def banner_png():
+    p = file_path("banner.png")
+    if not os.path.exists(p):
+        return Response("banner.png not found", status=404, mimetype="text/plain")
+    return send_file(p)
+
+
+# Стратегии service worker:
+#   /static/app.<hash>.*                  — cache-first (файлы неизменяемые);
+#   /, manifest, иконки, логотипы, /queued — stale-while-revalidate;
+#   /edit, /history, /admin, /api, ?phone=, ?token= — только сеть, в кэш не кладём (личное);
+#   POST /order без сети                  — в IndexedDB outbox, отправка через Background Sync
+#                                           (где его нет — при 'online' и при следующем открытии).
+# Повтор несёт тот же idempotency_key, что и исходная форма.
+SW_JS = f"""
+const STATIC_CACHE = 'volga-static-{APP_VERSION}';
+const PAGES_CACHE = 'volga-pages-{APP_VERSION}';
+const PRECACHE = ['/', '/queued', '/manifest.webmanifest', '/icon.svg', '/logo.png', '/banner.png'];
+const SWR_PATHS = new Set(PRECACHE);
+const PRIVATE_PREFIXES = ['/edit', '/history', '/admin', '/api/', '/metrics', '/export.csv'];
+const SYNC_TAG = 'volga-outbox';
+
+self.addEventListener('install', (e) => {{
+  e.waitUntil(
+    caches.open(PAGES_CACHE).then(cache => cache.addAll(PRECACHE))
+  );
+  self.skipWaiting();
+}});
+
+self.addEventListener('activate', (e) => {{
+  e.waitUntil(
+    caches.keys().then(keys =>
+      Promise.all(
+        keys.filter(k => k !== STATIC_CACHE && k !== PAGES_CACHE).map(k => caches.delete(k))
+      )
+    ).then(() => self.clients.claim()).then(() => flushOutbox().catch(() => {{}}))
+  );
+}});
+
+function isPrivate(url) {{
+  if (url.searchParams.has('phone') || url.searchParams.has('token')) return true;
+  return PRIVATE_PREFIXES.some(p => url.pathname.startsWith(p));
+}}
+
+function cacheFirst(req) {{
+  return caches.open(STATIC_CACHE).then(cache =>
+    cache.match(req).then(hit => hit || fetch(req).then(resp => {{
+      if (resp.ok) {{
+        cache.put(req, resp.clone());
+        // старые app.<hash> того же типа больше не понадобятся
+        const ext = new URL(req.url).pathname.split('.').pop();
+        cache.keys().then(keys => keys
+          .filter(k => k.url !== req.url && k.url.endsWith('.' + ext))
+          .forEach(k => cache.delete(k)));
+      }}
+      return resp;
+    }}))
+  );
+}}
+
+function staleWhileRevalidate(e) {{
+  return caches.open(PAGES_CACHE).then(cache =>
+    cache.match(e.request).then(hit => {{
+      const net = fetch(e.request).then(resp => {{
+        if (resp.ok) cache.put(e.request, resp.clone());
+        return resp;
+      }});
+      if (hit) {{
+        e.waitUntil(net.catch(() => {{}}));
+        return hit;
+      }}
+      return net;
+    }})
+  );
+}}
+
+/* ---- outbox (IndexedDB) ---- */
+function idb() {{
+  return new Promise((resolve, reject) => {{
+    const r = indexedDB.open('volga', 1);
+    r.onupgradeneeded = () => r.result.createObjectStore('outbox', {{ keyPath: 'key' }});
+    r.onsuccess = () => resolve(r.result);
+    r.onerror = () => reject(r.error);
+  }});
+}}
+
+function outbox(mode, fn) {{
+  return idb().then(db => new Promise((resolve, reject) => {{
+    const tx = db.transaction('outbox', mode);
+    const req = fn(tx.objectStore('outbox'));
+    tx.oncomplete = () => resolve(req && req.result);
+    tx.onerror = () => reject(tx.error);
+  }}));
+}}
+
+function newKey() {{
+  return self.crypto && crypto.randomUUID ? crypto.randomUUID() : Date.now() + '-' + Math.random().toString(16).slice(2);
+}}
+
+function queueOrder(path, body) {{
+  const params = new URLSearchParams(body);
+  if (!params.get('idempotency_key')) params.set('idempotency_key', newKey());
+  const item = {{ key: params.get('idempotency_key'), url: path, body: params.toString(), created: Date.now() }};
+  return outbox('readwrite', s => s.put(item))
+    .then(() => self.registration.sync ? self.registration.sync.register(SYNC_TAG).catch(() => {{}}) : null);
+}}
+
+function notify(msg) {{
+  return self.clients.matchAll({{ includeUncontrolled: true }}).then(cs => cs.forEach(c => c.postMessage(msg)));
+}}
+
+let flushing = null;
+function flushOutbox() {{
+  if (flushing) return flushing;
+  flushing = outbox('readonly', s => s.getAll()).then(items =>
+    items.reduce((p, item) => p.then(() =>
+      fetch(item.url, {{
+        method: 'POST',
+        body: item.body,
+        headers: {{ 'Content-Type': 'application/x-www-form-urlencoded' }},
+        credentials: 'same-origin',
+      }}).then(resp => {{
+        // 5xx — попробуем ещё раз; остальное сервер уже решил (принят, занято, окно закрыто)
+        if (resp.status >= 500) throw new Error('server ' + resp.status);
+        return resp.text().then(html => {{
+          const code = (html.match(/[A-Z]+-[0-9]{{8}}-[0-9]+/) || [null])[0];
+          return outbox('readwrite', s => s.delete(item.key))
+            .then(() => notify({{ type: 'outbox-sent', status: resp.status, code: code }}));
+        }});
+      }})
+    ), Promise.resolve())
+  ).finally(() => {{ flushing = null; }});
+  return flushing;
+}}
+
+self.addEventListener('sync', (e) => {{
+  if (e.tag === SYNC_TAG) e.waitUntil(flushOutbox());
+}});
+
+self.addEventListener('message', (e) => {{
+  if (e.data === 'flush-outbox') e.waitUntil(flushOutbox().catch(() => {{}}));
+}});
+
+self.addEventListener('fetch', (e) => {{
+  const req = e.request;
+  const url = new URL(req.url);
+  if (url.origin !== self.location.origin) return;
+
+  if (req.method === 'POST' && url.pathname === '/order') {{
+    e.respondWith(req.clone().text().then(body =>
+      fetch(req).catch(() =>
+        queueOrder(url.pathname, body)
+          .then(() => caches.match('/queued'))
+          .then(hit => hit || new Response('queued', {{ status: 202 }}))
+      )
+    ));
+    return;
+  }}
+
+  if (req.method !== 'GET' || isPrivate(url)) return;
+
+  if (url.pathname.startsWith('/static/')) {{
+    e.respondWith(cacheFirst(req));
+  }} else if (SWR_PATHS.has(url.pathname)) {{
+    e.respondWith(staleWhileRevalidate(e));
+  }}
+}});
+"""
+
+SW_JS_BODY = StaticBody(SW_JS, "application/javascript")
+
+
+@app.get("/sw.js")
+def sw_js():
+    # no-cache: браузер каждый раз сверяет ETag и быстро получает новую версию
+    return static_response(SW_JS_BODY, "no-cache")
+
+
+@app.get("/queued")
+def queued():
+    # эту страницу service worker показывает вместо ответа на /order без сети
+    return html_page(
+        """
+      <h2>📶 Нет связи / No connection</h2>
+      <div class="card">
+        <p><b>Заказ сохранён на телефоне и уйдёт автоматически, как только появится интернет.</b></p>
+        <p><small>Your order is saved on this device and will be sent automatically once you are back online.</small></p>
+        <p class="muted">Не отправляйте его повторно. / Please don't submit it again.</p>
+      </div>
+      <p><a href="/">← На главную / Home</a></p>
+    """
+    )
+
+
+# ---------------------------
+# HTML shell
+# ---------------------------
+# Стили и скрипты оболочки отдаются отдельными файлами /static/app.<hash>.css|js:
+# браузер кэширует их навсегда, хэш меняется вместе с содержимым и APP_VERSION.
+SHELL_CSS = """:root{
+  --volga-blue:#0E238E;
+  --volga-red:#E73F24;
+  --volga-burgundy:#8E2C1F;
+  --volga-bg:#EDE7D3;
+}
+
+*{ box-sizing:border-box; }
+
+body{
+  font-family:-apple-system, system-ui, Arial;
+  margin:18px;
+  background:var(--volga-bg);
+  color:var(--volga-blue);
+}
+
+.card{
+  background:transparent;
+  border:2px solid var(--volga-blue);
+  border-radius:0;
+  padding:28px;
+  margin:30px auto;
+  max-width:900px;
+  overflow:hidden;
+}
+
+h1{
+  color:var(--volga-blue);
+  font-weight:800;
+  letter-spacing:1px;
+  margin:0 0 14px 0;
+  line-height:1.0;
+}
+h1 small{
+  display:block;
+  color:var(--volga-red);
+  font-weight:800;
+  line-height:1.00;
+  margin-top:4px;
+}
+
+.hero-title{
+  text-align:center;
+  font-weight:800;
+  font-size:28px;
+  line-height:1.15;
+  letter-spacing:1px;
+  margin-bottom:14px;
+}
+.hero-title .ru{ color: var(--volga-blue); }
+.hero-title .en{ color: var(--volga-red); }
+
+label{
+  display:block;
+  margin:0 0 4px 0;
+  font-weight:800;
+  overflow-wrap:anywhere;
+  color:var(--volga-red);
+}
+
+input, select, textarea{
+  width:100%;
+  max-width:520px;
+  padding:12px;
+  margin:0;
+  font-size:16px;
+  background:var(--volga-bg);
+  color:var(--volga-blue);
+  border:2px solid var(--volga-blue);
+  border-radius:0;
+}
+
+input:focus, select:focus, textarea:focus{
+  outline:none;
+  border:2px solid var(--volga-blue);
+}
+
+.row{
+  display:grid;
+  grid-template-columns:minmax(0,1fr) minmax(0,1fr);
+  column-gap:18px;
+  row-gap:10px;
+  align-items:start;
+  margin-top:10px;
+}
+.row > div{
+  width:100%;
+  max-width:520px;
+}
+
+.muted{ color:var(--volga-burgundy); }
+.danger{ color:var(--volga-red); font-weight:800; }
+small{
+  display:block;
+  margin:2px 0 0 0;
+  line-height:1.1;
+  color:var(--volga-burgundy);
+}
+
+a{ color:var(--volga-blue); text-decoration:none; font-weight:700; }
+a:hover{ color:var(--volga-red); }
+
+.pill{
+  display:inline-block;
+  padding:6px 10px;
+  border-radius:999px;
+  border:1px solid var(--volga-blue);
+  margin-right:8px;
+  color:var(--volga-blue);
+}
+
+.lead{
+  color:var(--volga-blue);
+  text-align:center;
+  font-weight:900;
+  margin:12px 0 0 0;
+}
+.lead .en{ color:var(--volga-red); font-weight:800; }
+
+.hours{
+  margin:14px 0 0 0;
+  text-align:center;
+  font-weight:900;
+}
+.hours .ru{ color:var(--volga-blue); }
+.hours .en{ color:var(--volga-red); }
+
+.btn-confirm{
+  display:block;
+  width:100%;
+  max-width:520px;
+  padding:16px 24px;
+  font-size:16px;
+  font-weight:800;
+  background:var(--volga-blue);
+  color:var(--volga-bg);
+  border:none;
+  border-radius:0;
+  cursor:pointer;
+  transition:0.2s ease;
+}
+.btn-confirm:active{ background:var(--volga-red); }
+
+.btn-edit{
+  display:flex;
+  text-align:center;
+  align-items:center;
+  justify-content:center;
+  width:100%;
+  max-width:520px;
+  padding:16px 24px;
+  font-size:16px;
+  font-weight:800;
+  background:var(--volga-red);
+  color:var(--volga-bg);
+  border:none;
+  border-radius:0;
+  cursor:pointer;
+  transition:0.2s ease;
+  margin-top:18px;
+}
+.btn-edit:active{ background:var(--volga-blue); }
+
+.comment-block{ margin-top:18px; }
+
+.banner-block{
+  margin-top:18px;
+  margin-bottom:18px;
+}
+
+@media (max-width: 700px){
+  .card{ padding:20px; }
+  .row{ grid-template-columns:1fr; column-gap:0; row-gap:10px; margin-top:10px; }
+  .row > div{ max-width:none; }
+  input, select, textarea{ max-width:100%; }
+  h1{ letter-spacing:0.5px; }
+
+  input[type="date"]{
+    -webkit-appearance: none;
+    appearance: none;
+  }
+  #order_date{
+    width: 100%;
+    max-width: 100%;
+    min-width: 0;
+    display: block;
+    margin-left: 2px;
+    margin-right: 2px;
+  }
+}
+
+/* --- ADMIN BUTTONS STYLE --- */
+.btn-primary{
+  display:block;
+  width:100%;
+  margin-top:20px;
+  padding:14px 24px;
+  font-size:16px;
+  font-weight:700;
+  border:2px solid var(--volga-blue);
+  background:var(--volga-blue);
+  color:var(--volga-bg);
+  border-radius:0;
+  text-align:center;
+}
+.btn-primary:hover{ background:var(--volga-red); border-color:var(--volga-red); }
+.btn-primary:active{ background:var(--volga-red); border-color:var(--volga-red); }
+
+.btn-danger{
+  display:block;
+  width:100%;
+  margin-top:14px;
+  padding:14px 24px;
+  font-size:16px;
+  font-weight:700;
+  border:2px solid var(--volga-red);
+  background:var(--volga-red);
+  color:var(--volga-bg);
+  border-radius:0;
+  text-align:center;
+}
+.btn-danger:hover{ background:var(--volga-blue); border-color:var(--volga-blue); }
+.btn-danger:active{ background:var(--volga-blue); border-color:var(--volga-blue); }
+
+.admin-table{
+  width:100%;
+  border-collapse:collapse;
+  margin-top:10px;
+  font-size:14px;
+}
+.admin-table th,
+.admin-table td{
+  border:2px solid var(--volga-blue);
+  padding:8px 10px;
+  vertical-align:top;
+}
+.admin-table th{
+  background:var(--volga-bg);
+  color:var(--volga-blue);
+  text-align:left;
+  font-weight:800;
+}
+.admin-table td small{ color:var(--volga-burgundy); }
+.admin-table tbody tr:hover{
+  outline:2px solid var(--volga-red);
+  outline-offset:-2px;
+}
+@media (max-width: 700px){
+  .admin-table{ font-size:13px; }
+  .admin-table th.created,
+  .admin-table td.created{ display:none; }
+}
+
+/* === VOLGA POPUP (единый для всего) === */
+#volgaPopupOverlay{
+  position:fixed;
+  inset:0;
+  background:rgba(0,0,0,0.35);
+  display:none;
+  align-items:center;
+  justify-content:center;
+  z-index:9999;
+}
+
+#volgaPopupBox{
+  background:var(--volga-blue);
+  color:var(--volga-bg);
+  border:3px solid var(--volga-blue);
+  padding:20px 24px;
+  max-width:420px;
+  width:90%;
+  text-align:center;
+  font-weight:800;
+  line-height:1.4;
+}
+
+#volgaPopupBox button{
+  margin-top:14px;
+  padding:8px 18px;
+  border:2px solid var(--volga-bg);
+  background:var(--volga-red);
+  color:var(--volga-bg);
+  font-weight:800;
+  cursor:pointer;
+}
+"""
+
+# Глобальные функции попапа — их зовут блоки ниже и onclick в разметке.
+SHELL_JS_POPUP = """function showVolgaPopup(text){
+  const t = document.getElementById("volgaPopupText");
+  const o = document.getElementById("volgaPopupOverlay");
+  if (!t || !o) return;
+  t.innerHTML = text;
+  o.style.display = "flex";
+}
+function hideVolgaPopup(){
+  const o = document.getElementById("volgaPopupOverlay");
+  if (!o) return;
+  o.style.display = "none";
+}
+document.addEventListener("click", (e)=>{
+  const o = document.getElementById("volgaPopupOverlay");
+  if (!o) return;
+  if (e.target === o) hideVolgaPopup();
+});
+"""
+
+# Бывшие отдельные <script>: каждый блок в своём try — как и с отдельными тегами,
+# ошибка одного не останавливает остальные.
+SHELL_JS_BLOCKS = [
+    """(function(){
+  // anti-double-submit
+  document.querySelectorAll('form').forEach((f) => {
+    f.addEventListener('submit', () => {
+      const btns = f.querySelectorAll('button[type="submit"]');
+      btns.forEach(b => {
+        b.disabled = true;
+        b.textContent = 'Отправка… / Sending…';
+      });
+    });
+  });
+
+  // один ключ на загрузку страницы: повтор той же формы (двойной тап, outbox) сервер узнает
+  document.querySelectorAll('input[name="idempotency_key"]').forEach((i) => {
+    if (!i.value) {
+      i.value = (window.crypto && crypto.randomUUID)
+        ? crypto.randomUUID()
+        : Date.now() + '-' + Math.random().toString(16).slice(2);
+    }
+  });
+
+  // service worker
+  if ('serviceWorker' in navigator) {
+    navigator.serviceWorker.register('/sw.js').catch(()=>{});
+
+    // заказы из outbox: где нет Background Sync, досылаем при появлении сети / открытии
+    const flush = () => {
+      if (navigator.serviceWorker.controller) navigator.serviceWorker.controller.postMessage('flush-outbox');
+    };
+    window.addEventListener('online', flush);
+    navigator.serviceWorker.ready.then(flush).catch(()=>{});
+
+    navigator.serviceWorker.addEventListener('message', (e) => {
+      const m = e.data || {};
+      if (m.type !== 'outbox-sent') return;
+      if (m.status === 200) {
+        showVolgaPopup(`✅ Сохранённый заказ отправлен${m.code ? ': <b>' + m.code + '</b>' : ''}.<br><small>Your saved order was sent.</small>`);
+      } else if (m.status === 409) {
+        showVolgaPopup('Сохранённый заказ не принят: заказ уже есть или мест нет.<br><small>Saved order not accepted: already ordered or no slots left.</small>');
+      } else if (m.status === 403) {
+        showVolgaPopup('Сохранённый заказ не принят: окно приёма закрылось.<br><small>Saved order not accepted: ordering window closed.</small>');
+      } else {
+        showVolgaPopup(`Сохранённый заказ не принят (код ${m.status}).<br><small>Saved order was not accepted.</small>`);
+      }
+    });
+  }
+})();""",
+    """/* ====== FLOOR CHECK FIXED (NO SENDING FREEZE) ====== */
+(() => {
+  const form = document.querySelector('form[action="/order"]');
+  const officeEl = document.getElementById("office");
+  const floorEl = document.getElementById("floor");
+  const floorCell = document.getElementById("floorCell");
+
+  if (!form || !officeEl || !floorEl || !floorCell) return;
+  if (typeof showVolgaPopup !== "function") return;
+
+  function isAlameda(){
+    return (officeEl.value || "").trim() === "ALAMEDA";
+  }
+
+  function showFloorError(){
+    floorCell.style.display = "block";
+    showVolgaPopup(
+      "Пожалуйста, выберите этаж для ALAMEDA.<br><br>" +
+      "Please choose a floor for ALAMEDA."
+    );
+    floorEl.scrollIntoView({ behavior: "smooth", block: "center" });
+    setTimeout(() => floorEl.focus(), 150);
+  }
+
+  // ВАЖНО: третий параметр true — это фикс зависания
+  form.addEventListener("submit", (e) => {
+    if (isAlameda() && (!floorEl.value || floorEl.value.trim() === "")) {
+      e.preventDefault();
+      e.stopImmediatePropagation(); // не даем кнопке стать "Sending..."
+      showFloorError();
+    }
+  }, true);
+
+})();""",
+    """/* ====== DISH RULES CHECK (popup instead of server error) ====== */
+(() => {
+  const form = document.querySelector('form[action="/order"]');
+  if (!form) return;
+  if (typeof showVolgaPopup !== "function") return;
+
+  const z = document.getElementById("zakuska");
+  const s = document.getElementById("soup");
+  const h = document.getElementById("hot");
+  const d = document.getElementById("dessert");
+
+  if (!z || !s || !h || !d) return;
+
+  function has(el){
+    return !!(el.value && el.value.trim() !== "");
+  }
+
+  function focusEl(el){
+    el.scrollIntoView({ behavior: "smooth", block: "center" });
+    setTimeout(() => el.focus(), 150);
+  }
+
+  // Capture=true — чтобы сработать ДО anti-double-submit (и не было "Sending...")
+  form.addEventListener("submit", (e) => {
+    const hasZ = has(z);
+    const hasS = has(s);
+    const hasH = has(h);
+    const hasD = has(d);
+
+    const count = (hasZ?1:0) + (hasS?1:0) + (hasH?1:0) + (hasD?1:0);
+
+    // 1) Суп обязателен
+    if (!hasS){
+      e.preventDefault();
+      e.stopImmediatePropagation();
+      showVolgaPopup(
+        "Любая опция включает суп. Выберите пожалуйста суп.<br><br>" +
+        "All options come with soup. Please choose a soup."
+      );
+      focusEl(s);
+      return;
+    }
+
+    // 2) Ровно 3 блюда (суп + ещё 2)
+    if (count !== 3){
+      e.preventDefault();
+      e.stopImmediatePropagation();
+      showVolgaPopup(
+        "Нужно выбрать 3 блюда. Любая опция включает суп.<br><br>" +
+        "Please select 3 dishes. All options come with soup."
+      );
+      // подсказка куда смотреть
+      if (!hasZ) focusEl(z);
+      else if (!hasH) focusEl(h);
+      else if (!hasD) focusEl(d);
+      return;
+    }
+
+    // 3) Проверка корректной комбинации (opt1/opt2/opt3)
+    const isOpt1 = hasZ && hasS && hasD && !hasH; // zak + soup + dessert
+    const isOpt2 = !hasZ && hasS && hasH && hasD; // soup + hot + dessert
+    const isOpt3 = hasZ && hasS && hasH && !hasD; // zak + soup + hot
+
+    if (!(isOpt1 || isOpt2 || isOpt3)){
+      e.preventDefault();
+      e.stopImmediatePropagation();
+      showVolgaPopup(
+        "Комбинация выбрана неверно.<br>" +
+        "Выберите одну из опций (3 блюда).<br><br>" +
+        "Wrong combination. Please follow the options (3 dishes)."
+      );
+      focusEl(h); // обычно ошибка здесь, но можно и на баннер прокрутить
+      return;
+    }
+  }, true);
+})();""",
+    """/* ====== DISH LIMIT (макс 3 блюда) ====== */
+(function () {
+  const MAX_DISHES = 3;
+  const dishIds = ["zakuska", "soup", "hot", "dessert"];
+
+  const form = document.querySelector('form[action="/order"]') || document.querySelector("form");
+  if (!form) return;
+
+  const selects = dishIds
+    .map(id => document.getElementById(id))
+    .filter(Boolean);
+
+  function countSelected() {
+    let c = 0;
+    for (const s of selects) {
+      if (s.value && s.value.trim() !== "") c++;
+    }
+    return c;
+  }
+
+  for (const s of selects) {
+    s.dataset.prev = s.value || "";
+
+    s.addEventListener("focus", () => {
+      s.dataset.prev = s.value || "";
+    });
+
+    s.addEventListener("change", () => {
+      const c = countSelected();
+
+      if (c > MAX_DISHES) {
+        s.value = s.dataset.prev || "";
+        showVolgaPopup(
+          `Можно выбрать максимум ${MAX_DISHES} блюда. Любая опция включает суп. <br>` +
+          `You can select maximum ${MAX_DISHES} dishes. All options come with soup.`
+        );
+      } else {
+        s.dataset.prev = s.value || "";
+      }
+    });
+  }
+
+  form.addEventListener("submit", (e) => {
+    const c = countSelected();
+    if (c > MAX_DISHES) {
+      e.preventDefault();
+      showVolgaPopup(
+        `ОШИБКА: ВЫБРАНО ${c} БЛЮДА. МАКСИМУМ — ${MAX_DISHES}.<br><br>` +
+        `ERROR: ${c} DISHES SELECTED. MAXIMUM ALLOWED IS ${MAX_DISHES}.`
+      );
+    }
+  });
+})();""",
+    """/* ====== DATE VALIDATION (Tue–Fri, и правило 11:00) ====== */
+(() => {
+  const dateInput = document.getElementById("order_date");
+  if (!dateInput) return;
+
+  const form = dateInput.closest("form");
+  const CUT_OFF_HOUR = 11;
+
+  function pad(n){ return String(n).padStart(2,"0"); }
+  function ymd(d){ return `${d.getFullYear()}-${pad(d.getMonth()+1)}-${pad(d.getDate())}`; }
+
+  function isAllowedDay(d){
+    return d.getDay() >= 2 && d.getDay() <= 5; // Tue–Fri only
+  }
+
+  function startOfDay(d){
+    return new Date(d.getFullYear(), d.getMonth(), d.getDate());
+  }
+
+  function isAfterCutoff(now){
+    const hh = now.getHours();
+    const mm = now.getMinutes();
+    return (hh > CUT_OFF_HOUR) || (hh === CUT_OFF_HOUR && mm > 0);
+  }
+
+  function nextAllowedFrom(day0){
+    const x = new Date(day0.getFullYear(), day0.getMonth(), day0.getDate());
+    x.setDate(x.getDate() + 1);
+    while(!isAllowedDay(x)) x.setDate(x.getDate() + 1);
+    return x;
+  }
+
+  function allowedDateYMD(){
+    const now = new Date();
+    const today = startOfDay(now);
+
+    if (!isAfterCutoff(now) && isAllowedDay(today)) {
+      return ymd(today);
+    }
+    return ymd(nextAllowedFrom(today));
+  }
+
+  function validateOrderDate(selectedYMD){
+    if (!selectedYMD) return true;
+
+    const now = new Date();
+    const [Y,M,D] = selectedYMD.split("-").map(Number);
+    const sel = new Date(Y, M-1, D);
+    const today = startOfDay(now);
+
+    if (startOfDay(sel) < today){
+      showVolgaPopup("Вы выбрали прошедшую дату.<br><br>You can’t choose a past date.");
+      return false;
+    }
+
+    if (!isAllowedDay(sel)){
+      showVolgaPopup("Заказ доступен вторник–пятница.<br><br>Order available Tuesday–Friday only.");
+      return false;
+    }
+
+    const mustBe = allowedDateYMD();
+    if (selectedYMD !== mustBe){
+      showVolgaPopup(
+        "Дата заказа выбрана неверно.<br>" +
+        "До 11:00 можно заказать на сегодня.<br>" +
+        "После 11:00 — только на следующий рабочий день.<br><br>" +
+        "Wrong order date.<br>" +
+        "Before 11:00 you can order for today.<br>" +
+        "After 11:00 — only for the next working day."
+      );
+      return false;
+    }
+
+    return true;
+  }
+
+  function resetToAllowed(){
+    dateInput.value = allowedDateYMD();
+  }
+
+  dateInput.addEventListener("change", () => {
+    if(!validateOrderDate(dateInput.value)){
+      resetToAllowed();
+    }
+  });
+
+  if(form){
+    form.addEventListener("submit", (e)=>{
+      if(!validateOrderDate(dateInput.value)){
+        e.preventDefault();
+        resetToAllowed();
+      }
+    });
+  }
+})();""",
+    """/* ====== FLOOR (ALAMEDA only) ====== */
+(() => {
+  const officeEl = document.getElementById("office");
+  const floorCell = document.getElementById("floorCell");
+  const floorEl = document.getElementById("floor");
+  if (!officeEl || !floorCell || !floorEl) return;
+
+  function syncFloor(){
+    const isAlameda = officeEl.value === "ALAMEDA";
+    floorCell.style.display = isAlameda ? "block" : "none";
+    
+    if (!isAlameda) floorEl.value = "";
+  }
+
+  officeEl.addEventListener("change", syncFloor);
+  syncFloor();
+})();""",
+    """/* ====== CAPACITY (остаток мест на дату) ====== */
+(() => {
+  const info = document.getElementById("capacityInfo");
+  const officeEl = document.getElementById("office");
+  const dateEl = document.getElementById("order_date");
+  if (!info || !officeEl || !dateEl) return;
+
+  function refresh(){
+    if (!officeEl.value || !dateEl.value) return;
+    const q = `office=${encodeURIComponent(officeEl.value)}&date=${encodeURIComponent(dateEl.value)}`;
+    fetch(`/api/capacity?${q}`, { cache: "no-store" })
+      .then(r => r.ok ? r.json() : null)
+      .then(data => {
+        if (!data) return;
+        info.textContent = data.remaining > 0
+          ? `Осталось мест: ${data.remaining} / Slots left: ${data.remaining}`
+          : "Мест на эту дату нет / No slots left for this date";
+      })
+      .catch(() => {});
+  }
+
+  officeEl.addEventListener("change", refresh);
+  dateEl.addEventListener("change", refresh);
+  setInterval(() => { if (!document.hidden) refresh(); }, 30000);
+  // страница могла прийти из кэша service worker — остаток сразу освежаем
+  refresh();
+})();""",
+]
+SHELL_JS = SHELL_JS_POPUP + "".join(
+    f"\ntry {{\n{block}\n}} catch (e) {{ console.error(e); }}\n" for block in SHELL_JS_BLOCKS
+)
+
+
+def _bundle_name(ext: str, content: str) -> str:
+    h = hashlib.sha256((APP_VERSION + "\n" + content).encode("utf-8")).hexdigest()[:12]
+    return f"app.{h}.{ext}"
+
+
+SHELL_CSS_NAME = _bundle_name("css", SHELL_CSS)
+SHELL_JS_NAME = _bundle_name("js", SHELL_JS)
+
+STATIC_BUNDLES = {
+    SHELL_CSS_NAME: StaticBody(SHELL_CSS, "text/css; charset=utf-8"),
+    SHELL_JS_NAME: StaticBody(SHELL_JS, "application/javascript; charset=utf-8"),
+}
+
+
+@app.get("/static/<name>")
+def static_bundle(name: str):
+    bundle = STATIC_BUNDLES.get(name)
+    if not bundle:
+        return Response("not found", status=404, mimetype="text/plain")
+    return static_response(bundle, "public, max-age=31536000, immutable")
+
+
+# Оболочка режется на две части один раз при импорте — рендер это просто склейка.
+SHELL_HEAD = f"""<!doctype html>
+<html lang="ru">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>VOLGA Lunch</title>
+
+<link rel="manifest" href="/manifest.webmanifest">
+<meta name="theme-color" content="#EDE7D3">
+<link rel="stylesheet" href="/static/{SHELL_CSS_NAME}">
+</head>
+<body>
+"""
+
+SHELL_TAIL = f"""
+
+<div id="volgaPopupOverlay">
+  <div id="volgaPopupBox">
+    <div id="volgaPopupText"></div>
+    <button type="button" onclick="hideVolgaPopup()">OK</button>
+  </div>
+</div>
+
+<script src="/static/{SHELL_JS_NAME}"></script>
+</body>
+</html>"""
+
+
+def html_page(body: str) -> str:
+    return SHELL_HEAD + body + SHELL_TAIL
+
+
+# ---------------------------
+# Routes
+# ---------------------------
+@app.get("/")
+def form():
+    ctx = request_ctx()
+    default_date = compute_default_date(ctx)
+
+    office = request.args.get("office", OFFICES[0])
+    if office not in OFFICES:
+        office = OFFICES[0]
+
+    # ✅ если кто-то руками открыл MUSICA — на главной уводим на ALAMEDA
+    if office in INACTIVE_OFFICES:
+        office = OFFICES[0]
+
+    d_str = request.args.get("date", default_date.isoformat())
+    try:
+        d = date.fromisoformat(d_str)
+    except ValueError:
+        d = default_date
+
+    hot_items = hot_menu_with_special(office, d, ctx)
+    ok_time, start, end, now_ = validate_order_time(d, ctx)
+
+    conn = db()
+    cnt = active_order_count(conn, office, d)
+    conn.close()
+
+    limit_reached = cnt >= MAX_PER_DAY
+    remaining = max(0, MAX_PER_DAY - cnt)
+
+    warn = ""
+    if is_closed_day(d):
+        warn += "<p class='danger'><b>В понедельник мы не работаем.</b><br><small>We are closed on Mondays.</small></p>"
+    if not ok_time and not is_closed_day(d):
+        warn += (
+            f"<p class='danger'><b>Приём заказов на {d.isoformat()} закрыт.</b><br>"
+            f"<small>Окно: {start.strftime('%d.%m %H:%M')} — {end.strftime('%d.%m %H:%M')} (Europe/Madrid). "
+            f"Сейчас: {now_.strftime('%d.%m %H:%M')}.</small></p>"
+        )
+    if limit_reached:
+        warn += "<p class='danger'><b>На выбранную дату заказы временно недоступны.</b><br><small>Orders are temporarily unavailable for this date.</small></p>"
+
+    # ✅ MUSICA disabled в выпадающем списке на главной
+    office_opts = "".join([
+        f"<option value='{o}' "
+        f"{'selected' if o==office else ''} "
+        f"{'disabled' if o in INACTIVE_OFFICES else ''}>"
+        f"{o}{' (temporarily unavailable)' if o in INACTIVE_OFFICES else ''}"
+        f"</option>"
+        for o in OFFICES
+    ])
+
+    drink_options = "".join([f"<option value='{k}'>{lbl}</option>" for (k, lbl, _) in DRINKS])
+
+    body = f"""
+<div style="text-align:center; margin-bottom:18px;">
+  <img src="/logo.png" alt="VOLGA" style="max-height:120px;">
+</div>
+
+<h1 class="hero-title">
+  <span class="ru">БИЗНЕС-ЛАНЧ RingCentral</span><br>
+  <span class="en">BUSINESS LUNCH RingCentral</span>
+</h1>
+
+<p class="lead">
+  Доставка в 13:00. Заказ до 11:00.<br>
+  <span class="en">Delivery at 13:00. Order before 11:00.</span>
+</p>
+
+<p class="hours">
+  <span class="ru">Вторник — Пятница</span><br>
+  <span class="en">Tuesday — Friday</span>
+</p>
+
+{warn}
+
+<div class="card">
+  <form method="post" action="/order" autocomplete="on">
+    <input type="hidden" name="idempotency_key" value="">
+
+    <div class="row">
+      <div>
+        <label>Офис / Office</label>
+        <select id="office" name="office" required>{office_opts}</select>
+      </div>
+
+      <div id="floorCell" style="display:none;">
+        <label>Этаж / Floor</label>
+       <select id="floor" name="floor">
+  <option value="">— выбери этаж / choose floor —</option>
+  <option value="1st floor">1 этаж / 1st floor</option>
+  <option value="6th floor">6 этаж / 6th floor</option>
+</select>
+      </div>
+    </div>
+
+    <div class="row">
+      <div>
+        <label>Дата доставки / Delivery date</label>
+        <input id="order_date" type="date" name="order_date" value="{d.isoformat()}" required>
+        <small id="capacityInfo">Осталось мест: {remaining} / Slots left: {remaining}</small>
+      </div>
+      <div></div>
+    </div>
+
+    <div class="row">
+      <div>
+        <label>Как вас зовут / Your name</label>
+        <input name="name" required>
+      </div>
+      <div>
+        <label>Телефон / Phone</label>
+        <input name="phone" required>
+        <small>для связи и поиска заказа / for contact & order lookup</small>
+      </div>
+    </div>
+    <div class="banner-block">
+      <img src="/banner.png" alt="Options" style="width:100%; display:block; border:2px solid var(--volga-blue);">
+    </div>
+
+    <div class="row">
+      <div>
+        <label>Закуска / Starter</label>
+        <select id="zakuska" name="zakuska">
+          <option value="">— без закуски / no starter —</option>
+          {options_html(MENU["zakuska"])}
+        </select>
+      </div>
+      <div>
+        <label>Суп / Soup</label>
+        <select id="soup" name="soup" required>
+          <option value="">— выбери суп / choose soup —</option>
+          {options_html(MENU["soup"])}
+        </select>
+      </div>
+    </div>
+
+    <div class="row">
+      <div>
+        <label>Горячее / Main</label>
+        <select id="hot" name="hot">
+          <option value="">— без горячего / no main —</option>
+          {options_html(hot_items)}
+        </select>
+      </div>
+
+      <div>
+        <label>Десерт / Dessert</label>
+        <select id="dessert" name="dessert">
+          <option value="">— без десерта / no dessert —</option>
+          {options_html(MENU["dessert"])}
+        </select>
+      </div>
+    </div>
+
+    <div class="row">
+      <div>
+        <label>Напиток / Drink</label>
+        <select id="drink" name="drink">{drink_options}</select>
+        <small>оплачивается отдельно / not included</small>
+      </div>
+
+      <div>
+        <label>Хлеб / Bread</label>
+        <select id="bread" name="bread">
+          <option value="">— без хлеба / no bread —</option>
+          {options_html(BREAD_OPTIONS)}
+        </select>
+      </div>
+    </div>
+
+    <div class="comment-block">
+      <label>Комментарий / Notes</label>
+      <textarea name="comment" rows="3" placeholder=""></textarea>
+    </div>
+
+    <button type="submit" class="btn-confirm" style="margin-top:22px;">
+      Подтвердить заказ / Confirm order
+    </button>
+
+    <a href="/edit" class="btn-edit">
+      Изменить или отменить заказ / Edit or cancel
+    </a>
+
+    <p style="margin-top:12px;"><a href="/history">Мои заказы — повторить прошлый / My orders — repeat</a></p>
+  </form>
+</div>
+"""
+    return html_page(body)
+
+
+@app.post("/order")
+def order():
+    # ✅ повтор той же отправки (двойной тап, outbox) — прежний ответ, без BEGIN IMMEDIATE
+    key = idempotency_key()
+    replay = idempotent_replay(db(), "/order", key)
+    if replay is not None:
+        return replay
+
+    office = (request.form.get("office", "") or "").strip()
+    if office not in OFFICES:
+        return html_page("<p class='danger'>Ошибка: неизвестный офис / Unknown office.</p><p><a href='/'>Назад / Back</a></p>"), 400
+
+    # ✅ запрет новых заказов в MUSICA
+    if office in INACTIVE_OFFICES:
+        return html_page("<p class='danger'>Этот офис временно недоступен / This office is temporarily unavailable.</p><p><a href='/'>Назад / Back</a></p>"), 403
+
+    order_date = (request.form.get("order_date", "") or "").strip()
+    try:
+        d = date.fromisoformat(order_date)
+    except ValueError:
+        return html_page("<p class='danger'>Ошибка: неверная дата / Invalid date.</p><p><a href='/'>Назад / Back</a></p>"), 400
+
+    # ✅ этаж
+    floor = (request.form.get("floor", "") or "").strip() or None
+    ok_floor, floor = validate_floor_for_office(office, floor)
+    if not ok_floor:
+        return html_page("<p class='danger'>Выберите этаж (ALAMEDA) / Please choose floor (ALAMEDA).</p><p><a href='/'>Назад / Back</a></p>"), 400
+
+    ctx = request_ctx()
+    ok_time, start, end, now_ = validate_order_time(d, ctx)
+    if not ok_time:
+        count_rejection("window")
+        if is_closed_day(d):
+            return html_page("<p class='danger'><b>В понедельник мы не работаем.</b><br><small>We are closed on Mondays.</small></p><p><a href='/'>Назад / Back</a></p>"), 403
+        return html_page(
+            f"<p class='danger'><b>Приём заказов открыт на сегодня до 11:00. На завтра после 11:00. / Orders for today before 11:00. For tomorrow after 11:00.</b><br>"
+            f"<small>Доступно / Available: {start.strftime('%d.%m %H:%M')} — {end.strftime('%d.%m %H:%M')}. Сейчас / Now: {now_.strftime('%d.%m %H:%M')}.</small></p>"
+            f"<p><a href='/'>Назад / Back</a></p>"
+        ), 403
+
+    name = (request.form.get("name", "") or "").strip()
+    phone_raw = (request.form.get("phone", "") or "").strip()
+    phone_norm = normalize_phone(phone_raw)
+
+    zakuska = (request.form.get("zakuska", "") or "").strip() or None
+    soup = (request.form.get("soup", "") or "").strip()
+    hot = (request.form.get("hot", "") or "").strip() or None
+    dessert = (request.form.get("dessert", "") or "").strip() or None
+
+    drink_code = (request.form.get("drink", "") or "").strip()
+    if drink_code not in DRINK_PRICE:
+        drink_code = ""
+    drink_label = DRINK_LABEL.get(drink_code, "") if drink_code else None
+    drink_price = float(DRINK_PRICE.get(drink_code, 0.0))
+
+    bread = (request.form.get("bread", "") or "").strip() or None
+    comment = (request.form.get("comment", "") or "").strip() or None
+
+    if not name or not soup or not phone_norm:
+        return html_page("<p class='danger'>Ошибка: имя, телефон и суп обязательны / Name, phone and soup are required.</p><p><a href='/'>Назад / Back</a></p>"), 400
+
+    if off_menu_dish(office, d, zakuska, soup, hot, dessert, bread, ctx):
+        return html_page("<p class='danger'>Ошибка: блюда нет в меню / Dish is not on the menu.</p><p><a href='/'>Назад / Back</a></p>"), 400
+
+    option_code, base_price, err = compute_option_base_price(zakuska, soup, hot, dessert, office, d, ctx)
+    if err:
+        return html_page(f"<p class='danger'>Ошибка: {err}</p><p><a href='/'>Назад / Back</a></p>"), 400
+
+    total_price = compute_total_price(base_price, drink_code)
+
+    conn = db()
+    try:
+        ids = resolve_dish_ids(conn, office, d, zakuska, soup, hot, dessert, bread, drink_code, ctx)
+    except DishNotFound:
+        conn.close()
+        return _dish_not_found_page("/")
+    values = order_values(name, floor, ids, drink_code, option_code, total_price, comment)
+    try:
+        return place_order(
+            conn, "/order", key, office, d, phone_raw, phone_norm, values,
+            render=lambda order_code: _order_confirmed_page(
+                order_code, office, d, floor, name, phone_raw, option_code, total_price,
+                zakuska, soup, hot, dessert, drink_code, drink_label, drink_price, bread, comment,
+            ),
+        )
+    except OrderRejected as e:
+        return _order_rejected_page(e, office, d)
+
+
+def _dish_not_found_page(back: str):
+    return html_page(f"<p class='danger'>Меню обновляется, попробуйте через минуту. / The menu is being updated, please try again in a minute.</p><p><a href='{back}'>Назад / Back</a></p>"), 503, {"Retry-After": "60"}
+
+
+def _order_rejected_page(e: OrderRejected, office: str, d: date):
+    if e.reason == "capacity":
+        return html_page("<p class='danger'><b>Заказы на выбранную дату временно недоступны.</b><br><small>Orders are temporarily unavailable for this date.</small></p><p><a href='/'>Назад / Back</a></p>"), 409
+    existing = e.existing
+    return html_page(
+        f"""
+        <h2 class="danger">⛔ Заказ уже существует / Order already exists</h2>
+        <div class="card">
+          <p>На этот телефон уже оформлен активный заказ на <b>{d.isoformat()}</b> ({office}).</p>
+          <p><small>An active order already exists for this phone on <b>{d.isoformat()}</b> ({office}).</small></p>
+          <p><span class="pill">Номер / Code: {existing['order_code']}</span>
+             <span class="pill">Итого / Total: {existing['price_eur']}€</span></p>
+          <p><a href="{order_link(existing['order_code'])}">Открыть / Open /edit</a></p>
+        </div>
+        <p><a href="/">Назад / Back</a></p>
+        """
+    ), 409
+
+
+def _order_confirmed_page(
+    order_code, office, d, floor, name, phone_raw, option_code, total_price,
+    zakuska, soup, hot, dessert, drink_code, drink_label, drink_price, bread, comment,
+) -> str:
+    opt_human = {"opt1": "Опция 1 / Option 1", "opt2": "Опция 2 / Option 2", "opt3": "Опция 3 / Option 3"}[option_code]
+    drink_line = f"{drink_label} (+{drink_price}€)" if drink_code else "—"
+
+    floor_line = f"{floor}" if floor else "—"
+    # ✅ подписанная ссылка: изменение/отмена без повторного ввода офиса, даты и телефона
+    link = order_link(order_code)
+
+    return html_page(
+        f"""
+      <h2>✅ Заказ принят / Order confirmed</h2>
+      <div class="card">
+        <p><span class="pill"><b>{order_code}</b></span></p>
+        <p><b>{name}</b> — {office} — <span class="muted">{phone_raw}</span></p>
+        <p>Этаж / Floor: <b>{floor_line}</b></p>
+        <p>Дата доставки / Delivery date: <b>{d.isoformat()}</b> (13:00)</p>
+        <p><span class="pill">{opt_human}</span><span class="pill">Итого / Total: {total_price}€</span></p>
+        <ul>
+          <li>Суп / Soup: {soup}</li>
+          <li>Закуска / Starter: {zakuska or "—"}</li>
+          <li>Горячее / Main: {hot or "—"}</li>
+          <li>Десерт / Dessert: {dessert or "—"}</li>
+          <li>Напиток / Drink: {drink_line}</li>
+          <li>Хлеб / Bread: {bread or "—"}</li>
+        </ul>
+        <p class="muted">Комментарий / Notes: {comment or "—"}</p>
+        <p><a class="btn-secondary" href="{link}">Изменить / отменить / Edit / cancel</a></p>
+        <p><a href="{order_link(order_code, 'history')}">Мои заказы — повторить прошлый / My orders — repeat</a></p>
+        <p class="muted"><small>Ссылка на заказ (сохраните) / Link to this order (keep it):<br>{request.host_url.rstrip("/")}{link}</small></p>
+      </div>
+      <p><a href="/">Новый заказ / New order</a></p>
+    """
+    )
+
+
+# ---------------------------
+# Edit / Cancel
+# ---------------------------
+def signed_order(order_code: str):
+    """
+    Активный заказ по подписанной ссылке (?s=). -> (строка orders_v, None) или (None, страница-ошибка).
+    """
+    if not valid_order_link(order_code, request.args.get("s")):
+        return None, (html_page("<p class='danger'>Ссылка недействительна / Invalid link.</p><p><a href='/edit'>Назад / Back</a></p>"), 404)
+    conn = db()
+    found = order_by_code(conn, order_code)
+    conn.close()
+    if found is None or found["status"] != "active":
+        return None, (html_page("<p class='danger'>Активный заказ не найден / Active order not found.</p><p><a href='/edit'>Назад / Back</a></p>"), 404)
+    return found, None
+
+
+def _edit_order_page(found, ctx: RequestCtx, action: str, cancel_action: str) -> str:
+    """Форма изменения/отмены найденного заказа (строка orders_v)."""
+    office = found["office"]
+    d = date.fromisoformat(found["order_date"])
+    ok_time, start, end, now_ = validate_order_time(d, ctx)
+
+    drink_options = ""
+    for (k, lbl, _) in DRINKS:
+        sel = ""
+        if (found["drink_code"] or "") == (k or ""):
+            sel = "selected"
+        drink_options += f"<option value='{k}' {sel}>{lbl}</option>"
+
+    hot_items = hot_menu_with_special(office, d, ctx)
+
+    floor_edit_block = ""
+    if office in FLOORS_BY_OFFICE:
+        fval = (found["floor"] or "")
+        floor_edit_block = f"""
+        <div class="row" style="margin-top:10px;">
+          <div>
+            <label>Этаж (ALAMEDA) / Floor</label>
+            <select name="floor" required>
+              <option value="">— choose floor —</option>
+              <option value="1st floor" {"selected" if fval=="1st floor" else ""}>1st floor</option>
+              <option value="6th floor" {"selected" if fval=="6th floor" else ""}>6th floor</option>
+            </select>
+          </div>
+          <div></div>
+        </div>
+        """
+
+    body = f"""
+    <h1>Изменить / отменить заказ<br><small>Edit / cancel order</small></h1>
+    <div class="card">
+      <p><span class="pill"><b>{found['order_code']}</b></span>
+         <span class="pill">Доставка / Delivery: {d.isoformat()} 13:00</span></p>
+
+      <p class="muted">Окно изменений / Edit window:
+        <b>{start.strftime('%d.%m %H:%M')}</b> — <b>{end.strftime('%d.%m %H:%M')}</b>.
+        Сейчас / Now: <b>{now_.strftime('%d.%m %H:%M')}</b>.
+      </p>
+      {"<p class='danger'><b>Сейчас окно закрыто — изменения/отмена недоступны.</b><br><small>Window is closed — edit/cancel unavailable.</small></p>" if not ok_time else ""}
+
+      <form method="post" action="{action}">
+        <input type="hidden" name="idempotency_key" value="">
+        <input type="hidden" name="office" value="{office}">
+        <input type="hidden" name="order_date" value="{d.isoformat()}">
+        <input type="hidden" name="phone" value="{found['phone_raw']}">
+
+        <label>Как вас зовут / Your name</label>
+        <input name="name" value="{found['name']}" required>
+
+        {floor_edit_block}
+
+        <div class="row">
+          <div>
+            <label>Закуска / Starter</label>
+            <select name="zakuska">
+              <option value="" {"selected" if not found["zakuska"] else ""}>— без закуски / no starter —</option>
+              {options_html(MENU["zakuska"])}
+            </select>
+          </div>
+          <div>
+            <label>Суп / Soup</label>
+            <select name="soup" required>
+              <option value="">— выбери суп / choose soup —</option>
+              {options_html(MENU["soup"])}
+            </select>
+          </div>
+        </div>
+
+        <div class="row">
+          <div>
+            <label>Горячее / Main</label>
+            <select name="hot">
+              <option value="" {"selected" if not found["hot"] else ""}>— без горячего / no main —</option>
+              {options_html(hot_items)}
+            </select>
+          </div>
+          <div>
+            <label>Десерт / Dessert</label>
+            <select name="dessert">
+              <option value="" {"selected" if not found["dessert"] else ""}>— без десерта / no dessert —</option>
+              {options_html(MENU["dessert"])}
+            </select>
+          </div>
+        </div>
+
+        <label>Напиток / Drink </label>
+        <select name="drink">{drink_options}</select>
+        <small>оплачивается отдельно / not included</small>
+
+        <label style="margin-top:16px;">Хлеб / Bread </label>
+        <select name="bread">
+          <option value="" {"selected" if not found["bread"] else ""}>— без хлеба / no bread —</option>
+          {options_html(BREAD_OPTIONS)}
+        </select>
+
+        <label>Комментарий / Notes</label>
+        <textarea name="comment" rows="3">{found["comment"] or ""}</textarea>
+
+        <button type="submit" class="btn-primary">Сохранить / Save</button>
+      </form>
+
+      <form method="post" action="{cancel_action}" style="margin-top:12px;">
+        <input type="hidden" name="idempotency_key" value="">
+        <input type="hidden" name="office" value="{office}">
+        <input type="hidden" name="order_date" value="{d.isoformat()}">
+        <input type="hidden" name="phone" value="{found['phone_raw']}">
+        <button type="submit" class="btn-danger">Отменить заказ / Cancel</button>
+      </form>
+
+      <p style="margin-top:16px;"><a href="/">← На главную / Home</a></p>
+    </div>
+    """
+    return html_page(body)
+
+
+@app.get("/edit")
+def edit_get():
+    ctx = request_ctx()
+    default_date = compute_default_date(ctx)
+
+    office = request.args.get("office", OFFICES[0])
+    if office not in OFFICES:
+        office = OFFICES[0]
+
+    d_str = request.args.get("date", default_date.isoformat())
+    try:
+        d = date.fromisoformat(d_str)
+    except ValueError:
+        d = default_date
+
+    phone_raw = (request.args.get("phone", "") or "").strip()
+    phone_norm = normalize_phone(phone_raw) if phone_raw else ""
+
+    found = None
+    conn = db()
+    if phone_norm:
+        found = conn.execute(ACTIVE_ORDER_V_BY_PHONE_SQL, (office, d.isoformat(), phone_norm)).fetchone()
+    conn.close()
+
+    if found:
+        return _edit_order_page(found, ctx, "/edit", "/cancel")
+
+    # в edit/admin офисы НЕ отключаем в селекте (чтобы смотреть старые заказы)
+    office_opts = "".join([f"<option value='{o}' {'selected' if o==office else ''}>{o}</option>" for o in OFFICES])
+
+    body = f"""
+<h1>Изменить / отменить заказ<br><small>Edit / cancel order</small></h1>
+
+<div class="card volga-card">
+  <form method="get" action="/edit" class="volga-form">
+    <div class="row">
+      <div>
+        <label>Офис / Office</label>
+        <select name="office" required>{office_opts}</select>
+      </div>
+      <div>
+        <label>Дата доставки / Delivery date</label>
+        <input type="date" name="date" value="{d.isoformat()}" required>
+      </div>
+    </div>
+
+    <label>Телефон (как в заказе) / Phone (as in order)</label>
+    <input name="phone" value="{phone_raw}" placeholder="" required>
+
+    <button type="submit" class="btn-primary">
+      Найти заказ / Find order
+    </button>
+  </form>
+
+  <p class="muted">Если заказ не найден — проверь офис, дату и телефон.<br>
+  <small>If not found — check office, date and phone.</small></p>
+
+  <p><a href="/">← На главную / Home</a></p>
+</div>
+"""
+    return html_page(body)
+
+
+@app.get("/edit/<order_code>")
+def edit_by_code_get(order_code: str):
+    # ✅ подписанная ссылка со страницы подтверждения: один поиск по UNIQUE order_code
+    found, err = signed_order(order_code)
+    if err:
+        return err
+    return _edit_order_page(found, request_ctx(), order_link(order_code), order_link(order_code, "cancel"))
+
+
+@app.post("/edit")
+@app.post("/edit/<order_code>")
+def edit_post(order_code: str | None = None):
+    key = idempotency_key()
+    replay = idempotent_replay(db(), "/edit", key)
+    if replay is not None:
+        return replay
+
+    # ✅ по подписанной ссылке офис, дата и телефон — из самого заказа
+    found, back = None, "/edit"
+    if order_code is not None:
+        found, err = signed_order(order_code)
+        if err:
+            return err
+        back = order_link(order_code)
+
+    office = found["office"] if found else (request.form.get("office", "") or "").strip()
+    if office not in OFFICES:
+        return html_page(f"<p class='danger'>Ошибка: неизвестный офис / Unknown office.</p><p><a href='{back}'>Назад / Back</a></p>"), 400
+
+    order_date = found["order_date"] if found else (request.form.get("order_date", "") or "").strip()
+    try:
+        d = date.fromisoformat(order_date)
+    except ValueError:
+        return html_page(f"<p class='danger'>Ошибка: неверная дата / Invalid date.</p><p><a href='{back}'>Назад / Back</a></p>"), 400
+
+    ctx = request_ctx()
+    ok_time, start, end, now_ = validate_order_time(d, ctx)
+    if not ok_time:
+        count_rejection("window")
+        if is_closed_day(d):
+            return html_page(f"<p class='danger'><b>В понедельник мы не работаем.</b><br><small>We are closed on Mondays.</small></p><p><a href='{back}'>Назад / Back</a></p>"), 403
+        return html_page(
+            f"<p class='danger'><b>Окно редактирования закрыто.</b><br>"
+            f"<small>Окно: {start.strftime('%d.%m %H:%M')} — {end.strftime('%d.%m %H:%M')}. Сейчас: {now_.strftime('%d.%m %H:%M')}.</small></p>"
+            f"<p><a href='{back}'>Назад / Back</a></p>"
+        ), 403
+
+    phone_raw = found["phone_raw"] if found else (request.form.get("phone", "") or "").strip()
+    phone_norm = normalize_phone(phone_raw)
+    if not phone_norm:
+        return html_page(f"<p class='danger'>Ошибка: телефон обязателен / Phone is required.</p><p><a href='{back}'>Назад / Back</a></p>"), 400
+
+    name = (request.form.get("name", "") or "").strip()
+    zakuska = (request.form.get("zakuska", "") or "").strip() or None
+    soup = (request.form.get("soup", "") or "").strip()
+    hot = (request.form.get("hot", "") or "").strip() or None
+    dessert = (request.form.get("dessert", "") or "").strip() or None
+
+    # ✅ этаж (если нужен)
+    floor = (request.form.get("floor", "") or "").strip() or None
+    ok_floor, floor = validate_floor_for_office(office, floor)
+    if not ok_floor:
+        return html_page(f"<p class='danger'>Выберите этаж (ALAMEDA) / Please choose floor (ALAMEDA).</p><p><a href='{back}'>Назад / Back</a></p>"), 400
+
+    drink_code = (request.form.get("drink", "") or "").strip()
+    if drink_code not in DRINK_PRICE:
+        drink_code = ""
+    drink_label = DRINK_LABEL.get(drink_code, "") if drink_code else None
+    drink_price = float(DRINK_PRICE.get(drink_code, 0.0))
+
+    bread = (request.form.get("bread", "") or "").strip() or None
+    comment = (request.form.get("comment", "") or "").strip() or None
+
+    if not name or not soup:
+        return html_page(f"<p class='danger'>Ошибка: имя и суп обязательны / Name and soup are required.</p><p><a href='{back}'>Назад / Back</a></p>"), 400
+
+    if off_menu_dish(office, d, zakuska, soup, hot, dessert, bread, ctx):
+        return html_page(f"<p class='danger'>Ошибка: блюда нет в меню / Dish is not on the menu.</p><p><a href='{back}'>Назад / Back</a></p>"), 400
+
+    option_code, base_price, err = compute_option_base_price(zakuska, soup, hot, dessert, office, d, ctx)
+    if err:
+        return html_page(f"<p class='danger'>Ошибка: {err}</p><p><a href='{back}'>Назад / Back</a></p>"), 400
+
+    total_price = compute_total_price(base_price, drink_code)
+
+    conn = db()
+    try:
+        ids = resolve_dish_ids(conn, office, d, zakuska, soup, hot, dessert, bread, drink_code, ctx)
+    except DishNotFound:
+        conn.close()
+        return _dish_not_found_page(back)
+
+    existing = found or active_order_for_phone(conn, office, d, phone_norm)
+
+    if not existing:
+        conn.close()
+        return html_page(f"<p class='danger'>Активный заказ не найден / Active order not found.</p><p><a href='{back}'>Назад / Back</a></p>"), 404
+
+    values = order_values(name, floor, ids, drink_code, option_code, total_price, comment)
+
+    opt_human = {"opt1": "Опция 1 / Option 1", "opt2": "Опция 2 / Option 2", "opt3": "Опция 3 / Option 3"}[option_code]
+    drink_line = f"{drink_label} (+{drink_price}€)" if drink_code else "—"
+    floor_line = floor or "—"
+
+    page = html_page(
+        f"""
+      <h2>✅ Изменения сохранены / Saved</h2>
+      <div class="card">
+        <p><span class="pill"><b>{existing['order_code']}</b></span></p>
+        <p><b>{name}</b> — {office} — <span class="muted">{existing['phone_raw']}</span></p>
+        <p>Этаж / Floor: <b>{floor_line}</b></p>
+        <p>Дата доставки / Delivery date: <b>{d.isoformat()}</b> (13:00)</p>
+        <p><span class="pill">{opt_human}</span><span class="pill">Итого / Total: {total_price}€</span></p>
+        <ul>
+          <li>Суп / Soup: {soup}</li>
+          <li>Закуска / Starter: {zakuska or "—"}</li>
+          <li>Горячее / Main: {hot or "—"}</li>
+          <li>Десерт / Dessert: {dessert or "—"}</li>
+          <li>Напиток / Drink: {drink_line}</li>
+          <li>Хлеб / Bread: {bread or "—"}</li>
+        </ul>
+        <p class="muted">Комментарий / Notes: {comment or "—"}</p>
+      </div>
+      <p><a href="/">← На главную / Home</a></p>
+    """
+    )
+    return change_order(
+        conn, "/edit", key, existing["order_code"],
+        apply=lambda c: update_order(c, existing["id"], values),
+        render=lambda: page,
+    )
+
+
+@app.post("/cancel")
+@app.post("/cancel/<order_code>")
+def cancel_post(order_code: str | None = None):
+    key = idempotency_key()
+    replay = idempotent_replay(db(), "/cancel", key)
+    if replay is not None:
+        return replay
+
+    found, back = None, "/edit"
+    if order_code is not None:
+        found, err = signed_order(order_code)
+        if err:
+            return err
+        back = order_link(order_code)
+
+    office = found["office"] if found else (request.form.get("office", "") or "").strip()
+    if office not in OFFICES:
+        return html_page(f"<p class='danger'>Ошибка: неизвестный офис / Unknown office.</p><p><a href='{back}'>Назад / Back</a></p>"), 400
+
+    order_date = found["order_date"] if found else (request.form.get("order_date", "") or "").strip()
+    try:
+        d = date.fromisoformat(order_date)
+    except ValueError:
+        return html_page(f"<p class='danger'>Ошибка: неверная дата / Invalid date.</p><p><a href='{back}'>Назад / Back</a></p>"), 400
+
+    ctx = request_ctx()
+    ok_time, start, end, now_ = validate_order_time(d, ctx)
+    if not ok_time:
+        count_rejection("window")
+        if is_closed_day(d):
+            return html_page(f"<p class='danger'><b>В понедельник мы не работаем.</b><br><small>We are closed on Mondays.</small></p><p><a href='{back}'>Назад / Back</a></p>"), 403
+        return html_page(
+            f"<p class='danger'><b>Окно отмены закрыто.</b><br>"
+            f"<small>Окно: {start.strftime('%d.%m %H:%M')} — {end.strftime('%d.%m %H:%M')}. Сейчас: {now_.strftime('%d.%m %H:%M')}.</small></p>"
+            f"<p><a href='{back}'>Назад / Back</a></p>"
+        ), 403
+
+    phone_raw = found["phone_raw"] if found else (request.form.get("phone", "") or "").strip()
+    phone_norm = normalize_phone(phone_raw)
+    if not phone_norm:
+        return html_page(f"<p class='danger'>Ошибка: телефон обязателен / Phone is required.</p><p><a href='{back}'>Назад / Back</a></p>"), 400
+
+    conn = db()
+
+    existing = found or active_order_for_phone(conn, office, d, phone_norm)
+
+    if not existing:
+        conn.close()
+        return html_page(f"<p class='danger'>Активный заказ не найден / Active order not found.</p><p><a href='{back}'>Назад / Back</a></p>"), 404
+
+    page = html_page(
+        f"""
+      <h2>🗑 Заказ отменён / Order cancelled</h2>
+      <div class="card">
+        <p><span class="pill"><b>{existing['order_code']}</b></span></p>
+        <p><b>{existing['name']}</b> — {office} — <span class="muted">{existing['phone_raw']}</span></p>
+        <p>Дата доставки / Delivery date: <b>{d.isoformat()}</b> (13:00)</p>
+      </div>
+      <p><a href="/">← На главную / Home</a></p>
+    """
+    )
+    return change_order(
+        conn, "/cancel", key, existing["order_code"],
+        apply=lambda c: c.execute("UPDATE orders SET status='cancelled' WHERE id=?", (existing["id"],)),
+        render=lambda: page,
+    )
+
+
+# ===========================
+# History / Repeat
+# ===========================
+# Последние заказы телефона (индекс phone_norm, created_at) и "повторить": прошлый состав
+# заново проверяется по сегодняшнему меню, блюду недели и ценам и оформляется одним POST
+# на ближайшую открытую дату (compute_default_date).
+HISTORY_LIMIT = 20
+HISTORY_SQL = "SELECT * FROM orders_v WHERE phone_norm=? ORDER BY created_at DESC LIMIT ?"
+
+
+def order_history(conn: sqlite3.Connection, phone_norm: str) -> list:
+    return conn.execute(HISTORY_SQL, (phone_norm, HISTORY_LIMIT)).fetchall()
+
+
+def repeat_check(conn: sqlite3.Connection, row, d: date, ctx: RequestCtx, active: dict):
+    """
+    repeat_selection + та же проверка дубля телефона, что в place_order: кнопка "повторить"
+    не обещает того, на что /repeat ответит 409. active — кэш {office: активный заказ или None}.
+    """
+    sel, err = repeat_selection(row, d, ctx)
+    if err:
+        return None, err
+    office = row["office"]
+    if office not in active:
+        active[office] = active_order_for_phone(conn, office, d, row["phone_norm"])
+    existing = active[office]
+    if existing:
+        return None, (
+            "duplicate_phone",
+            f"На {d.isoformat()} уже есть заказ {existing['order_code']} / Already ordered for {d.isoformat()}: {existing['order_code']}",
+        )
+    return sel, None
+
+
+def history_owner(conn: sqlite3.Connection, order_code: str | None):
+    """
+    Чья история: (phone_raw, private) или None, если подпись не сошлась.
+    По подписанной ссылке заказа (?s=) или админскому token — private: со ссылками
+    изменить/отменить/повторить. По одному телефону — только состав: телефон не пароль.
+    """
+    if order_code is not None:
+        if not valid_order_link(order_code, request.args.get("s")):
+            return None
+        own = order_by_code(conn, order_code)
+        return (own["phone_raw"], True) if own is not None else None
+    return (request.args.get("phone", "") or "").strip(), check_admin()
+
+
+@app.get("/history")
+@app.get("/history/<order_code>")
+def history_get(order_code: str | None = None):
+    ctx = request_ctx()
+    conn = db()
+    owner = history_owner(conn, order_code)
+    if owner is None:
+        conn.close()
+        return html_page("<p class='danger'>Ссылка недействительна / Invalid link.</p><p><a href='/history'>Назад / Back</a></p>"), 404
+    phone_raw, private = owner
+    phone_norm = normalize_phone(phone_raw)
+
+    rows = order_history(conn, phone_norm) if phone_norm else []
+
+    d = compute_default_date(ctx)
+    ok_time = validate_order_time(d, ctx)[0]
+
+    cards = ""
+    active = {}
+    for r in rows:
+        dishes = " · ".join(x for x in (r["soup"], r["zakuska"], r["hot"], r["dessert"]) if x)
+        extras = " · ".join(x for x in (r["drink_label"], r["bread"]) if x)
+        if not private:
+            repeat = ""
+        elif not ok_time:
+            repeat = f"<p class='muted'>Приём заказов на {d.isoformat()} закрыт / Ordering for {d.isoformat()} is closed.</p>"
+        else:
+            sel, err = repeat_check(conn, r, d, ctx, active)
+            if err:
+                repeat = f"<p class='muted'>Повторить нельзя / Can't repeat: {escape(err[1])}</p>"
+            else:
+                repeat = f"""
+                <form method="post" action="{order_link(r['order_code'], 'repeat')}">
+                  <input type="hidden" name="idempotency_key" value="">
+                  <button type="submit" class="btn-primary">Повторить на {d.isoformat()} — {sel['total_price']}€ / Repeat</button>
+                </form>
+                """
+        edit = ""
+        if private and r["status"] == "active" and validate_order_time(date.fromisoformat(r["order_date"]), ctx)[0]:
+            edit = f"<p><a href='{order_link(r['order_code'])}'>Изменить / отменить / Edit / cancel</a></p>"
+        cards += f"""
+        <div class="card">
+          <p><span class="pill"><b>{r['order_code']}</b></span>
+             <span class="pill">{r['order_date']}</span>
+             <span class="pill">{r['office']}</span>
+             {"<span class='pill'>Отменён / Cancelled</span>" if r['status'] != 'active' else ""}</p>
+          <p>{escape(dishes)}</p>
+          {f"<p class='muted'>{escape(extras)}</p>" if extras else ""}
+          <p>Итого / Total: <b>{r['price_eur']}€</b></p>
+          {edit}
+          {repeat}
+        </div>
+        """
+    conn.close()
+
+    if phone_norm and not rows:
+        cards = "<p class='muted'>Заказов на этот телефон нет / No orders for this phone.</p>"
+    elif rows and not private:
+        cards = (
+            "<p class='muted'>Изменить, отменить или повторить заказ — по ссылке из подтверждения заказа. / "
+            "To edit, cancel or repeat, use the link from your order confirmation.</p>"
+        ) + cards
+
+    return html_page(
+        f"""
+<h1>Мои заказы<br><small>My orders</small></h1>
+
+<div class="card volga-card">
+  <form method="get" action="/history" class="volga-form">
+    <label>Телефон (как в заказе) / Phone (as in order)</label>
+    <input name="phone" value="{escape(phone_raw)}" required>
+    <button type="submit" class="btn-primary">Показать / Show</button>
+  </form>
+</div>
+
+{cards}
+
+<p><a href="/">← На главную / Home</a></p>
+"""
+    )
+
+
+@app.post("/repeat/<order_code>")
+def repeat_post(order_code: str):
+    key = idempotency_key()
+    replay = idempotent_replay(db(), "/repeat", key)
+    if replay is not None:
+        return replay
+
+    if not valid_order_link(order_code, request.args.get("s")):
+        return html_page("<p class='danger'>Ссылка недействительна / Invalid link.</p><p><a href='/history'>Назад / Back</a></p>"), 404
+    conn = db()
+    row = order_by_code(conn, order_code)
+    if row is None:
+        conn.close()
+        return html_page("<p class='danger'>Заказ не найден / Order not found.</p><p><a href='/history'>Назад / Back</a></p>"), 404
+
+    ctx = request_ctx()
+    d = compute_default_date(ctx)
+    back = order_link(order_code, "history")
+    ok_time, start, end, now_ = validate_order_time(d, ctx)
+    if not ok_time:
+        conn.close()
+        count_rejection("window")
+        return html_page(
+            f"<p class='danger'><b>Приём заказов на {d.isoformat()} закрыт.</b><br>"
+            f"<small>Окно: {start.strftime('%d.%m %H:%M')} — {end.strftime('%d.%m %H:%M')}. Сейчас: {now_.strftime('%d.%m %H:%M')}.</small></p>"
+            f"<p><a href='{back}'>Назад / Back</a></p>"
+        ), 403
+
+    sel, err = repeat_selection(row, d, ctx)
+    if err:
+        conn.close()
+        return html_page(f"<p class='danger'>Повторить нельзя / Can't repeat: {escape(err[1])}</p><p><a href='{back}'>Назад / Back</a></p>"), 400
+
+    office = row["office"]
+    try:
+        values = selection_values(conn, office, d, sel, ctx)
+    except DishNotFound:
+        conn.close()
+        return _dish_not_found_page(back)
+    try:
+        return place_order(
+            conn, "/repeat", key, office, d, row["phone_raw"], row["phone_norm"], values,
+            render=lambda new_code: _order_confirmed_page(
+                new_code, office, d, sel["floor"], sel["name"], row["phone_raw"], sel["option_code"], sel["total_price"],
+                sel["zakuska"], sel["soup"], sel["hot"], sel["dessert"], sel["drink_code"],
+                DRINK_LABEL.get(sel["drink_code"]) if sel["drink_code"] else None,
+                float(DRINK_PRICE.get(sel["drink_code"], 0.0)), sel["bread"], sel["comment"],
+            ),
+        )
+    except OrderRejected as e:
+        return _order_rejected_page(e, office, d)
+
+
+# ---------------------------
+# API
+# ---------------------------
+@app.get("/api/capacity")
+@app.get("/api/v1/capacity")
+def api_capacity():
+    office = request.args.get("office", "")
+    if office not in OFFICES:
+        return jsonify(error="unknown office"), 400
+    try:
+        d = date.fromisoformat(request.args.get("date", ""))
+    except ValueError:
+        return jsonify(error="invalid date"), 400
+
+    cnt = active_order_count(db(), office, d)
+    resp = jsonify(
+        office=office,
+        date=d.isoformat(),
+        active=cnt,
+        max=MAX_PER_DAY,
+        remaining=max(0, MAX_PER_DAY - cnt),
+    )
+    resp.headers["Cache-Control"] = "no-store"
+    return resp
+
+
+# ---------------------------
+# API v1 (JSON для PWA)
+# ---------------------------
+# GET  /api/v1/menu?office=&date=        меню с блюдом недели, ETag (If-None-Match -> 304)
+# GET  /api/v1/capacity?office=&date=    то же, что /api/capacity
+# POST /api/v1/orders                    новый заказ; заголовок Idempotency-Key — как скрытое поле форм
+# GET/PATCH/DELETE /api/v1/orders/<code> свой заказ: подпись ?s= (как в edit_link) или phone
+#                                        (?phone= или в JSON); админу — token; PATCH/DELETE — Idempotency-Key
+# POST /api/v1/orders/<code>/repeat      тот же состав на ближайшую дату, по сегодняшнему меню и ценам
+# GET  /api/v1/history?phone=            последние заказы телефона + можно ли их повторить; без имени,
+#                                        телефона и edit_link — их дают ?order_code=&s= или token
+# Проверки и цены — те же функции, что у HTML-форм; ошибки: {"error": код, "message": текст}.
+MENU_BODY_CACHE_MAX = 256
+_menu_bodies = {}
+
+
+def api_json(payload: dict, status: int = 200) -> Response:
+    resp = Response(json.dumps(payload, ensure_ascii=False), status=status, mimetype="application/json")
+    resp.headers["Cache-Control"] = "no-store"
+    return resp
+
+
+def api_error(status: int, error: str, message: str, **extra) -> Response:
+    return api_json({"error": error, "message": message, **extra}, status)
+
+
+def order_json(r) -> dict:
+    """Строка orders_v -> заказ в ответах API."""
+    return {
+        "order_code": r["order_code"],
+        "office": r["office"],
+        "order_date": r["order_date"],
+        "floor": r["floor"],
+        "name": r["name"],
+        "phone": r["phone_raw"],
+        "status": r["status"],
+        "option": r["option_code"],
+        "price_eur": r["price_eur"],
+        "zakuska": r["zakuska"],
+        "soup": r["soup"],
+        "hot": r["hot"],
+        "dessert": r["dessert"],
+        "bread": r["bread"],
+        "drink": r["drink_code"] or "",
+        "comment": r["comment"],
+        "created_at": r["created_at"],
+        "edit_link": order_link(r["order_code"]),
+    }
+
+
+# Поиск по одному телефону (/api/v1/history без подписи и token) — без этих полей
+ORDER_JSON_PRIVATE = ("name", "phone", "comment", "edit_link")
+
+
+def order_json_public(r) -> dict:
+    return {k: v for k, v in order_json(r).items() if k not in ORDER_JSON_PRIVATE}
+
+
+def _api_str(data: dict, k: str) -> str:
+    v = data.get(k)
+    return v.strip() if isinstance(v, str) else ""
+
+
+def _api_window_error(d: date, ctx: RequestCtx):
+    ok_time, start, end, now_ = validate_order_time(d, ctx)
+    if ok_time:
+        return None
+    count_rejection("window")
+    if is_closed_day(d):
+        return api_error(403, "closed_day", "В понедельник мы не работаем / We are closed on Mondays.")
+    return api_error(
+        403, "window_closed", "Окно приёма заказов закрыто / Ordering window is closed.",
+        window={"start": start.isoformat(), "end": end.isoformat()}, now=now_.isoformat(),
+    )
+
+
+# ключ JSON -> колонка orders_v (база для PATCH)
+_API_ORDER_FIELDS = {
+    "name": "name", "floor": "floor", "zakuska": "zakuska", "soup": "soup", "hot": "hot",
+    "dessert": "dessert", "drink": "drink_code", "bread": "bread", "comment": "comment",
+}
+
+
+def _api_order_selection(data: dict, office: str, d: date, ctx: RequestCtx, base=None):
+    """
+    Состав заказа из JSON: чего нет в data, берётся из base (строка orders_v, PATCH).
+    Блюда — только из меню на (office, d). -> (поля, None) или (None, ответ-ошибка).
+    """
+    sel = {
+        k: _api_str(data, k) if k in data or base is None else (base[col] or "")
+        for k, col in _API_ORDER_FIELDS.items()
+    }
+
+    ok_floor, floor = validate_floor_for_office(office, sel["floor"] or None)
+    if not ok_floor:
+        return None, api_error(400, "floor_required", "Выберите этаж / Please choose floor.", floors=FLOORS_BY_OFFICE[office])
+    if not sel["name"] or not sel["soup"]:
+        return None, api_error(400, "required", "Имя и суп обязательны / Name and soup are required.")
+    if sel["drink"] not in DRINK_PRICE:
+        return None, api_error(400, "unknown_drink", "Неизвестный напиток / Unknown drink.")
+
+    field = off_menu_dish(office, d, sel["zakuska"], sel["soup"], sel["hot"], sel["dessert"], sel["bread"], ctx)
+    if field:
+        return None, api_error(400, "unknown_dish", "Такого блюда нет в меню / Dish is not on the menu.", field=field)
+
+    option_code, base_price, err = compute_option_base_price(
+        sel["zakuska"], sel["soup"], sel["hot"], sel["dessert"], office, d, ctx
+    )
+    if err:
+        return None, api_error(400, "invalid_option", err)
+
+    return {
+        "name": sel["name"],
+        "floor": floor,
+        "zakuska": sel["zakuska"] or None,
+        "soup": sel["soup"],
+        "hot": sel["hot"] or None,
+        "dessert": sel["dessert"] or None,
+        "drink_code": sel["drink"],
+        "bread": sel["bread"] or None,
+        "comment": sel["comment"] or None,
+        "option_code": option_code,
+        "total_price": compute_total_price(base_price, sel["drink"]),
+    }, None
+
+
+def _api_own_order(conn: sqlite3.Connection, order_code: str, data: dict | None = None):
+    """Заказ по номеру, если он вызывающего: подпись ссылки (?s=), phone или админский token. Иначе None."""
+    row = order_by_code(conn, order_code)
+    if row is None or check_admin() or valid_order_link(order_code, request.args.get("s")):
+        return row
+    phone = request.args.get("phone", "") or (_api_str(data, "phone") if data else "")
+    phone_norm = normalize_phone(phone)
+    if not phone_norm or phone_norm != row["phone_norm"]:
+        return None  # чужой и несуществующий заказ неотличимы
+    return row
+
+
+def _api_json_body():
+    data = request.get_json(silent=True)
+    return data if isinstance(data, dict) else None
+
+
+@app.get("/api/v1/menu")
+def api_menu():
+    ctx = request_ctx()
+    office = request.args.get("office", OFFICES[0])
+    if office not in OFFICES:
+        return api_error(400, "unknown_office", "Неизвестный офис / Unknown office.")
+    d_str = request.args.get("date", "")
+    try:
+        d = date.fromisoformat(d_str) if d_str else compute_default_date(ctx)
+    except ValueError:
+        return api_error(400, "invalid_date", "Неверная дата / Invalid date.")
+
+    ok_time, start, end, _ = validate_order_time(d, ctx)
+    special = ctx.special(office, d)
+    payload = json.dumps(
+        {
+            "office": office,
+            "date": d.isoformat(),
+            "office_available": office not in INACTIVE_OFFICES,
+            "open": ok_time,
+            "closed_day": is_closed_day(d),
+            "window": {"start": start.isoformat(), "end": end.isoformat()},
+            "prices": PRICES,
+            "options": {
+                "opt1": ["zakuska", "soup", "dessert"],
+                "opt2": ["soup", "hot", "dessert"],
+                "opt3": ["zakuska", "soup", "hot"],
+            },
+            "plov_surcharge_eur": PLOV_SURCHARGE,
+            "special": {
+                "title": special["title"],
+                "surcharge_eur": int(special["surcharge_eur"]),
+                "label": special_label(special),
+            } if special else None,
+            "menu": {
+                "zakuska": MENU["zakuska"],
+                "soup": MENU["soup"],
+                "hot": hot_menu_with_special(office, d, ctx),
+                "dessert": MENU["dessert"],
+            },
+            "bread": BREAD_OPTIONS,
+            "drinks": [{"code": k, "label": lbl, "price_eur": p} for (k, lbl, p) in DRINKS if k],
+            "floors": FLOORS_BY_OFFICE.get(office, []),
+            "max_per_day": MAX_PER_DAY,
+        },
+        ensure_ascii=False,
+    )
+
+    # меню меняется редко (блюдо недели, окно приёма) — тело с ETag и сжатием считаем раз на версию
+    body = _menu_bodies.get(payload)
+    if body is None:
+        if len(_menu_bodies) >= MENU_BODY_CACHE_MAX:
+            _menu_bodies.clear()
+        body = _menu_bodies[payload] = StaticBody(payload, "application/json")
+    return static_response(body, "no-cache")
+
+
+@app.post("/api/v1/orders")
+def api_orders_create():
+    key = idempotency_key()
+    replay = idempotent_replay(db(), "/api/v1/orders", key)
+    if replay is not None:
+        return replay
+
+    data = _api_json_body()
+    if data is None:
+        return api_error(400, "invalid_json", "Ожидается JSON-объект / JSON object expected.")
+
+    office = _api_str(data, "office")
+    if office not in OFFICES:
+        return api_error(400, "unknown_office", "Неизвестный офис / Unknown office.")
+    if office in INACTIVE_OFFICES:
+        return api_error(403, "office_unavailable", "Этот офис временно недоступен / This office is temporarily unavailable.")
+    try:
+        d = date.fromisoformat(_api_str(data, "order_date"))
+    except ValueError:
+        return api_error(400, "invalid_date", "Неверная дата / Invalid date.")
+
+    ctx = request_ctx()
+    err = _api_window_error(d, ctx)
+    if err:
+        return err
+
+    phone_raw = _api_str(data, "phone")
+    phone_norm = normalize_phone(phone_raw)
+    if not phone_norm:
+        return api_error(400, "required", "Телефон обязателен / Phone is required.")
+
+    sel, err = _api_order_selection(data, office, d, ctx)
+    if err:
+        return err
+
+    conn = db()
+    try:
+        values = selection_values(conn, office, d, sel, ctx)
+    except DishNotFound:
+        conn.close()
+        return _api_dish_not_found()
+    try:
+        result = place_order(
+            conn, "/api/v1/orders", key, office, d, phone_raw, phone_norm, values,
+            render=lambda order_code: json.dumps({"order": order_json(order_by_code(conn, order_code))}, ensure_ascii=False),
+            status=201,
+        )
+    except OrderRejected as e:
+        return _api_rejected(e)
+    return _api_created(result)
+
+
+def _api_dish_not_found() -> Response:
+    resp = api_error(503, "menu_updating", "Меню обновляется, попробуйте через минуту / The menu is being updated, please try again in a minute.")
+    resp.headers["Retry-After"] = "60"
+    return resp
+
+
+def _api_rejected(e: OrderRejected) -> Response:
+    if e.reason == "capacity":
+        return api_error(409, "capacity", "Заказы на выбранную дату временно недоступны / Orders are temporarily unavailable for this date.")
+    return api_error(
+        409, "duplicate_phone", "На этот телефон уже есть активный заказ / An active order already exists for this phone.",
+        order_code=e.existing["order_code"],
+    )
+
+
+def _api_created(result) -> Response:
+    """Результат place_order: тело нового заказа или Response-повтор по ключу."""
+    if isinstance(result, Response):
+        return result
+    resp = Response(result, status=201, mimetype="application/json")
+    resp.headers["Cache-Control"] = "no-store"
+    return resp
+
+
+def _api_changed(result) -> Response:
+    """Результат change_order: тело изменённого заказа или Response-повтор по ключу."""
+    if isinstance(result, Response):
+        return result
+    resp = Response(result, status=200, mimetype="application/json")
+    resp.headers["Cache-Control"] = "no-store"
+    return resp
+
+
+@app.get("/api/v1/orders/<order_code>")
+def api_order_get(order_code: str):
+    conn = db()
+    row = _api_own_order(conn, order_code)
+    conn.close()
+    if row is None:
+        return api_error(404, "not_found", "Заказ не найден / Order not found.")
+    return api_json({"order": order_json(row)})
+
+
+@app.patch("/api/v1/orders/<order_code>")
+def api_order_patch(order_code: str):
+    key = idempotency_key()
+    replay = idempotent_replay(db(), "/api/v1/orders/patch", key)
+    if replay is not None:
+        return replay
+
+    data = _api_json_body()
+    if data is None:
+        return api_error(400, "invalid_json", "Ожидается JSON-объект / JSON object expected.")
+
+    conn = db()
+    row = _api_own_order(conn, order_code, data)
+    if row is None:
+        conn.close()
+        return api_error(404, "not_found", "Заказ не найден / Order not found.")
+    if row["status"] != "active":
+        conn.close()
+        return api_error(409, "cancelled", "Заказ отменён / Order is cancelled.")
+
+    office, d, ctx = row["office"], date.fromisoformat(row["order_date"]), request_ctx()
+    err = _api_window_error(d, ctx)
+    if err:
+        conn.close()
+        return err
+
+    sel, err = _api_order_selection(data, office, d, ctx, base=row)
+    if err:
+        conn.close()
+        return err
+
+    try:
+        values = selection_values(conn, office, d, sel, ctx)
+    except DishNotFound:
+        conn.close()
+        return _api_dish_not_found()
+    result = change_order(
+        conn, "/api/v1/orders/patch", key, order_code,
+        apply=lambda c: update_order(c, row["id"], values),
+        render=lambda: json.dumps({"order": order_json(order_by_code(conn, order_code))}, ensure_ascii=False),
+    )
+    return _api_changed(result)
+
+
+@app.delete("/api/v1/orders/<order_code>")
+def api_order_delete(order_code: str):
+    key = idempotency_key()
+    replay = idempotent_replay(db(), "/api/v1/orders/delete", key)
+    if replay is not None:
+        return replay
+
+    conn = db()
+    row = _api_own_order(conn, order_code, _api_json_body())
+    if row is None:
+        conn.close()
+        return api_error(404, "not_found", "Заказ не найден / Order not found.")
+    if row["status"] != "active":
+        conn.close()
+        return api_json({"order": order_json(row)})  # повторная отмена — не ошибка
+
+    err = _api_window_error(date.fromisoformat(row["order_date"]), request_ctx())
+    if err:
+        conn.close()
+        return err
+
+    result = change_order(
+        conn, "/api/v1/orders/delete", key, order_code,
+        apply=lambda c: c.execute("UPDATE orders SET status='cancelled' WHERE id=? AND status='active'", (row["id"],)),
+        render=lambda: json.dumps({"order": order_json(order_by_code(conn, order_code))}, ensure_ascii=False),
+    )
+    return _api_changed(result)
+
+
+@app.get("/api/v1/history")
+def api_history():
+    conn = db()
+    owner = history_owner(conn, request.args.get("order_code") or None)
+    if owner is None:
+        conn.close()
+        return api_error(404, "not_found", "Заказ не найден / Order not found.")
+    phone_raw, private = owner
+    phone_norm = normalize_phone(phone_raw)
+    if not phone_norm:
+        conn.close()
+        return api_error(400, "required", "Телефон обязателен / Phone is required.")
+    ctx = request_ctx()
+    d = compute_default_date(ctx)
+    ok_time = validate_order_time(d, ctx)[0]
+
+    rows = order_history(conn, phone_norm)
+
+    orders = []
+    active = {}
+    for r in rows:
+        item = order_json(r) if private else order_json_public(r)
+        # можно ли повторить на ближайшую дату и почём — по сегодняшнему меню
+        sel, err = repeat_check(conn, r, d, ctx, active) if ok_time else (None, ("window_closed", "Окно приёма заказов закрыто / Ordering window is closed."))
+        item["repeat"] = {"date": d.isoformat(), "available": err is None}
+        if err:
+            item["repeat"].update(error=err[0], message=err[1])
+        else:
+            item["repeat"].update(option=sel["option_code"], price_eur=sel["total_price"])
+        orders.append(item)
+    conn.close()
+    return api_json({"phone": phone_norm, "orders": orders})
+
+
+@app.post("/api/v1/orders/<order_code>/repeat")
+def api_order_repeat(order_code: str):
+    key = idempotency_key()
+    replay = idempotent_replay(db(), "/api/v1/repeat", key)
+    if replay is not None:
+        return replay
+
+    conn = db()
+    row = _api_own_order(conn, order_code, _api_json_body())
+    if row is None:
+        conn.close()
+        return api_error(404, "not_found", "Заказ не найден / Order not found.")
+
+    ctx = request_ctx()
+    d = compute_default_date(ctx)
+    err = _api_window_error(d, ctx)
+    if err:
+        conn.close()
+        return err
+    sel, err = repeat_selection(row, d, ctx)
+    if err:
+        conn.close()
+        return api_error(403 if err[0] == "office_unavailable" else 400, *err)
+
+    office = row["office"]
+    try:
+        values = selection_values(conn, office, d, sel, ctx)
+    except DishNotFound:
+        conn.close()
+        return _api_dish_not_found()
+    try:
+        result = place_order(
+            conn, "/api/v1/repeat", key, office, d, row["phone_raw"], row["phone_norm"], values,
+            render=lambda new_code: json.dumps({"order": order_json(order_by_code(conn, new_code))}, ensure_ascii=False),
+            status=201,
+        )
+    except OrderRejected as e:
+        return _api_rejected(e)
+    return _api_created(result)
+
+
+# ===========================
+# Admin v2 (Grouped by Floor) + Special management + CSV + Print
+# ===========================
+
+def _ru_only(s: str) -> str:
+    s = "" if s is None else str(s)
+    return s.split(" / ")[0].strip()
+
+SHORT = {
+    "Оливье": "Оливье",
+    "Винегрет": "Винегрет",
+    "Икра из баклажанов": "Икра",
+    "Паштет из куриной печени": "Паштет",
+    "Шуба": "Шуба",
+
+    "Борщ": "Борщ",
+    "Солянка сборная мясная": "Солянка",
+    "Куриный суп с лапшой и яйцом": "Кур. суп",
+
+    "Куриные котлеты с пюре": "Котл+пюре",
+    "Куриные котлеты с гречкой": "Котл+греча",
+    "Вареники с картошкой": "Вареники",
+    "Пельмени со сметаной": "Пельмени",
+    "Плов с бараниной": "Плов",
+
+    "Торт Наполеон": "Наполеон",
+    "Пирожное Картошка": "Картошка",
+    "Трубочка со сгущенкой": "Трубочка",
+
+    "Белый": "Хлеб белый",
+    "Чёрный": "Хлеб чёрный",
+}
+
+def _short_name(s: str) -> str:
+    # Короткое название для новой строки dishes. Кухня читает только dishes.short_name
+    # (orders_v.*_short, сводка); SHORT — откуда оно берётся при записи.
+    ru = _ru_only(s)
+    return SHORT.get(ru, ru)
+
+
+@app.cli.command("check-menu")
+def check_menu_command():
+    """Падает (exit 1), если у блюда из MENU / BREAD_OPTIONS нет короткого названия в SHORT."""
+    missing = [
+        label
+        for label in [x for items in MENU.values() for x in items] + BREAD_OPTIONS
+        if _ru_only(label) not in SHORT
+    ]
+    for label in missing:
+        print(f"FAIL {label}")
+    if missing:
+        raise SystemExit(1)
+    print(f"ok   {sum(len(items) for items in MENU.values()) + len(BREAD_OPTIONS)} labels")
+
+def _fmt_money(x):
+    try:
+        return f"{float(x):.2f}€"
+    except Exception:
+        return f"{x}€"
+
+def _floor_norm(f: str | None) -> str:
+    f = (f or "").strip()
+    if not f:
+        return "Без этажа"
+    return f
+
+def _floor_sort_key(k: str):
+    # Поддержим оба формата
+    kk = (k or "").lower()
+    if "1st" in kk or "1 этаж" in kk:
+        return (0, 1)
+    if "6th" in kk or "6 этаж" in kk:
+        return (0, 6)
+    if "без" in kk:
+        return (2, 999)
+    return (1, k)
+
+def _rows_table_v2(rows):
+    head = """
+    <table class="admin-table">
+      <thead>
+        <tr>
+          <th>Код</th>
+          <th>Имя</th>
+          <th>Телефон</th>
+          <th>Этаж</th>
+          <th>Итого</th>
+          <th>Суп</th>
+          <th>Закуска</th>
+          <th>Горячее</th>
+          <th>Десерт</th>
+          <th>Напиток</th>
+          <th>Хлеб</th>
+          <th>Комментарий</th>
+        </tr>
+      </thead>
+      <tbody>
+    """
+    if not rows:
+        return head + "<tr><td colspan='12' class='muted'>—</td></tr></tbody></table>"
+
+    body = ""
+    for r in rows:
+        drink = "—"
+        if r["drink_label"]:
+            dp = r["drink_price_eur"] or 0
+            drink = f"{r['drink_short']} (+{float(dp):.2f}€)"
+        body += f"""
+        <tr>
+          <td><b>{r['order_code']}</b></td>
+          <td>{r['name']}</td>
+          <td>{r['phone_raw']}</td>
+          <td>{_floor_norm(r['floor'])}</td>
+          <td><b>{_fmt_money(r['price_eur'])}</b></td>
+          <td>{r['soup_short'] or '—'}</td>
+          <td>{r['zakuska_short'] or '—'}</td>
+          <td>{r['hot_short'] or '—'}</td>
+          <td>{r['dessert_short'] or '—'}</td>
+          <td>{drink}</td>
+          <td>{r['bread_short'] or '—'}</td>
+          <td>{r['comment'] or '—'}</td>
+        </tr>
+        """
+    return head + body + "</tbody></table>"
+
+# Счётчики для сводок считает SQLite: блюда — UNION ALL пяти колонок id + GROUP BY,
+# короткие названия берутся из dishes. В Python только складываем одинаковые названия.
+SUMMARY_COUNTS_SQL = """
+    SELECT 'opt' AS kind, option_code AS label, COUNT(*) AS n
+    FROM orders
+    WHERE office=:office AND order_date=:d AND status='active'
+    GROUP BY option_code
+
+    UNION ALL
+
+    SELECT 'dish', dishes.short_name, c.n
+    FROM (
+        SELECT dish_id, COUNT(*) AS n FROM (
+            SELECT soup_id AS dish_id FROM orders WHERE office=:office AND order_date=:d AND status='active'
+            UNION ALL
+            SELECT zakuska_id FROM orders WHERE office=:office AND order_date=:d AND status='active'
+            UNION ALL
+            SELECT hot_id FROM orders WHERE office=:office AND order_date=:d AND status='active'
+            UNION ALL
+            SELECT dessert_id FROM orders WHERE office=:office AND order_date=:d AND status='active'
+            UNION ALL
+            SELECT bread_id FROM orders WHERE office=:office AND order_date=:d AND status='active'
+        )
+        WHERE dish_id IS NOT NULL
+        GROUP BY dish_id
+    ) c
+    JOIN dishes ON dishes.id = c.dish_id
+
+    UNION ALL
+
+    SELECT 'drink', dishes.short_name, c.n
+    FROM (
+        SELECT drink_id, COUNT(*) AS n
+        FROM orders
+        WHERE office=:office AND order_date=:d AND status='active' AND drink_id IS NOT NULL
+        GROUP BY drink_id
+    ) c
+    JOIN dishes ON dishes.id = c.drink_id
+"""
+
+
+def _summary_counts(conn: sqlite3.Connection, office: str, d: date):
+    opt_counts = {"opt1": 0, "opt2": 0, "opt3": 0}
+    dish_counts = {}
+    drink_counts = {}
+
+    for r in conn.execute(SUMMARY_COUNTS_SQL, {"office": office, "d": d.isoformat()}):
+        kind, label, n = r["kind"], r["label"], r["n"]
+        if kind == "opt":
+            if label in opt_counts:
+                opt_counts[label] += n
+        elif kind == "dish":
+            dish_counts[label] = dish_counts.get(label, 0) + n
+        else:
+            drink_counts[label] = drink_counts.get(label, 0) + n
+
+    return opt_counts, dish_counts, drink_counts
+
+def _simple_table(title: str, counts: dict) -> str:
+    rows_html = ""
+    for k, v in sorted(counts.items(), key=lambda x: (-x[1], x[0])):
+        rows_html += f"<tr><td>{k}</td><td style='text-align:right;'><b>{v}</b></td></tr>"
+    if not rows_html:
+        rows_html = "<tr><td colspan='2' class='muted'>—</td></tr>"
+
+    return f"""
+    <div class="card">
+      <h3 style="margin:0 0 10px 0;">{title}</h3>
+      <table class="admin-table">
+        <thead><tr><th>Позиция</th><th style="text-align:right;">Кол-во</th></tr></thead>
+        <tbody>{rows_html}</tbody>
+      </table>
+    </div>
+    """
+
+def _active_by_floor(rows):
+    g = {}
+    for r in rows:
+        k = _floor_norm(r["floor"])
+        g.setdefault(k, []).append(r)
+    return g
+
+
+# активные и отменённые одним запросом: 'active' < 'cancelled', порядок внутри — created_at
+# (сортировку отдаёт индекс idx_orders_office_date_status_created)
+ADMIN_ORDERS_SQL = """
+    SELECT * FROM orders_v
+    WHERE office=? AND order_date=? AND status IN ('active', 'cancelled')
+    ORDER BY status, created_at ASC
+"""
+
+
+@app.get("/admin")
+def admin_v2():
+    if not check_admin():
+        return html_page("<h2>⛔ Нет доступа</h2><p>Нужен token.</p>"), 403
+
+    office = request.args.get("office", OFFICES[0])
+    if office not in OFFICES:
+        office = OFFICES[0]
+
+    d_str = request.args.get("date", date.today().isoformat())
+    try:
+        d = date.fromisoformat(d_str)
+    except ValueError:
+        d = date.today()
+
+    conn = db()
+
+    active_rows = []
+    cancelled_rows = []
+    for r in conn.execute(ADMIN_ORDERS_SQL, (office, d.isoformat())):
+        (active_rows if r["status"] == "active" else cancelled_rows).append(r)
+
+    opt_counts, dish_counts, drink_counts = _summary_counts(conn, office, d)
+    conn.close()
+
+    active_groups = _active_by_floor(active_rows)
+
+    office_opts = "".join([f"<option value='{o}' {'selected' if o==office else ''}>{o}</option>" for o in OFFICES])
+
+    # Блок активных, сгруппированных по этажу
+    active_html = ""
+    for floor_name in sorted(active_groups.keys(), key=_floor_sort_key):
+        rr = active_groups[floor_name]
+        active_html += f"""
+        <div class="card">
+          <div style="display:flex; align-items:baseline; justify-content:space-between; gap:10px; flex-wrap:wrap;">
+            <h3 style="margin:0;">Активные — {floor_name}</h3>
+            <div class="muted" style="font-weight:800;">{len(rr)} шт.</div>
+          </div>
+
+          <div class="no-print" style="margin-top:10px; display:flex; gap:10px; flex-wrap:wrap;">
+            <a class="btn-primary" href="/admin/print?office={office}&date={d.isoformat()}&floor={floor_name}&token={ADMIN_TOKEN}">
+              🖨 Печать: {floor_name}
+            </a>
+          </div>
+
+          {_rows_table_v2(rr)}
+        </div>
+        """
+
+    body = f"""
+    <h1>Админка</h1>
+
+    <div class="card">
+      <form method="get" action="/admin">
+        <input type="hidden" name="token" value="{ADMIN_TOKEN}">
+        <div class="row">
+          <div>
+            <label>Офис</label>
+            <select name="office">{office_opts}</select>
+          </div>
+          <div>
+            <label>Дата</label>
+            <input type="date" name="date" value="{d.isoformat()}">
+          </div>
+        </div>
+        <button class="btn-primary" type="submit">Показать</button>
+      </form>
+
+      <p style="margin-top:14px;">
+        <a href="/export.csv?office={office}&date={d.isoformat()}&token={ADMIN_TOKEN}">
+          ⬇️ Выгрузка CSV (активные)
+        </a>
+        &nbsp;|&nbsp;
+        <a href="/admin/print?office={office}&date={d.isoformat()}&token={ADMIN_TOKEN}">
+          🖨 Печать активных (все)
+        </a>
+        &nbsp;|&nbsp;
+        <a href="/admin/summary?office={office}&date={d.isoformat()}&token={ADMIN_TOKEN}">
+          🧾 Сводка (печать)
+        </a>
+        &nbsp;|&nbsp;
+        <a href="/admin/specials?office={office}&date={d.isoformat()}&token={ADMIN_TOKEN}">
+          ⭐ Блюдо недели (управление)
+        </a>
+      </p>
+
+      <p>
+        <span class="pill">Опция 1: {opt_counts.get('opt1',0)}</span>
+        <span class="pill">Опция 2: {opt_counts.get('opt2',0)}</span>
+        <span class="pill">Опция 3: {opt_counts.get('opt3',0)}</span>
+      </p>
+    </div>
+
+    {active_html}
+
+    <div class="card">
+      <h3>Отменённые заказы</h3>
+      {_rows_table_v2(cancelled_rows)}
+    </div>
+
+    {_simple_table("Сводка по блюдам (активные)", dish_counts)}
+    {_simple_table("Сводка по напиткам (активные)", drink_counts)}
+    """
+    return html_page(body)
+
+
+# --- Summary page (kitchen/bar) ---
+ADMIN_SUMMARY_CSS = """
+<style>
+  @media print {
+    .no-print { display:none !important; }
+    body { margin:0; }
+    .card { border:none; margin:0; padding:0; }
+    a { color:#000; text-decoration:none; }
+  }
+</style>
+"""
+
+@app.get("/admin/summary")
+def admin_summary_v2():
+    if not check_admin():
+        return html_page("<h2>⛔ Нет доступа</h2><p>Нужен token.</p>"), 403
+
+    office = request.args.get("office", OFFICES[0])
+    if office not in OFFICES:
+        office = OFFICES[0]
+
+    d_str = request.args.get("date", date.today().isoformat())
+    try:
+        d = date.fromisoformat(d_str)
+    except ValueError:
+        d = date.today()
+
+    conn = db()
+    _, dish_counts, drink_counts = _summary_counts(conn, office, d)
+    conn.close()
+
+    body = f"""
+    {ADMIN_SUMMARY_CSS}
+    <h1>Сводка (кухня/бар)</h1>
+
+    <div class="card">
+      <p><b>Офис:</b> {office} &nbsp; | &nbsp; <b>Дата:</b> {d.isoformat()}</p>
+
+      <div class="no-print" style="margin-top:12px; display:flex; gap:10px; flex-wrap:wrap;">
+        <a class="btn-primary" href="/admin?office={office}&date={d.isoformat()}&token={ADMIN_TOKEN}">← Назад в админку</a>
+        <button class="btn-primary" type="button" onclick="window.print()">Печать / PDF</button>
+      </div>
+
+      <div style="margin-top:16px;">
+        {_simple_table("Блюда (активные)", dish_counts)}
+      </div>
+
+      <div style="margin-top:18px;">
+        {_simple_table("Напитки (активные)", drink_counts)}
+      </div>
+    </div>
+    """
+    return html_page(body)
+
+
+# --- Print active (all or by floor) ---
+ADMIN_PRINT_CSS = """
+<style>
+  @media print{
+    body{ margin:0; background:#fff !important; }
+    .card{ border:0 !important; margin:0; padding:0; background:#fff !important; }
+    table, th, td{ background:#fff !important; }
+    .admin-table th{ background:#fff !important; }
+    *{ -webkit-print-color-adjust: economy; print-color-adjust: economy; }
+
+    body{ font-size:11px; }
+    .admin-table{ font-size:10px; }
+    .admin-table th, .admin-table td{ padding:4px 6px; }
+    .admin-table td:last-child{ max-width:260px; white-space:normal; word-break:break-word; }
+
+    .no-print, button, a{ display:none !important; }
+  }
+</style>
+"""
+
+PRINT_BY_FLOOR_SQL = """
+    SELECT * FROM orders_v
+    WHERE office=? AND order_date=? AND status='active' AND COALESCE(floor,'')=?
+    ORDER BY created_at ASC
+"""
+PRINT_ACTIVE_SQL = """
+    SELECT * FROM orders_v
+    WHERE office=? AND order_date=? AND status='active'
+    ORDER BY created_at ASC
+"""
+
+
+@app.get("/admin/print")
+def admin_print_active_v2():
+    if not check_admin():
+        return html_page("<h2>⛔ Нет доступа</h2><p>Нужен token.</p>"), 403
+
+    office = request.args.get("office", OFFICES[0])
+    if office not in OFFICES:
+        office = OFFICES[0]
+
+    d_str = request.args.get("date", date.today().isoformat())
+    try:
+        d = date.fromisoformat(d_str)
+    except ValueError:
+        d = date.today()
+
+    floor_filter = (request.args.get("floor", "") or "").strip()
+
+    conn = db()
+
+    if floor_filter:
+        rows = conn.execute(
+            PRINT_BY_FLOOR_SQL, (office, d.isoformat(), floor_filter if floor_filter != "Без этажа" else "")
+        ).fetchall()
+    else:
+        rows = conn.execute(PRINT_ACTIVE_SQL, (office, d.isoformat())).fetchall()
+
+    conn.close()
+
+    title = "Печать — активные заказы" + (f" — {floor_filter}" if floor_filter else "")
+
+    body = f"""
+    {ADMIN_PRINT_CSS}
+    <h1 style="text-align:center;">{title}</h1>
+    <p style="text-align:center; font-weight:800;">
+      Офис: {office} &nbsp; | &nbsp; Дата: {d.isoformat()}
+    </p>
+
+    <div class="card">
+      {_rows_table_v2(rows)}
+
+      <div class="no-print" style="margin-top:14px; display:flex; gap:10px; flex-wrap:wrap;">
+        <button class="btn-primary" type="button" onclick="window.print()">🖨 Печать</button>
+        <a class="btn-danger" href="/admin?office={office}&date={d.isoformat()}&token={ADMIN_TOKEN}">← Назад</a>
+      </div>
+    </div>
+    """
+    return html_page(body)
+
+
+# --- CSV export (streaming) ---
+EXPORT_COLUMNS = [
+    "order_code", "office", "order_date", "floor",
+    "name", "phone_raw",
+    "option_code", "price_eur",
+    "soup", "zakuska", "hot", "dessert",
+    "drink_label", "drink_price_eur", "bread",
+    "comment", "status", "created_at",
+]
+EXPORT_STATUSES = {"active", "cancelled", "all"}
+EXPORT_BATCH = 500
+
+
+@app.get("/export.csv")
+def export_csv():
+    """
+    ?office=ALAMEDA|MUSICA|ALL
+    ?date=YYYY-MM-DD  или  ?date_from=...&date_to=...
+    ?status=active (по умолчанию) | cancelled | all
+    Строки идут из курсора пачками по EXPORT_BATCH — память не зависит от объёма выгрузки.
+    """
+    if not check_admin():
+        return Response("forbidden", status=403, mimetype="text/plain")
+
+    office = request.args.get("office", OFFICES[0])
+    if office != "ALL" and office not in OFFICES:
+        return Response("unknown office", status=400, mimetype="text/plain")
+
+    status = request.args.get("status", "active")
+    if status not in EXPORT_STATUSES:
+        return Response("unknown status", status=400, mimetype="text/plain")
+
+    d_single = request.args.get("date", date.today().isoformat())
+    try:
+        d_from = date.fromisoformat(request.args.get("date_from", d_single))
+        d_to = date.fromisoformat(request.args.get("date_to", request.args.get("date_from", d_single)))
+    except ValueError:
+        return Response("invalid date", status=400, mimetype="text/plain")
+    if d_to < d_from:
+        return Response("date_to < date_from", status=400, mimetype="text/plain")
+
+    where = ["order_date BETWEEN ? AND ?"]
+    params = [d_from.isoformat(), d_to.isoformat()]
+    offices = OFFICES if office == "ALL" else [office]
+    where.append(f"office IN ({','.join('?' * len(offices))})")
+    params.extend(offices)
+    if status != "all":
+        where.append("status=?")
+        params.append(status)
+
+    sql = f"""
+        SELECT {", ".join(EXPORT_COLUMNS)} FROM orders_v
+        WHERE {" AND ".join(where)}
+        ORDER BY order_date, office, created_at
+    """
+
+    def generate():
+        buf = io.StringIO()
+        w = csv.writer(buf)
+        # BOM — чтобы Excel открыл кириллицу как UTF-8
+        buf.write("\ufeff")
+        w.writerow(EXPORT_COLUMNS)
+
+        cur = db().execute(sql, params)
+        try:
+            while True:
+                rows = cur.fetchmany(EXPORT_BATCH)
+                if not rows:
+                    break
+                w.writerows(rows)
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate(0)
+        finally:
+            # клиент оборвал скачивание — генератор закрыт на yield, курсор всё равно закрываем
+            cur.close()
+
+        tail = buf.getvalue()
+        if tail:
+            yield tail
+
+    period = d_from.isoformat() if d_from == d_to else f"{d_from.isoformat()}_{d_to.isoformat()}"
+    filename = f"orders_{office}_{period}_{status}.csv"
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+# --- Specials management: list + create + delete ---
+@app.get("/admin/specials")
+def admin_specials_get():
+    if not check_admin():
+        return html_page("<h2>⛔ Нет доступа</h2><p>Нужен token.</p>"), 403
+
+    office = request.args.get("office", OFFICES[0])
+    if office not in OFFICES:
+        office = OFFICES[0]
+
+    d_str = request.args.get("date", date.today().isoformat())
+    try:
+        d = date.fromisoformat(d_str)
+    except ValueError:
+        d = date.today()
+
+    conn = db()
+    rows = conn.execute(ADMIN_SPECIALS_SQL, (office,)).fetchall()
+    conn.close()
+
+    # form defaults
+    start_default = d.isoformat()
+    end_default = (d + timedelta(days=6)).isoformat()
+
+    office_opts = "".join([f"<option value='{o}' {'selected' if o==office else ''}>{o}</option>" for o in OFFICES])
+
+    list_html = ""
+    for r in rows:
+        list_html += f"""
+        <tr>
+          <td><b>{r['id']}</b></td>
+          <td>{r['start_date']} → {r['end_date']}</td>
+          <td>{r['title']}</td>
+          <td style="text-align:right;">+{int(r['surcharge_eur'])}€</td>
+          <td style="text-align:right;">
+            <form method="post" action="/admin/specials/delete?token={ADMIN_TOKEN}" onsubmit="return confirm('Удалить блюдо недели?');">
+              <input type="hidden" name="id" value="{r['id']}">
+              <input type="hidden" name="office" value="{office}">
+              <input type="hidden" name="date" value="{d.isoformat()}">
+              <button class="btn-danger" type="submit">Удалить</button>
+            </form>
+          </td>
+        </tr>
+        """
+
+    if not list_html:
+        list_html = "<tr><td colspan='5' class='muted'>—</td></tr>"
+
+    body = f"""
+    <h1>Блюдо недели — управление</h1>
+
+    <div class="card">
+      <form method="get" action="/admin/specials">
+        <input type="hidden" name="token" value="{ADMIN_TOKEN}">
+        <div class="row">
+          <div>
+            <label>Офис</label>
+            <select name="office">{office_opts}</select>
+          </div>
+          <div>
+            <label>Дата (для удобства)</label>
+            <input type="date" name="date" value="{d.isoformat()}">
+          </div>
+        </div>
+        <button class="btn-primary" type="submit">Показать</button>
+      </form>
+
+      <p style="margin-top:14px;">
+        <a href="/admin?office={office}&date={d.isoformat()}&token={ADMIN_TOKEN}">← Назад в админку</a>
+      </p>
+    </div>
+
+    <div class="card">
+      <h3>Создать / обновить (через добавление новой записи)</h3>
+      <form method="post" action="/admin/specials/create?token={ADMIN_TOKEN}">
+        <input type="hidden" name="office" value="{office}">
+
+        <div class="row">
+          <div>
+            <label>Начало</label>
+            <input type="date" name="start_date" value="{start_default}" required>
+          </div>
+          <div>
+            <label>Конец</label>
+            <input type="date" name="end_date" value="{end_default}" required>
+          </div>
+        </div>
+
+        <label>Название блюда недели (горячее)</label>
+        <input name="title" placeholder="Напр. Бефстроганов" required>
+
+        <label>Доплата, €</label>
+        <input name="surcharge_eur" type="number" min="0" step="1" value="0" required>
+
+        <button class="btn-primary" type="submit">Сохранить</button>
+      </form>
+      <p class="muted">Мы не “редактируем” старые — мы добавляем новую запись. История сохраняется.</p>
+    </div>
+
+    <div class="card">
+      <h3>Последние 30 записей</h3>
+      <table class="admin-table">
+        <thead>
+          <tr>
+            <th>ID</th>
+            <th>Период</th>
+            <th>Название</th>
+            <th style="text-align:right;">Доплата</th>
+            <th style="text-align:right;">Действия</th>
+          </tr>
+        </thead>
+        <tbody>
+          {list_html}
+        </tbody>
+      </table>
+    </div>
+    """
+    return html_page(body)
+
+
+@app.post("/admin/specials/create")
+def admin_specials_create_post():
+    if not check_admin():
+        return html_page("<h2>⛔ Нет доступа</h2><p>Нужен token.</p>"), 403
+
+    office = (request.form.get("office", "") or "").strip()
+    if office not in OFFICES:
+        return html_page("<p class='danger'>Ошибка: неизвестный офис.</p>"), 400
+
+    try:
+        start_date = date.fromisoformat((request.form.get("start_date", "") or "").strip())
+        end_date = date.fromisoformat((request.form.get("end_date", "") or "").strip())
+    except ValueError:
+        return html_page("<p class='danger'>Ошибка: неверные даты.</p>"), 400
+
+    if end_date < start_date:
+        return html_page("<p class='danger'>Ошибка: дата конца раньше даты начала.</p>"), 400
+
+    title = (request.form.get("title", "") or "").strip()
+    if not title:
+        return html_page("<p class='danger'>Ошибка: пустое название.</p>"), 400
+
+    try:
+        surcharge = int(request.form.get("surcharge_eur", "0"))
+        if surcharge < 0:
+            raise ValueError
+    except ValueError:
+        return html_page("<p class='danger'>Ошибка: доплата должна быть целым числом ≥ 0.</p>"), 400
+
+    conn = db()
+    conn.execute(
+        """
+        INSERT INTO weekly_special(office, start_date, end_date, title, surcharge_eur, created_at)
+        VALUES (?,?,?,?,?,?)
+        """,
+        (office, start_date.isoformat(), end_date.isoformat(), title, surcharge, datetime.utcnow().isoformat()),
+    )
+    special = conn.execute("SELECT * FROM weekly_special WHERE id=last_insert_rowid()").fetchone()
+    conn.execute(
+        "INSERT INTO dishes(category, label, short_name, special_id) VALUES ('hot', ?, ?, ?)",
+        (special_label(special), _short_name(special_label(special)), special["id"]),
+    )
+    bump_cache_generation(conn, "weekly_special")
+    conn.commit()
+    conn.close()
+    invalidate_special_cache()
+
+    return redirect(f"/admin/specials?office={office}&date={start_date.isoformat()}&token={ADMIN_TOKEN}")
+
+
+@app.post("/admin/specials/delete")
+def admin_specials_delete_post():
+    if not check_admin():
+        return html_page("<h2>⛔ Нет доступа</h2><p>Нужен token.</p>"), 403
+
+    try:
+        sid = int(request.form.get("id", "0"))
+    except ValueError:
+        sid = 0
+    if sid <= 0:
+        return html_page("<p class='danger'>Ошибка: неверный id.</p>"), 400
+
+    conn = db()
+    conn.execute("DELETE FROM weekly_special WHERE id=?", (sid,))
+    bump_cache_generation(conn, "weekly_special")
+    conn.commit()
+    conn.close()
+    invalidate_special_cache()
+
+    office = (request.form.get("office", OFFICES[0]) or "").strip()
+    if office not in OFFICES:
+        office = OFFICES[0]
+    d = (request.form.get("date", date.today().isoformat()) or "").strip()
+
+    return redirect(f"/admin/specials?office={office}&date={d}&token={ADMIN_TOKEN}")
+
+
+# ---------------------------
+# Profiling (admin)
+# ---------------------------
+# 1) ?profile=1&token=... на GET/HEAD-маршруте — запрос под cProfile, в ответ статистика
+#    текстом (&sort=tottime|cumulative|calls); ?profile=pstats — файл .pstats (snakeviz и т.п.).
+#    POST не профилируется: ответ подменяется статистикой, а заказ уже записан бы был.
+# 2) Сэмплер: /admin/profiler запускает на N секунд поток, который раз в interval снимает
+#    sys._current_frames() потоков, занятых запросом прямо сейчас (простаивающие — главный
+#    цикл gunicorn, metrics-flush — не в счёт), и копит collapsed stacks (flamegraph.pl / speedscope).
+#    Запуск пишется в PROFILE_DIR/request.json — каждый воркер gunicorn видит его на своём
+#    следующем запросе и стартует свой сэмплер; файл результата у каждого воркера свой.
+PROFILE_DIR = os.getenv("PROFILE_DIR", "/tmp/volga-profiles")
+PROFILE_TOP = 80
+PROFILE_SORTS = {"cumulative", "tottime", "calls"}
+PROFILE_NAME_RE = re.compile(r"[0-9]{8}-[0-9]{6}-[0-9]+\.collapsed")
+
+_profiler_state = {"checked": 0.0, "seen": None, "running": False}
+_profiler_lock = threading.Lock()
+_request_threads = set()  # ident потоков, которые сейчас обрабатывают запрос
+
+
+@app.before_request
+def profile_start():
+    _request_threads.add(threading.get_ident())
+    profiler_poll()
+    if request.args.get("profile") in ("1", "pstats") and check_admin():
+        if request.method not in ("GET", "HEAD"):
+            return html_page("<p class='danger'>?profile — только для GET/HEAD / ?profile works for GET/HEAD only.</p>"), 400
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+
+@app.teardown_request
+def profile_request_done(exc=None):
+    _request_threads.discard(threading.get_ident())
+
+
+@app.after_request
+def profile_finish(resp):
+    prof = g.pop("profiler", None)
+    if prof is None:
+        return resp
+    prof.disable()
+
+    name = (request.url_rule.rule if request.url_rule else "unmatched").strip("/").replace("/", "_") or "index"
+    if request.args.get("profile") == "pstats":
+        prof.create_stats()
+        out = Response(marshal.dumps(prof.stats), mimetype="application/octet-stream")
+        out.headers["Content-Disposition"] = f"attachment; filename=profile-{name}.pstats"
+        return out
+
+    sort = request.args.get("sort", "cumulative")
+    buf = io.StringIO()
+    buf.write(f"{request.method} {request.full_path} -> {resp.status}\n\n")
+    pstats.Stats(prof, stream=buf).sort_stats(sort if sort in PROFILE_SORTS else "cumulative").print_stats(PROFILE_TOP)
+    return Response(buf.getvalue(), mimetype="text/plain")
+
+
+def _frame_name(frame) -> str:
+    co = frame.f_code
+    return f"{co.co_name} ({os.path.basename(co.co_filename)}:{co.co_firstlineno})"
+
+
+def _sample_stacks(until: float, interval: float, out_path: str):
+    counts = {}
+    try:
+        while datetime.now().timestamp() < until:
+            busy = set(_request_threads)
+            for tid, frame in sys._current_frames().items():
+                if tid not in busy:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_name(frame))
+                    frame = frame.f_back
+                key = ";".join(reversed(stack))
+                counts[key] = counts.get(key, 0) + 1
+            sleep(interval)
+
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        with open(out_path, "w", encoding="utf-8") as f:
+            for stack, n in sorted(counts.items()):
+                f.write(f"{stack} {n}\n")
+    finally:
+        _profiler_state["running"] = False
+
+
+def profiler_poll():
+    """Раз в секунду: не появился ли новый запуск сэмплера (request.json)."""
+    now = perf_counter()
+    if now - _profiler_state["checked"] < 1.0:
+        return
+    _profiler_state["checked"] = now
+    path = os.path.join(PROFILE_DIR, "request.json")
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return
+    with _profiler_lock:
+        if mtime == _profiler_state["seen"] or _profiler_state["running"]:
+            return
+        _profiler_state["seen"] = mtime
+        try:
+            with open(path, encoding="utf-8") as f:
+                req = json.load(f)
+        except (OSError, ValueError):
+            return
+        if req.get("until", 0) <= datetime.now().timestamp():
+            return
+        _profiler_state["running"] = True
+    out_path = os.path.join(PROFILE_DIR, f"{req['id']}-{os.getpid()}.collapsed")
+    threading.Thread(
+        target=_sample_stacks, args=(req["until"], req["interval"], out_path), name="profiler", daemon=True
+    ).start()
+
+
+@app.get("/admin/profiler")
+def admin_profiler_get():
+    if not check_admin():
+        return html_page("<h2>⛔ Нет доступа</h2><p>Нужен token.</p>"), 403
+
+    try:
+        files = sorted((n for n in os.listdir(PROFILE_DIR) if PROFILE_NAME_RE.fullmatch(n)), reverse=True)
+    except OSError:
+        files = []
+    list_html = ""
+    for n in files[:50]:
+        size = os.path.getsize(os.path.join(PROFILE_DIR, n))
+        list_html += (
+            f"<tr><td><a href='/admin/profiler/{n}?token={ADMIN_TOKEN}'>{n}</a></td>"
+            f"<td style='text-align:right;'>{size / 1024:.1f} KB</td></tr>"
+        )
+    if not list_html:
+        list_html = "<tr><td colspan='2' class='muted'>—</td></tr>"
+
+    status = "идёт (в этом воркере)" if _profiler_state["running"] else "не запущен (в этом воркере)"
+    body = f"""
+    <h1>Профилировщик</h1>
+
+    <div class="card">
+      <p>Сэмплер: <b>{status}</b>, pid {os.getpid()}</p>
+      <form method="post" action="/admin/profiler/start?token={ADMIN_TOKEN}">
+        <div class="row">
+          <div>
+            <label>Секунд</label>
+            <input name="seconds" type="number" min="1" max="300" value="30" required>
+          </div>
+          <div>
+            <label>Интервал, мс</label>
+            <input name="interval_ms" type="number" min="1" max="100" value="5" required>
+          </div>
+        </div>
+        <button class="btn-primary" type="submit">Запустить</button>
+      </form>
+      <p class="muted">Каждый воркер начинает на своём следующем запросе и пишет свой файл (…-pid.collapsed).
+      Один запрос под cProfile: добавьте к адресу <code>?profile=1&amp;token=…</code> (или <code>profile=pstats</code>).</p>
+    </div>
+
+    <div class="card">
+      <h3>Collapsed stacks</h3>
+      <table class="admin-table">
+        <tbody>{list_html}</tbody>
+      </table>
+      <p style="margin-top:14px;"><a href="/admin?token={ADMIN_TOKEN}">← Назад в админку</a></p>
+    </div>
+    """
+    return html_page(body)
+
+
+@app.post("/admin/profiler/start")
+def admin_profiler_start_post():
+    if not check_admin():
+        return html_page("<h2>⛔ Нет доступа</h2><p>Нужен token.</p>"), 403
+
+    try:
+        seconds = int(request.form.get("seconds", "30"))
+        interval_ms = int(request.form.get("interval_ms", "5"))
+        if not (1 <= seconds <= 300 and 1 <= interval_ms <= 100):
+            raise ValueError
+    except ValueError:
+        return html_page("<p class='danger'>Ошибка: секунды 1–300, интервал 1–100 мс.</p>"), 400
+
+    started = datetime.now()
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    tmp = os.path.join(PROFILE_DIR, f"request.json.{os.getpid()}")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({
+            "id": started.strftime("%Y%m%d-%H%M%S"),
+            "until": started.timestamp() + seconds,
+            "interval": interval_ms / 1000,
+        }, f)
+    os.replace(tmp, os.path.join(PROFILE_DIR, "request.json"))
+
+    # этот воркер начинает сразу
+    _profiler_state["checked"] = 0.0
+    profiler_poll()
+    return redirect(f"/admin/profiler?token={ADMIN_TOKEN}")
+
+
+@app.get("/admin/profiler/<name>")
+def admin_profiler_file(name: str):
+    if not check_admin():
+        return Response("forbidden", status=403, mimetype="text/plain")
+    if not PROFILE_NAME_RE.fullmatch(name) or not os.path.exists(os.path.join(PROFILE_DIR, name)):
+        return Response("not found", status=404, mimetype="text/plain")
+    return send_file(os.path.join(PROFILE_DIR, name), mimetype="text/plain", as_attachment=True, download_name=name)
+
+
+# В самом конце модуля: шагам миграций нужны MENU, _short_name и т.п.
+# Отключается (MIGRATE_ON_START=0), если миграции гоняются отдельно: flask --app app migrate
+if os.getenv("MIGRATE_ON_START", "1") == "1":
+    migrate_db()
+
+
+if __name__ == "__main__":
+    app.run(host="0.0.0.0", port=int(os.getenv("PORT", "5000")), debug=True)
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
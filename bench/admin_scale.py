@@ -0,0 +1,130 @@
+"""
+Админка и выгрузка на 1x / 10x / 100x нынешнего объёма.
+
+Для каждого масштаба генерирует базу (bench/gen_dataset.py) и замеряет через
+test_client /admin, /admin/summary, /admin/print на самый загруженный день
+и /export.csv за месяц и за весь период. Каждый масштаб — отдельный процесс:
+DB_PATH читается app один раз при импорте.
+
+    python bench/admin_scale.py
+    python bench/admin_scale.py --scales 1 10 100 --days 365 --out bench/results/admin_scale.json
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TOKEN = "bench-token"
+LINK_SECRET = "bench-order-link-secret"
+
+
+def timed(client, url: str, repeats: int) -> dict:
+    samples = []
+    size = 0
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        r = client.get(url)
+        body = r.get_data()
+        samples.append(time.perf_counter() - t0)
+        if r.status_code != 200:
+            raise SystemExit(f"{url}: HTTP {r.status_code}")
+        size = len(body)
+    return {"median_ms": round(statistics.median(samples) * 1000, 2), "max_ms": round(max(samples) * 1000, 2),
+            "bytes": size}
+
+
+def measure(db_path: str, start: date, days: int, repeats: int) -> dict:
+    """Замеры в этом процессе: app импортируется на db_path."""
+    os.environ.update({"DB_PATH": db_path, "MIGRATE_ON_START": "0", "ADMIN_TOKEN": TOKEN})
+    os.environ.setdefault("ORDER_LINK_SECRET", LINK_SECRET)
+    import app as volga
+
+    conn = volga.db()
+    busiest = conn.execute(
+        """
+        SELECT order_date, COUNT(*) AS n FROM orders
+        WHERE office='ALAMEDA' AND status='active'
+        GROUP BY order_date ORDER BY n DESC LIMIT 1
+        """
+    ).fetchone()
+    total = conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+    conn.close()
+
+    d = busiest["order_date"]
+    end = (start + timedelta(days=days - 1)).isoformat()
+    month_from = (date.fromisoformat(end) - timedelta(days=30)).isoformat()
+    q = f"office=ALAMEDA&date={d}&token={TOKEN}"
+    urls = {
+        "/admin": f"/admin?{q}",
+        "/admin/summary": f"/admin/summary?{q}",
+        "/admin/print": f"/admin/print?{q}",
+        "/export.csv month": f"/export.csv?office=ALL&date_from={month_from}&date_to={end}&status=all&token={TOKEN}",
+        "/export.csv all": f"/export.csv?office=ALL&date_from={start.isoformat()}&date_to={end}&status=all&token={TOKEN}",
+    }
+
+    client = volga.app.test_client()
+    routes = {}
+    for name, url in urls.items():
+        client.get(url)  # прогрев: кэш страниц SQLite, шаблоны
+        routes[name] = timed(client, url, repeats if "all" not in name else max(1, repeats // 3))
+    return {"orders": total, "day_orders": busiest["n"], "routes": routes}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--scales", type=float, nargs="+", default=[1, 10, 100])
+    ap.add_argument("--start", type=date.fromisoformat, default=date(2025, 1, 1))
+    ap.add_argument("--days", type=int, default=365)
+    ap.add_argument("--repeats", type=int, default=9)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--out", default="")
+    ap.add_argument("--measure", default="", help=argparse.SUPPRESS)  # внутренний режим: один масштаб
+    args = ap.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(args.measure, args.start, args.days, args.repeats)))
+        return
+
+    results = {}
+    for scale in args.scales:
+        tmp = tempfile.mkdtemp(prefix="volga-scale-")
+        db_path = os.path.join(tmp, "orders.sqlite")
+        try:
+            subprocess.run(
+                [sys.executable, os.path.join(ROOT, "bench", "gen_dataset.py"), db_path,
+                 "--start", args.start.isoformat(), "--days", str(args.days),
+                 "--scale", str(scale), "--seed", str(args.seed)],
+                check=True,
+            )
+            out = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--measure", db_path,
+                 "--start", args.start.isoformat(), "--days", str(args.days), "--repeats", str(args.repeats)],
+                check=True, capture_output=True, text=True,
+            ).stdout
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+        r = results[f"{scale:g}x"] = json.loads(out.strip().splitlines()[-1])
+
+        print(f"\n{scale:g}x: {r['orders']} заказов, в самый загруженный день {r['day_orders']}")
+        for name, m in r["routes"].items():
+            print(f"  {name:20s} {m['median_ms']:10.2f} ms  (max {m['max_ms']:.2f}, {m['bytes'] / 1024:.0f} КБ)")
+
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"params": {k: v for k, v in vars(args).items() if k not in ("out", "measure")} | {
+                "start": args.start.isoformat()}, "results": results}, f, ensure_ascii=False, indent=2)
+            f.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,353 @@
+"""
+Нагрузочный прогон "час пик перед 11:00".
+
+Поднимает приложение командой из Procfile (gunicorn app:app) с N воркерами
+на временной базе и замороженными часами (FROZEN_NOW), затем гоняет
+"сотрудников": каждый открывает форму, оформляет заказ, часть правит
+или отменяет его, часть жмёт "отправить" повторно. Приход сотрудников
+сгущается к концу окна — как в 10:50–11:00.
+
+    python bench/cutoff_rush.py
+    python bench/cutoff_rush.py --workers 8 --users 400 --concurrency 64
+    python bench/cutoff_rush.py --out bench/results/$(git rev-parse --short HEAD).json
+
+Итог: пропускная способность, p50/p95/p99 по маршрутам, ошибки
+"database is locked", был ли превышен MAX_PER_DAY и не создал ли двойной
+тап (два одновременных POST с одним ключом) второй заказ или разные ответы. JSON — чтобы
+сравнивать коммиты между собой. Внешних сервисов и пакетов кроме
+requirements.txt не нужно.
+"""
+import argparse
+import http.client
+import json
+import math
+import os
+import random
+import shlex
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# вторник, 10:55 — окно приёма на этот же день ещё открыто
+DEFAULT_FROZEN_NOW = "2030-01-08T10:55:00"
+OFFICE = "ALAMEDA"
+FLOORS = ["1st floor", "6th floor"]
+TOKEN = "bench-token"
+LINK_SECRET = "bench-order-link-secret"
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def procfile_command() -> list[str]:
+    with open(os.path.join(ROOT, "Procfile"), encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("web:"):
+                cmd = shlex.split(line[len("web:"):])
+                break
+        else:
+            raise SystemExit("Procfile: нет строки web:")
+    if not shutil.which(cmd[0]):
+        cmd = [sys.executable, "-m", cmd[0]] + cmd[1:]
+    return cmd
+
+
+def percentile(sorted_values: list[float], p: float) -> float:
+    """Nearest-rank: наименьшее значение, не меньше которого p% выборки."""
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, math.ceil(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+
+class Client:
+    """HTTP keep-alive соединение на поток + журнал (маршрут, статус, секунды)."""
+
+    def __init__(self, port: int, log: list, lock: threading.Lock):
+        self.port = port
+        self.log = log
+        self.lock = lock
+        self.local = threading.local()
+
+    def _conn(self) -> http.client.HTTPConnection:
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = self.local.conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=60)
+        return conn
+
+    def request(self, route: str, method: str, path: str, form: dict | None = None) -> tuple[int, str]:
+        body = urlencode(form) if form is not None else None
+        headers = {"Content-Type": "application/x-www-form-urlencoded"} if form is not None else {}
+        t0 = time.perf_counter()
+        try:
+            conn = self._conn()
+            conn.request(method, path, body=body, headers=headers)
+            resp = conn.getresponse()
+            text = resp.read().decode("utf-8", "replace")
+            status = resp.status
+        except (OSError, http.client.HTTPException):
+            self.local.conn = None
+            status, text = 0, ""
+        dt = time.perf_counter() - t0
+        with self.lock:
+            self.log.append((route, status, dt))
+        return status, text
+
+
+def make_order(rng: random.Random, menu: dict, breads: list, drinks: list) -> dict:
+    option = rng.choice(["opt1", "opt2", "opt3"])
+    order = {
+        "soup": rng.choice(menu["soup"]),
+        "zakuska": rng.choice(menu["zakuska"]) if option in ("opt1", "opt3") else "",
+        "hot": rng.choice(menu["hot"]) if option in ("opt2", "opt3") else "",
+        "dessert": rng.choice(menu["dessert"]) if option in ("opt1", "opt2") else "",
+        "drink": rng.choice(drinks),
+        "bread": rng.choice(breads + [""]),
+    }
+    return order
+
+
+def double_submit(client: Client, form: dict) -> list[tuple[int, str]]:
+    """Двойной тап: два одинаковых POST /order уходят одновременно, а не друг за другом."""
+    results = [(0, ""), (0, "")]
+    barrier = threading.Barrier(2)
+
+    def tap(k: int):
+        barrier.wait()
+        results[k] = client.request("POST /order", "POST", "/order", form)
+
+    # у второго потока своё соединение (Client держит их per-thread)
+    second = threading.Thread(target=tap, args=(1,))
+    second.start()
+    tap(0)
+    second.join()
+    return results
+
+
+def user_session(i: int, args, client: Client, day: str, start_at: float, menu, breads, drinks):
+    """Сценарий одного сотрудника. Для двойного тапа возвращает (i, статусы, ответы совпали), иначе None."""
+    rng = random.Random(args.seed * 100003 + i)
+    delay = start_at - time.perf_counter()
+    if delay > 0:
+        time.sleep(delay)
+
+    # часть сотрудников вводит телефон коллеги, который уже заказал -> 409
+    phone = f"+34 600 {i:06d}"
+    if i and rng.random() < args.dup_rate:
+        phone = f"+34 600 {rng.randrange(i):06d}"
+
+    client.request("GET /", "GET", f"/?office={OFFICE}&date={day}")
+
+    form = {
+        "office": OFFICE,
+        "order_date": day,
+        "floor": rng.choice(FLOORS),
+        "name": f"Bench {i}",
+        "phone": phone,
+        "comment": "",
+        # как форма: один ключ на загрузку страницы, двойной тап несёт тот же
+        "idempotency_key": f"rush-{args.seed}-{i:08d}",
+        **make_order(rng, menu, breads, drinks),
+    }
+    doubled = None
+    if rng.random() < args.double_submit_rate:
+        (status, first), (status2, second) = double_submit(client, form)
+        doubled = (i, (status, status2), (status, first) == (status2, second))
+    else:
+        status, _ = client.request("POST /order", "POST", "/order", form)
+    if status != 200:
+        return doubled
+
+    if rng.random() < args.edit_rate:
+        client.request("GET /edit", "GET", "/edit?" + urlencode({"office": OFFICE, "date": day, "phone": phone}))
+        client.request("POST /edit", "POST", "/edit", {
+            **form, **make_order(rng, menu, breads, drinks), "idempotency_key": f"rush-edit-{args.seed}-{i:08d}",
+        })
+
+    if rng.random() < args.cancel_rate:
+        client.request("POST /cancel", "POST", "/cancel", {"office": OFFICE, "order_date": day, "phone": phone})
+    return doubled
+
+
+def wait_ready(port: int, proc: subprocess.Popen, timeout: float = 30.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit("gunicorn завершился при старте, см. лог")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", "/manifest.webmanifest")
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise SystemExit("gunicorn не поднялся за отведённое время")
+
+
+def db_checks(db_path: str, max_per_day: int, doubled: list) -> dict:
+    conn = sqlite3.connect(db_path)
+    # двойной тап: заказ ровно один, если хоть один ответ 200, иначе ни одного
+    # (правка и отмена меняют строку, новую не создают)
+    double_submit_orders_wrong = sum(
+        1 for i, statuses, _ in doubled
+        if conn.execute("SELECT COUNT(*) FROM orders WHERE name=?", (f"Bench {i}",)).fetchone()[0]
+        != (1 if 200 in statuses else 0)
+    )
+    actual = dict(
+        ((o, d), n)
+        for o, d, n in conn.execute(
+            "SELECT office, order_date, COUNT(*) FROM orders WHERE status='active' GROUP BY office, order_date"
+        )
+    )
+    counters = dict(((o, d), n) for o, d, n in conn.execute("SELECT office, order_date, active_count FROM daily_capacity"))
+    conn.close()
+    max_active = max(actual.values(), default=0)
+    return {
+        "orders_active": sum(actual.values()),
+        "max_active_per_day": max_active,
+        "max_per_day_exceeded": max_active > max_per_day,
+        "capacity_counter_consistent": all(counters.get(k, 0) == v for k, v in actual.items())
+        and all(v == 0 or k in actual for k, v in counters.items()),
+        "double_submits": len(doubled),
+        "double_submit_mismatches": sum(1 for _, _, same in doubled if not same),
+        "double_submit_orders_wrong": double_submit_orders_wrong,
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--workers", type=int, default=4, help="воркеров gunicorn")
+    ap.add_argument("--users", type=int, default=200, help="сотрудников за прогон")
+    ap.add_argument("--concurrency", type=int, default=32, help="одновременных клиентов")
+    ap.add_argument("--ramp", type=float, default=10.0, help="секунд, за которые приходят все сотрудники")
+    ap.add_argument("--max-per-day", type=int, default=150)
+    ap.add_argument("--dup-rate", type=float, default=0.05)
+    ap.add_argument("--double-submit-rate", type=float, default=0.1)
+    ap.add_argument("--edit-rate", type=float, default=0.2)
+    ap.add_argument("--cancel-rate", type=float, default=0.1)
+    ap.add_argument("--frozen-now", default=DEFAULT_FROZEN_NOW)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--out", default="", help="куда записать JSON (по умолчанию только stdout)")
+    ap.add_argument("--keep-db", action="store_true", help="не удалять временную базу")
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="volga-rush-")
+    db_path = os.path.join(tmp, "orders.sqlite")
+    log_path = os.path.join(tmp, "gunicorn.log")
+    port = free_port()
+    env = {
+        **os.environ,
+        "DB_PATH": db_path,
+        "FROZEN_NOW": args.frozen_now,
+        "MAX_PER_DAY": str(args.max_per_day),
+        "ADMIN_TOKEN": TOKEN,
+        "ORDER_LINK_SECRET": os.environ.get("ORDER_LINK_SECRET") or LINK_SECRET,
+    }
+
+    # схему создаём заранее, чтобы воркеры не мигрировали наперегонки
+    subprocess.run([sys.executable, "-m", "flask", "--app", "app", "migrate"], cwd=ROOT, env=env, check=True,
+                   stdout=subprocess.DEVNULL)
+
+    os.environ.update({"DB_PATH": db_path, "MIGRATE_ON_START": "0", "ORDER_LINK_SECRET": env["ORDER_LINK_SECRET"]})
+    import app as volga  # только ради MENU/DRINKS — ровно то, что видит форма
+
+    menu = volga.MENU
+    breads = volga.BREAD_OPTIONS
+    drinks = [k for (k, _, _) in volga.DRINKS]
+    day = args.frozen_now[:10]
+
+    cmd = procfile_command() + ["--workers", str(args.workers), "--bind", f"127.0.0.1:{port}"]
+    with open(log_path, "w") as log_file:
+        proc = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=log_file, stderr=subprocess.STDOUT)
+    try:
+        wait_ready(port, proc)
+
+        log = []
+        client = Client(port, log, threading.Lock())
+        t0 = time.perf_counter()
+        # плотность прихода растёт к концу окна: t = ramp * sqrt(u)
+        rng = random.Random(args.seed)
+        starts = sorted(t0 + args.ramp * rng.random() ** 0.5 for _ in range(args.users))
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            futures = [
+                pool.submit(user_session, i, args, client, day, start_at, menu, breads, drinks)
+                for i, start_at in enumerate(starts)
+            ]
+        doubled = [d for d in (f.result() for f in futures) if d is not None]
+        elapsed = time.perf_counter() - t0
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+    with open(log_path, encoding="utf-8", errors="replace") as f:
+        server_log = f.read()
+
+    routes = {}
+    for route, status, dt in log:
+        r = routes.setdefault(route, {"latencies": [], "statuses": {}})
+        r["latencies"].append(dt)
+        r["statuses"][str(status)] = r["statuses"].get(str(status), 0) + 1
+
+    result = {
+        "commit": git_commit(),
+        "params": {k: v for k, v in vars(args).items() if k not in ("out", "keep_db")},
+        "duration_s": round(elapsed, 3),
+        "requests": len(log),
+        "throughput_rps": round(len(log) / elapsed, 1) if elapsed else 0.0,
+        "routes": {},
+        "server_errors": sum(1 for _, status, _ in log if status >= 500 or status == 0),
+        "db_locked_errors": server_log.count("database is locked"),
+        "max_per_day": args.max_per_day,
+        **db_checks(db_path, args.max_per_day, doubled),
+    }
+    for route, r in sorted(routes.items()):
+        lat = sorted(r["latencies"])
+        result["routes"][route] = {
+            "count": len(lat),
+            "p50_ms": round(percentile(lat, 50) * 1000, 2),
+            "p95_ms": round(percentile(lat, 95) * 1000, 2),
+            "p99_ms": round(percentile(lat, 99) * 1000, 2),
+            "max_ms": round(lat[-1] * 1000, 2),
+            "statuses": r["statuses"],
+        }
+
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    print(text)
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+    if args.keep_db:
+        print(f"база: {db_path}, лог: {log_path}", file=sys.stderr)
+    else:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    if (result["max_per_day_exceeded"] or not result["capacity_counter_consistent"]
+            or result["double_submit_mismatches"] or result["double_submit_orders_wrong"]):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+Синтетическая база заказов для проверки админки и выгрузки на объёмах.
+
+Заполняет orders + weekly_special (+ dishes, order_code_seq) правдоподобными
+заказами за период: все офисы, этажи, опции, напитки, хлеб, плов, блюда
+недели, отмены. Детерминирован по --seed. Пишет пачками через executemany
+в больших транзакциях: ~0.9–1.2 млн заказов в минуту на одном ядре
+(365 дней --scale 100 — ~835 тыс. заказов — около минуты).
+
+    python bench/gen_dataset.py /tmp/volga.sqlite --start 2025-01-01 --days 365
+    python bench/gen_dataset.py /tmp/volga100.sqlite --days 730 --scale 100 --force
+
+--scale 1 — нынешний объём (~ORDERS_PER_DAY заказов на офис в рабочий день),
+10 и 100 — во столько раз больше. Дальше: DB_PATH=/tmp/volga.sqlite flask run
+или bench/admin_scale.py.
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+ORDERS_PER_DAY = 20  # на офис в рабочий день при --scale 1
+CANCEL_RATE = 0.08
+SPECIAL_WEEK_RATE = 0.5  # доля недель с блюдом недели
+BATCH = 50_000
+
+SPECIAL_TITLES = ["Голубцы", "Бефстроганов", "Жаркое в горшочке", "Котлета по-киевски", "Манты", "Сырники"]
+COMMENTS = ["", "", "", "", "без лука", "поострее", "без майонеза", "на ресепшн"]
+FIRST_NAMES = ["Anna", "Ivan", "Maria", "Pablo", "Olga", "Sergey", "Lucia", "Dmitry", "Elena", "Carlos"]
+
+
+def import_app(db_path: str):
+    """app на нужной базе: импорт создаёт схему миграциями."""
+    os.environ["DB_PATH"] = db_path
+    os.environ.setdefault("MIGRATE_ON_START", "1")
+    os.environ.setdefault("ORDER_LINK_SECRET", "bench-order-link-secret")  # ссылки не сохраняются, любой
+    import app as volga
+    if volga.DB_PATH != db_path:
+        raise SystemExit("app уже импортирован с другой базой")
+    return volga
+
+
+def workdays(volga, start: date, days: int):
+    for i in range(days):
+        d = start + timedelta(days=i)
+        if volga.is_workday(d):
+            yield d
+
+
+def gen_specials(volga, conn, rng: random.Random, start: date, days: int) -> dict:
+    """Блюда недели по неделям (Вт–Пт). -> {(office, date): (label, surcharge, dish_id)}"""
+    by_day = {}
+    monday = start - timedelta(days=start.weekday())
+    end = start + timedelta(days=days)
+    while monday < end:
+        for office in volga.OFFICES:
+            if rng.random() >= SPECIAL_WEEK_RATE:
+                continue
+            title = rng.choice(SPECIAL_TITLES)
+            surcharge = rng.choice([0, 0, 1, 2, 3])
+            s, e = monday + timedelta(days=1), monday + timedelta(days=4)
+            cur = conn.execute(
+                """
+                INSERT INTO weekly_special(office, start_date, end_date, title, surcharge_eur, created_at)
+                VALUES (?,?,?,?,?,?)
+                """,
+                (office, s.isoformat(), e.isoformat(), title, surcharge, f"{monday.isoformat()}T09:00:00"),
+            )
+            special = {"id": cur.lastrowid, "title": title, "surcharge_eur": surcharge}
+            label = volga.special_label(special)
+            did = conn.execute(
+                "INSERT INTO dishes(category, label, short_name, special_id) VALUES ('hot', ?, ?, ?)",
+                (label, volga._short_name(label), special["id"]),
+            ).lastrowid
+            for k in range(4):
+                by_day[(office, s + timedelta(days=k))] = (label, surcharge, did)
+        monday += timedelta(days=7)
+    return by_day
+
+
+def generate(db_path: str, start: date, days: int, scale: float = 1.0, seed: int = 1, quiet: bool = False) -> int:
+    """Наполняет db_path (схема создаётся миграциями app). -> число заказов."""
+    volga = import_app(db_path)
+    rng = random.Random(seed)
+
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("PRAGMA cache_size=-262144")  # 256 МБ
+    conn.execute("BEGIN")
+
+    menu = volga.MENU
+    ids = {}
+    for cat in ("zakuska", "soup", "hot", "dessert"):
+        ids[cat] = [(lbl, volga.dish_id(conn, cat, lbl)) for lbl in menu[cat]]
+    breads = [(lbl, volga.dish_id(conn, "bread", lbl)) for lbl in volga.BREAD_OPTIONS] + [(None, None)]
+    drinks = [
+        (code, price, volga.dish_id(conn, "drink", volga.DRINK_LABEL[code]) if code else None)
+        for (code, _, price) in volga.DRINKS
+    ]
+    specials = gen_specials(volga, conn, rng, start, days)
+
+    per_day = max(1, round(ORDERS_PER_DAY * scale))
+    pool = max(per_day * 3, 1000)  # "сотрудники" офиса
+    insert = """
+        INSERT INTO orders(
+          order_code, office, order_date, floor,
+          name, phone_raw, phone_norm,
+          zakuska_id, soup_id, hot_id, dessert_id,
+          drink_id, drink_price_eur,
+          bread_id,
+          option_code, price_eur, comment, status, created_at
+        )
+        VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
+    """
+
+    total = 0
+    batch = []
+    seq = []
+    t0 = time.perf_counter()
+    for d in workdays(volga, start, days):
+        n_code = 0
+        code_day = d.strftime("%Y%m%d")
+        created_day = volga.prev_workday(d).isoformat()
+        for office_idx, office in enumerate(volga.OFFICES):
+            floors = volga.FLOORS_BY_OFFICE.get(office) or [None]
+            special = specials.get((office, d))
+            n = max(0, round(rng.gauss(per_day, per_day * 0.15)))
+            for emp in rng.sample(range(pool), min(n, pool)):
+                r = rng.random()
+                if r < 0.34:
+                    option, z, h, de = "opt1", rng.choice(ids["zakuska"]), (None, None), rng.choice(ids["dessert"])
+                elif r < 0.67:
+                    option, z, h, de = "opt2", (None, None), rng.choice(ids["hot"]), rng.choice(ids["dessert"])
+                else:
+                    option, z, h, de = "opt3", rng.choice(ids["zakuska"]), rng.choice(ids["hot"]), (None, None)
+                price = volga.PRICES[option]
+                hot_id = h[1]
+                if h[0] is not None:
+                    if special is not None and rng.random() < 0.3:
+                        hot_id = special[2]
+                        price += special[1]
+                    elif "Плов с бараниной" in h[0]:
+                        price += volga.PLOV_SURCHARGE
+                drink_code, drink_price, drink_id = rng.choice(drinks)
+                bread_id = rng.choice(breads)[1]
+
+                n_code += 1
+                phone_digits = f"34{600000000 + office_idx * 10_000_000 + emp}"
+                batch.append((
+                    f"{volga.ORDER_PREFIX}-{code_day}-{n_code:03d}", office, d.isoformat(), rng.choice(floors),
+                    f"{rng.choice(FIRST_NAMES)} {emp}", f"+{phone_digits}", f"+{phone_digits}",
+                    z[1], rng.choice(ids["soup"])[1], hot_id, de[1],
+                    drink_id, drink_price if drink_code else None,
+                    bread_id,
+                    option, round(price + drink_price, 2), rng.choice(COMMENTS),
+                    "cancelled" if rng.random() < CANCEL_RATE else "active",
+                    f"{created_day}T{rng.randrange(11, 24):02d}:{rng.randrange(60):02d}:{rng.randrange(60):02d}",
+                ))
+                if len(batch) >= BATCH:
+                    conn.executemany(insert, batch)
+                    total += len(batch)
+                    batch.clear()
+        if n_code:
+            seq.append((volga.ORDER_PREFIX, d.isoformat(), n_code))
+
+    conn.executemany(insert, batch)
+    total += len(batch)
+    conn.executemany(
+        """
+        INSERT INTO order_code_seq(prefix, order_date, seq) VALUES (?,?,?)
+        ON CONFLICT(prefix, order_date) DO UPDATE SET seq = max(seq, excluded.seq)
+        """,
+        seq,
+    )
+    conn.execute("COMMIT")
+    conn.execute("ANALYZE")
+    conn.close()
+
+    if not quiet:
+        dt = time.perf_counter() - t0
+        print(f"{total} заказов за {dt:.1f} с ({total / dt * 60 / 1e6:.2f} млн/мин) -> {db_path}", file=sys.stderr)
+    return total
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("db_path")
+    ap.add_argument("--start", type=date.fromisoformat, default=date(2025, 1, 1))
+    ap.add_argument("--days", type=int, default=365)
+    ap.add_argument("--scale", type=float, default=1.0)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--force", action="store_true", help="перезаписать существующий файл")
+    args = ap.parse_args()
+
+    if os.path.exists(args.db_path):
+        if not args.force:
+            raise SystemExit(f"{args.db_path} уже есть (--force, чтобы перезаписать)")
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(args.db_path + suffix):
+                os.remove(args.db_path + suffix)
+
+    generate(os.path.abspath(args.db_path), args.start, args.days, args.scale, args.seed)
+
+
+if __name__ == "__main__":
+    main()
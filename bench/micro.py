@@ -0,0 +1,240 @@
+"""
+Микробенчмарки горячих функций app.py (без gunicorn и сети).
+
+Каждый замер: прогрев, затем --repeats серий; число вызовов в серии
+подбирается так, чтобы серия шла не меньше --min-time. В отчёте — медиана
+и межквартильный размах (IQR) времени одного вызова.
+
+    python bench/micro.py                       # просто замерить
+    python bench/micro.py --save                # записать bench/micro_baseline.json
+    python bench/micro.py --compare             # сравнить с базой, exit 1 при замедлении >= 2x
+    python bench/micro.py --compare --only rows_table
+
+База зависит от машины: перезаписывайте её (--save) на той же машине,
+где потом сравниваете. Вместе с результатами в базе лежат --repeats,
+--min-time и --warmup; --compare берёт их оттуда, если не заданы явно.
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BASELINE = os.path.join(ROOT, "bench", "micro_baseline.json")
+FROZEN_NOW = "2030-01-08T10:55:00"  # вторник, окно приёма открыто
+DAY = FROZEN_NOW[:10]
+SEED_ROWS = 3000
+DEFAULT_PARAMS = {"repeats": 15, "min_time": 0.02, "warmup": 0.1}
+
+
+def setup_app(tmp: str):
+    """Импорт app на временной базе в tmp с замороженными часами."""
+    os.environ.update({
+        "DB_PATH": os.path.join(tmp, "orders.sqlite"),
+        "FROZEN_NOW": FROZEN_NOW,
+        "MIGRATE_ON_START": "1",
+    })
+    os.environ.setdefault("ORDER_LINK_SECRET", "bench-order-link-secret")
+    import app as volga
+    return volga
+
+
+def seed(volga, n: int):
+    """n активных заказов ALAMEDA на DAY — все опции, напитки, хлеб."""
+    d = volga.date.fromisoformat(DAY)
+    conn = volga.db()
+    ctx = volga.RequestCtx(volga.now_local())
+    menu = volga.MENU
+    drinks = [k for (k, _, _) in volga.DRINKS]
+    floors = volga.FLOORS_BY_OFFICE["ALAMEDA"]
+    combos = [
+        ("opt1", menu["zakuska"], None, menu["dessert"]),
+        ("opt2", None, menu["hot"], menu["dessert"]),
+        ("opt3", menu["zakuska"], menu["hot"], None),
+    ]
+
+    rows = []
+    for i in range(n):
+        option, zak, hot, des = combos[i % 3]
+        z = zak[i % len(zak)] if zak else ""
+        h = hot[i % len(hot)] if hot else ""
+        s = menu["soup"][i % len(menu["soup"])]
+        de = des[i % len(des)] if des else ""
+        bread = volga.BREAD_OPTIONS[i % 2] if i % 3 else ""
+        drink = drinks[i % len(drinks)]
+        ids = volga.resolve_dish_ids(conn, "ALAMEDA", d, z, s, h, de, bread, drink, ctx=ctx)
+        _, base, _ = volga.compute_option_base_price(z, s, h, de, "ALAMEDA", d, ctx=ctx)
+        rows.append((
+            f"{volga.ORDER_PREFIX}-{d.strftime('%Y%m%d')}-{i + 1:03d}", "ALAMEDA", DAY, floors[i % 2],
+            f"Сотрудник {i}", f"+34 600 {i:06d}", f"+34600{i:06d}",
+            ids["zakuska_id"], ids["soup_id"], ids["hot_id"], ids["dessert_id"],
+            ids["drink_id"], volga.DRINK_PRICE[drink] if drink else None, ids["bread_id"],
+            option, volga.compute_total_price(base, drink), "" if i % 5 else "без лука",
+            "active", "2030-01-08T09:00:00",
+        ))
+
+    conn.executemany(
+        """
+        INSERT INTO orders(
+          order_code, office, order_date, floor,
+          name, phone_raw, phone_norm,
+          zakuska_id, soup_id, hot_id, dessert_id,
+          drink_id, drink_price_eur,
+          bread_id,
+          option_code, price_eur, comment, status, created_at
+        )
+        VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
+        """,
+        rows,
+    )
+    conn.execute(
+        "INSERT INTO order_code_seq(prefix, order_date, seq) VALUES (?, ?, ?)",
+        (volga.ORDER_PREFIX, DAY, n),
+    )
+    conn.commit()
+    return conn
+
+
+def cases(volga, conn):
+    """name -> функция без аргументов."""
+    d = volga.date.fromisoformat(DAY)
+    ctx = volga.RequestCtx(volga.now_local())
+    menu = volga.MENU
+    rows = conn.execute(
+        "SELECT * FROM orders_v WHERE office='ALAMEDA' AND order_date=? AND status='active' ORDER BY created_at",
+        (DAY,),
+    ).fetchall()
+    body = "<div class='card'>" + "<p>Заказ / Order</p>" * 200 + "</div>"
+    all_dishes = menu["zakuska"] + menu["soup"] + menu["hot"] + menu["dessert"]
+    client = volga.app.test_client()
+
+    def order_code():
+        # в серии — одна транзакция, потом откат: счётчик не растёт между сериями
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for _ in range(100):
+                volga.generate_order_code(conn, d)
+        finally:
+            conn.rollback()
+
+    return {
+        "normalize_phone": lambda: volga.normalize_phone(" +34 (600) 123-456 "),
+        "compute_option_base_price": lambda: volga.compute_option_base_price(
+            menu["zakuska"][0], menu["soup"][0], menu["hot"][4], "", "ALAMEDA", d, ctx=ctx
+        ),
+        "compute_total_price": lambda: volga.compute_total_price(18.0, "mors"),
+        "html_page": lambda: volga.html_page(body),
+        "rows_table_30": lambda: volga._rows_table_v2(rows[:30]),
+        "rows_table_300": lambda: volga._rows_table_v2(rows[:300]),
+        "rows_table_3000": lambda: volga._rows_table_v2(rows[:3000]),
+        "summary_counts": lambda: volga._summary_counts(conn, "ALAMEDA", d),
+        "options_html": lambda: volga.options_html(all_dishes),
+        # форма целиком, через test_client (без сети)
+        "form_render": lambda: client.get(f"/?office=ALAMEDA&date={DAY}").get_data(),
+        # одна "единица" — 100 номеров в одной транзакции (BEGIN IMMEDIATE + откат)
+        "generate_order_code_x100": order_code,
+    }
+
+
+def measure(fn, repeats: int, min_time: float, warmup: float) -> dict:
+    """Медиана и IQR одного вызова, секунды."""
+    t_end = time.perf_counter() + warmup
+    while time.perf_counter() < t_end:
+        fn()
+
+    number = 1
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        if time.perf_counter() - t0 >= min_time:
+            break
+        number *= 2
+
+    samples = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - t0) / number)
+
+    q1, _, q3 = statistics.quantiles(samples, n=4)
+    return {"median": statistics.median(samples), "iqr": q3 - q1, "number": number, "repeats": repeats}
+
+
+def fmt(seconds: float) -> str:
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:9.3f} ms"
+    return f"{seconds * 1e6:9.2f} µs"
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--repeats", type=int, help=f"серий на замер (по умолчанию {DEFAULT_PARAMS['repeats']})")
+    ap.add_argument("--min-time", type=float, help=f"минимальная длительность серии, с ({DEFAULT_PARAMS['min_time']})")
+    ap.add_argument("--warmup", type=float, help=f"прогрев каждого замера, с ({DEFAULT_PARAMS['warmup']})")
+    ap.add_argument("--only", default="", help="подстрока имени замера")
+    ap.add_argument("--save", action="store_true", help="записать результат как базу")
+    ap.add_argument("--compare", action="store_true", help="сравнить с базой")
+    ap.add_argument("--baseline", default=BASELINE)
+    ap.add_argument("--threshold", type=float, default=2.0, help="во сколько раз медленнее — уже регрессия")
+    args = ap.parse_args()
+
+    base = None
+    params = dict(DEFAULT_PARAMS)
+    if args.compare:
+        with open(args.baseline, encoding="utf-8") as f:
+            saved = json.load(f)
+        base = saved["results"]
+        params.update(saved["params"])
+    for k in params:
+        if getattr(args, k) is not None:
+            params[k] = getattr(args, k)
+    if base is not None and params != saved["params"]:
+        print(f"внимание: параметры {params} отличаются от базы {saved['params']}")
+
+    tmp = tempfile.mkdtemp(prefix="volga-micro-")
+    try:
+        volga = setup_app(tmp)
+        conn = seed(volga, SEED_ROWS)
+
+        results = {}
+        for name, fn in cases(volga, conn).items():
+            if args.only and args.only not in name:
+                continue
+            r = results[name] = measure(fn, params["repeats"], params["min_time"], params["warmup"])
+            print(f"{name:28s} {fmt(r['median'])}  ± {fmt(r['iqr'])} IQR")
+        conn.close()
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    if args.save:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"params": params, "results": results}, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"база записана: {args.baseline}")
+
+    if base is not None:
+        slow = []
+        print()
+        for name, r in results.items():
+            if name not in base:
+                print(f"{name:28s} нет в базе")
+                continue
+            ratio = r["median"] / base[name]["median"]
+            mark = "  <-- РЕГРЕССИЯ" if ratio >= args.threshold else ""
+            print(f"{name:28s} x{ratio:5.2f}{mark}")
+            if ratio >= args.threshold:
+                slow.append(name)
+        if slow:
+            raise SystemExit(f"медленнее базы в {args.threshold}x и более: {', '.join(slow)}")
+
+
+if __name__ == "__main__":
+    main()